@@ -4,142 +4,199 @@ Stockholm Violence Map Auto-Update Script with Duplicate Removal
 Hämtar nya våldshändelser från polisen.se och tar bort dubletter automatiskt
 """
 
+import argparse
+import gzip
 import json
+import os
 import requests
+import sys
+import threading
+import time
 from datetime import datetime, timedelta
 import logging
 from collections import defaultdict
-import hashlib
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import random
+
+from data_format import (
+    ARCHIVE_SCHEMA, PUBLIC_SCHEMA, SCHEMA_VERSION, STOCKHOLM_TZ,
+    create_event_hash, dumps_exports, event_sort_key, parse_event_datetime, write_atomic
+)
+from delta_feed import DEFAULT_MAX_DELTAS, write_delta_feed
+from event_store import ARCHIVE_FILE, DATABASE_FILE, EventStore
+from filter_index import build_filter_index
+from netlify_deploy import deploy_to_netlify, load_netlify_config
+from pipeline import PipelineContext, build_stages, chain, run_pipeline
+from police_api import PoliceApiClient
+from run_lock import DEFAULT_STALE_MINUTES, RunLock, consume_updates, enqueue_update, merged_updates, pending_updates, queued_events
+from search_index import write_search_index
+from staging import recover as recover_staged_outputs, staged_outputs
+from time_index import insert_events, retention_cutoff, split_timeline, write_cold_archives
 
 # Konfigurera logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-def get_violence_events():
-    """Hämta våldshändelser från polisen.se API"""
+# Gazetteer: områdesspecifika koordinater
+AREA_COORDS = {
+    'södermalm': (59.3181, 18.0686),
+    'vasastan': (59.3467, 18.0508),
+    'östermalm': (59.3378, 18.0895),
+    'norrmalm': (59.3293, 18.0686),
+    'gamla stan': (59.3251, 18.0711),
+    'sundbyberg': (59.3617, 17.9717),
+    'solna': (59.3599, 18.0009),
+    'huddinge': (59.2348, 17.9809),
+    'rinkeby': (59.3890, 17.9240),
+    'tensta': (59.3990, 17.9040),
+    'skälby': (59.3617, 17.9717)
+}
+
+# Standardregion; config.json 'regions' kan lägga till fler län med egen gazetteer
+DEFAULT_REGION = {
+    'id': 'stockholm',
+    'name': 'Stockholms län',
+    'locationname': 'Stockholm',
+    'geographic_scope': 'Stockholm-regionen',
+    'center': [59.3293, 18.0686],
+    'bounds': [[58.7, 17.2], [60.3, 19.4]],
+    'gazetteer': AREA_COORDS,
+    'data_file': 'stockholm_violence_data.json',
+    'archive_file': ARCHIVE_FILE,
+    'search_dir': 'search/stockholm',
+    'delta_dir': 'deltas/stockholm',
+    'cold_dir': 'cold/stockholm',
+    'hotspot_dir': 'hotspots/stockholm',
+    'database': DATABASE_FILE
+}
+
+# Förteckning över regionernas datafiler och utbredning, läses av kartan
+REGIONS_MANIFEST = 'regions.json'
+
+# Regionerna deployar var för sig när de är klara; en deploy i taget så att
+# varje deploy bygger sitt manifest från alla redan publicerade filer
+DEPLOY_LOCK = threading.Lock()
+
+# Klassificering: brottstyper som räknas som våldsdåd (delsträngsmatchning)
+VIOLENCE_TYPES = [
+    'misshandel', 'rån', 'skottlossning', 'explosion', 'våldtäkt', 'mord',
+    'grov misshandel', 'sexualbrott', 'dråp', 'försök till mord',
+    'olaga hot', 'våld mot tjänsteman', 'människohandel', 'kidnappning',
+    'utpressning', 'sprängning', 'skjutning'
+]
+
+def is_violence_event(event):
+    """Avgör om en händelse räknas som våldsdåd utifrån brottstypen"""
+    event_type = event.get('type', '').lower()
+    return any(violence_type in event_type for violence_type in VIOLENCE_TYPES)
+
+def load_config(config_file='config.json'):
+    """Läs config.json, tom konfiguration om filen saknas"""
+    try:
+        with open(config_file, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+def load_regions(config=None):
+    """
+    Aktiva regioner från config.json, bara Stockholm om listan saknas.
+
+    Varje region får egen gazetteer, egen databas (dublettindex), egen
+    publik datafil och eget arkiv; filnamnen härleds från regionens id om
+    de inte anges.
+    """
+    config = load_config() if config is None else config
     
-    # Beräkna datum för de senaste 14 dagarna
-    end_date = datetime.now()
-    start_date = end_date - timedelta(days=14)
+    regions = []
+    for region in config.get('regions') or [{'id': DEFAULT_REGION['id']}]:
+        resolved = dict(DEFAULT_REGION) if region.get('id') == DEFAULT_REGION['id'] else {}
+        resolved.update(region)
+        if not resolved.get('enabled', True):
+            continue
+        
+        resolved.setdefault('name', resolved['id'].title())
+        resolved.setdefault('locationname', resolved['name'])
+        resolved.setdefault('geographic_scope', resolved['name'])
+        resolved.setdefault('gazetteer', {})
+        resolved.setdefault('data_file', f"{resolved['id']}_violence_data.json")
+        resolved.setdefault('archive_file', f"{resolved['id']}_violence_archive.json")
+        resolved.setdefault('search_dir', f"search/{resolved['id']}")
+        resolved.setdefault('delta_dir', f"deltas/{resolved['id']}")
+        resolved.setdefault('cold_dir', f"cold/{resolved['id']}")
+        resolved.setdefault('hotspot_dir', f"hotspots/{resolved['id']}")
+        resolved.setdefault('database', f"{resolved['id']}_violence.db")
+        validate_region(resolved)
+        regions.append(resolved)
     
-    logger.info(f"🔍 Hämtar händelser från {start_date.strftime('%Y-%m-%d')} till {end_date.strftime('%Y-%m-%d')}")
+    return regions
+
+def validate_region(region):
+    """Stoppa felaktiga regioner direkt i stället för med KeyError mitt i en körning"""
+    if not region.get('id'):
+        raise ValueError(f"Region i config.json saknar id: {region!r:.80}")
     
-    # API-anrop till polisen.se
-    url = "https://polisen.se/api/events"
-    params = {
-        'locationname': 'Stockholm'
-    }
+    missing = [key for key in ('center', 'bounds') if key not in region]
+    if missing:
+        raise ValueError(f"Region '{region['id']}' i config.json saknar {', '.join(missing)}")
     
-    try:
-        response = requests.get(url, params=params, timeout=30)
-        response.raise_for_status()
-        
-        all_events = response.json()
-        logger.info(f"📥 Hämtade {len(all_events)} händelser från polisen.se")
-        
-        # Filtrera på våldsdåd
-        violence_types = [
-            'misshandel', 'rån', 'skottlossning', 'explosion', 'våldtäkt', 'mord',
-            'grov misshandel', 'sexualbrott', 'dråp', 'försök till mord',
-            'olaga hot', 'våld mot tjänsteman', 'människohandel', 'kidnappning',
-            'utpressning', 'sprängning', 'skjutning'
-        ]
-        
-        violence_events = []
-        for event in all_events:
-            event_type = event.get('type', '').lower()
-            if any(violence_type in event_type for violence_type in violence_types):
-                violence_events.append(event)
-        
-        logger.info(f"🚨 Filtrerade till {len(violence_events)} våldshändelser")
-        
-        # Filtrera på datum (senaste 14 dagarna)
-        recent_events = []
-        for event in violence_events:
-            event_date_str = event.get('datetime', '')
-            if event_date_str:
-                try:
-                    event_date = datetime.fromisoformat(event_date_str.replace('Z', '+00:00'))
-                    if event_date.date() >= start_date.date():
-                        recent_events.append(event)
-                except ValueError:
-                    # Om datum inte kan parsas, inkludera händelsen ändå
-                    recent_events.append(event)
-        
-        logger.info(f"📅 Filtrerade till {len(recent_events)} händelser från senaste 14 dagarna")
-        
-        return recent_events
-        
-    except requests.RequestException as e:
-        logger.error(f"❌ Fel vid API-anrop: {e}")
-        return []
-    except Exception as e:
-        logger.error(f"❌ Oväntat fel: {e}")
-        return []
+    def is_point(value):
+        return (
+            isinstance(value, (list, tuple)) and len(value) == 2
+            and all(isinstance(number, (int, float)) and not isinstance(number, bool) for number in value)
+        )
+    
+    if not is_point(region['center']):
+        raise ValueError(f"Region '{region['id']}': center ska vara [lat, lon], inte {region['center']!r}")
+    bounds = region['bounds']
+    if not (isinstance(bounds, (list, tuple)) and len(bounds) == 2 and all(is_point(corner) for corner in bounds)):
+        raise ValueError(f"Region '{region['id']}': bounds ska vara [[syd, väst], [nord, öst]], inte {bounds!r}")
+    (south, west), (north, east) = bounds
+    if south >= north or west >= east:
+        raise ValueError(f"Region '{region['id']}': bounds ska vara [[syd, väst], [nord, öst]], inte {bounds!r}")
 
-def create_event_hash(event):
-    """Skapa unik hash för en händelse baserat på datum, typ och beskrivning"""
-    hash_string = f"{event.get('datetime', '')}{event.get('type', '')}{event.get('summary', '').strip()}"
-    return hashlib.md5(hash_string.encode('utf-8')).hexdigest()
+def get_violence_events(session=None, locationname='Stockholm', client=None):
+    """
+    Hämta våldshändelser från polisen.se API (de senaste 14 dagarna).
 
-def remove_duplicates(events):
-    """Ta bort dubletter från händelselista"""
-    logger.info(f"🔍 Kontrollerar dubletter bland {len(events)} händelser")
-    
-    seen_hashes = set()
-    unique_events = []
-    duplicates_removed = 0
+    Kör kedjans första steg (fetch → parse → classify → window) utan att
+    spara något. Med en delad klient återanvänds svaret om samma anrop
+    redan gjorts under körningen (t.ex. av diagnostiken).
+    """
+    region = dict(DEFAULT_REGION, locationname=locationname)
+    context = PipelineContext(region, client=client or PoliceApiClient(session), classify=is_violence_event)
+    stages = build_stages(context, ['fetch', 'parse', 'classify', 'window'])
     
-    for event in events:
-        event_hash = create_event_hash(event)
-        
-        if event_hash not in seen_hashes:
-            seen_hashes.add(event_hash)
-            unique_events.append(event)
-        else:
-            duplicates_removed += 1
-            logger.debug(f"🗑️ Dublett borttagen: {event.get('type', 'Okänt')} - {event.get('datetime', 'Okänt datum')}")
+    recent_events = list(chain(context, stages))
     
-    logger.info(f"✅ Tog bort {duplicates_removed} dubletter, {len(unique_events)} unika händelser kvar")
-    return unique_events
+    logger.info(f"📅 {len(recent_events)} våldshändelser från senaste 14 dagarna")
+    return recent_events
 
-def improve_coordinates(event):
+def improve_coordinates(event, region=DEFAULT_REGION):
     """Förbättra koordinater för händelser baserat på plats och brottstyp"""
     
-    # Grundkoordinater för Stockholm
-    base_lat = 59.3293
-    base_lng = 18.0686
+    # Grundkoordinater: regionens centrum
+    base_lat, base_lng = region['center']
     
     # Förbättringar baserat på kommun/område
-    location_name = event.get('location_name', '').lower()
+    # API:ets rådata har platsnamnet under location.name
+    location_name = (event.get('location_name') or (event.get('location') or {}).get('name') or '').lower()
+    # Platstext från detaljsidan (enrichment.py) är mer specifik och prövas först
+    detail_location = event.get('detail_location', '').lower()
     event_type = event.get('type', '').lower()
     
-    # Områdesspecifika koordinater
-    area_coords = {
-        'södermalm': (59.3181, 18.0686),
-        'vasastan': (59.3467, 18.0508),
-        'östermalm': (59.3378, 18.0895),
-        'norrmalm': (59.3293, 18.0686),
-        'gamla stan': (59.3251, 18.0711),
-        'sundbyberg': (59.3617, 17.9717),
-        'solna': (59.3599, 18.0009),
-        'huddinge': (59.2348, 17.9809),
-        'rinkeby': (59.3890, 17.9240),
-        'tensta': (59.3990, 17.9040),
-        'skälby': (59.3617, 17.9717)
-    }
-    
     # Hitta matchande område
     improved_lat = base_lat
     improved_lng = base_lng
     confidence = 50  # Grundnivå
     
-    for area, (lat, lng) in area_coords.items():
-        if area in location_name:
-            improved_lat = lat
-            improved_lng = lng
+    for source, text in (('detail_page', detail_location), ('location_name', location_name)):
+        match = next((area for area in region['gazetteer'] if area in text), None)
+        if match:
+            improved_lat, improved_lng = region['gazetteer'][match]
             confidence = 85
-            event['improved_area'] = area.title()
+            event['improved_area'] = match.title()
+            event['improved_area_source'] = source
             break
     
     # Lägg till slumpmässig spridning baserat på brottstyp
@@ -153,9 +210,10 @@ def improve_coordinates(event):
         # Allmän spridning
         spread = 0.01
     
-    import random
-    improved_lat += (random.random() - 0.5) * spread
-    improved_lng += (random.random() - 0.5) * spread
+    # Deterministisk spridning per händelse så att omkörningar ger samma koordinater
+    rng = random.Random(create_event_hash(event))
+    improved_lat += (rng.random() - 0.5) * spread
+    improved_lng += (rng.random() - 0.5) * spread
     
     # Uppdatera händelsen
     event['latitude'] = improved_lat
@@ -165,10 +223,10 @@ def improve_coordinates(event):
     
     return event
 
-def load_existing_data():
+def load_existing_data(data_file='stockholm_violence_data.json'):
     """Ladda befintlig data från JSON-fil"""
     try:
-        with open('stockholm_violence_data.json', 'r', encoding='utf-8') as f:
+        with open(data_file, 'r', encoding='utf-8') as f:
             data = json.load(f)
             return data
     except FileNotFoundError:
@@ -186,38 +244,85 @@ def load_existing_data():
         logger.error(f"❌ Fel vid laddning av befintlig data: {e}")
         return {'events': [], 'metadata': {}}
 
-def merge_events(existing_events, new_events):
-    """Slå samman befintliga och nya händelser utan dubletter"""
-    logger.info(f"🔄 Slår samman {len(existing_events)} befintliga med {len(new_events)} nya händelser")
+def open_event_store(region=DEFAULT_REGION):
+    """
+    Öppna regionens händelsedatabas. Om den är tom importeras det fullständiga
+    arkivet, eller den publicerade filen om arkivet ännu inte finns.
+    """
+    db_path = region['database']
+    store = EventStore(db_path)
     
-    # Skapa hash-uppslagning för befintliga händelser
-    existing_hashes = set()
-    for event in existing_events:
-        event_hash = create_event_hash(event)
-        existing_hashes.add(event_hash)
+    if store.count() == 0:
+        source_file = region['archive_file'] if os.path.exists(region['archive_file']) else region['data_file']
+        existing_events = load_existing_data(source_file).get('events', [])
+        imported = store.import_events(existing_events)
+        logger.info(f"🗄️ Importerade {imported} händelser från {source_file} till {db_path}")
     
-    # Lägg till nya händelser som inte redan finns
-    added_events = 0
-    for event in new_events:
-        event_hash = create_event_hash(event)
-        
-        if event_hash not in existing_hashes:
-            # Förbättra koordinater för nya händelser
-            improved_event = improve_coordinates(event.copy())
-            existing_events.append(improved_event)
-            existing_hashes.add(event_hash)
-            added_events += 1
-            logger.info(f"➕ Ny händelse: {event.get('type', 'Okänt')} - {event.get('location_name', 'Okänt område')}")
+    return store
+
+def pipeline_context(store, region=DEFAULT_REGION, client=None, known_hashes=None, session=None, hotspots=None):
+    """Körningens kontext för uppdateringskedjan (se pipeline.py)"""
+    return PipelineContext(
+        region,
+        store=store,
+        client=client,
+        classify=is_violence_event,
+        geocode=improve_coordinates,
+        known_hashes=known_hashes,
+        session=session,
+        config=load_config(),
+        hotspots=hotspots
+    )
+
+def run_update_pipeline(store, region=DEFAULT_REGION, client=None, known_hashes=None, session=None, queued=(), hotspots=None):
+    """
+    Hämta och spara nya händelser genom kedjan i config.json (standard:
+    fetch → parse → classify → window → dedup → enrich → geocode → store →
+    hotspots).
+
+    Händelserna flödar en i taget; bara detaljsidorna hämtas i batchar.
+    queued är köade händelser från körningar som inte fick låset; de
+    flödar före hämtningen genom samma kedja. hotspots är ett
+    HotspotTracker som hålls i minnet (daemon-läge); annars läses det från fil.
+    Returnerar kontexten med räknare per steg och de tillagda händelserna.
+    """
+    context = pipeline_context(store, region, client or PoliceApiClient(session), known_hashes, session, hotspots)
+    run_pipeline(context, build_stages(context), queued)
     
-    logger.info(f"✅ Lade till {added_events} nya händelser")
+    logger.info(f"✅ Lade till {len(context.added_events)} nya händelser")
+    return context
+
+def measure_export(path, content):
+    """Storlek (rå och gzip) och tolkningstid för en exporterad fil"""
+    encoded = content.encode('utf-8')
     
-    # Ta bort dubletter från hela datasetet
-    all_events_cleaned = remove_duplicates(existing_events)
+    # Bästa av tre för att jämna ut brus
+    parse_seconds = []
+    for _ in range(3):
+        started = time.perf_counter()
+        json.loads(content)
+        parse_seconds.append(time.perf_counter() - started)
     
-    return all_events_cleaned
+    return {
+        'file': path,
+        'bytes': len(encoded),
+        'gzip_bytes': len(gzip.compress(encoded)),
+        'parse_ms': round(min(parse_seconds) * 1000, 2)
+    }
+
+def save_data(events, backup=True, region=DEFAULT_REGION, public_events=None):
+    """
+    Spara regionens fullständiga arkiv och publika datafil i ett pass.
+
+    public_events begränsar den publika filen (retention); arkivet
+    innehåller alltid alla händelser.
 
-def save_data(events):
-    """Spara uppdaterad data till JSON-fil"""
+    Returnerar (metadata, exports) där exports jämför storlek och
+    tolkningstid för de två filerna. Skillnaden mot förra publika filen
+    skrivs som en delta i regionens deltaflöde.
+    """
+    data_file = region['data_file']
+    archive_file = region['archive_file']
     
     # Skapa metadata
     metadata = {
@@ -228,71 +333,358 @@ def save_data(events):
         'duplicate_removal': True,
         'coordinate_improvement': True,
         'update_frequency': 'daily',
-        'geographic_scope': 'Stockholm-regionen'
+        'geographic_scope': region['geographic_scope'],
+        'region': region['id']
     }
     
-    # Skapa slutgiltig datastruktur
-    final_data = {
-        'events': events,
-        'metadata': metadata
-    }
+    archive_metadata = dict(metadata, schema=ARCHIVE_SCHEMA, schema_version=SCHEMA_VERSION)
+    public_metadata = dict(metadata, schema=PUBLIC_SCHEMA, schema_version=SCHEMA_VERSION)
+    if public_events is not None:
+        public_metadata['total_events'] = len(public_events)
+    
+    # Filterindex (bitmängder per år och typ) skickas med i den publika filen
+    sections = {'filter_index': build_filter_index(events if public_events is None else public_events)}
     
-    # Spara till fil
+    # Spara i kanoniskt format (sorterat på id, en händelse per rad)
     try:
-        with open('stockholm_violence_data.json', 'w', encoding='utf-8') as f:
-            json.dump(final_data, f, indent=2, ensure_ascii=False)
+        archive_content, public_content = dumps_exports(events, archive_metadata, public_metadata, sections, public_events)
+        
+        # Förra publika filen behövs för deltaflödet
+        try:
+            with open(data_file, 'r', encoding='utf-8') as f:
+                previous_public_content = f.read()
+        except FileNotFoundError:
+            previous_public_content = None
+        
+        write_atomic(archive_file, archive_content)
+        write_atomic(data_file, public_content)
+        
+        logger.info(f"💾 Sparade {len(events)} händelser till {archive_file} (arkiv) och {data_file} (publik)")
+        
+        exports = {
+            'archive': measure_export(archive_file, archive_content),
+            'public': measure_export(data_file, public_content)
+        }
+        
+        logger.info(
+            f"📏 Publik fil {exports['public']['bytes'] / 1024:.0f} KB / {exports['public']['parse_ms']} ms, "
+            f"arkiv {exports['archive']['bytes'] / 1024:.0f} KB / {exports['archive']['parse_ms']} ms"
+        )
         
-        logger.info(f"💾 Sparade {len(events)} händelser till stockholm_violence_data.json")
+        delta_config = load_config().get('delta_feed', {})
+        exports['delta'] = write_delta_feed(
+            region['delta_dir'],
+            data_file,
+            previous_public_content,
+            public_content,
+            metadata['last_updated'],
+            max_deltas=delta_config.get('max_deltas', DEFAULT_MAX_DELTAS)
+        )
+        logger.info(
+            f"🧾 Deltaflöde version {exports['delta']['version']}: "
+            f"{exports['delta']['upserts']} nya/ändrade, {exports['delta']['removals']} borttagna"
+        )
         
-        # Skapa även en backup med timestamp
-        backup_filename = f"stockholm_violence_backup_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
-        with open(backup_filename, 'w', encoding='utf-8') as f:
-            json.dump(final_data, f, indent=2, ensure_ascii=False)
+        # Skapa även en backup av arkivet med timestamp
+        if backup:
+            backup_filename = f"{region['id']}_violence_backup_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+            write_atomic(backup_filename, archive_content)
+            
+            logger.info(f"💾 Backup sparad som {backup_filename}")
         
-        logger.info(f"💾 Backup sparad som {backup_filename}")
+        return metadata, exports
         
     except Exception as e:
         logger.error(f"❌ Fel vid sparande: {e}")
         raise
 
-def main():
-    """Huvudfunktion för auto-update"""
-    logger.info("🚀 Startar Stockholm Violence Map auto-update med dublettkontroll")
+def export_search_index(store, all_events, region=DEFAULT_REGION):
+    """
+    Skriv regionens sökindex från databasens termer.
+
+    Termerna tokeniseras och stammas när händelser läggs till, så här
+    återstår bara att översätta hash till position i den publika filen.
+    """
+    positions = {
+        create_event_hash(event): position
+        for position, event in enumerate(sorted(all_events, key=event_sort_key))
+    }
+    
+    term_positions = defaultdict(list)
+    for term, event_hash in store.term_postings():
+        if event_hash in positions:
+            term_positions[term].append(positions[event_hash])
+    
+    stats = write_search_index(region['search_dir'], term_positions, len(all_events))
+    logger.info(f"🔎 Sökindex: {stats['terms']} termer i {stats['shards']} shards, {stats['shards_written']} ändrade")
+    return stats
+
+def export_region(store, timeline, backup=True, region=DEFAULT_REGION, added=None):
+    """
+    Exportera regionens arkiv, publika fil och sökindex, spara metadata i databasen.
+
+    timeline är regionens händelser som (epoch, händelse) i tidsordning
+    (EventStore.timeline()). Med retention.hot_months i config.json
+    publiceras bara händelser från de senaste månaderna; äldre skrivs till
+    komprimerade årsarkiv. added är händelserna sedan förra exporten
+    (daemon-läge); då byggs bara årsarkiv som de påverkar om.
+    """
+    all_events = [event for _, event in timeline]
+    hot_months = load_config().get('retention', {}).get('hot_months')
+    public_events = None
+    if hot_months:
+        # Listan är tidsordnad, så gränsen hittas med bisektion
+        cutoff = retention_cutoff(hot_months, datetime.now(STOCKHOLM_TZ))
+        cold_events, public_events = split_timeline(timeline, int(cutoff.timestamp()))
+    
+    metadata, exports = save_data(all_events, backup, region, public_events)
     
+    if public_events is not None:
+        exports['cold'] = write_cold_archives(region['cold_dir'], cold_events, cutoff, hot_months, added)
+        logger.info(
+            f"🧊 {exports['cold']['events']} händelser före {cutoff.date()} i {exports['cold']['years']} årsarkiv, "
+            f"{exports['cold']['years_written']} omskrivna"
+        )
+    
+    exports['search'] = export_search_index(store, all_events if public_events is None else public_events, region)
+    with store.transaction():
+        store.set_metadata('metadata', metadata)
+    return exports
+
+def write_report(report):
+    write_atomic('update_report.json', json.dumps(report, indent=2, ensure_ascii=False))
+
+def write_regions_manifest(regions):
+    """Skriv regions.json så att kartan kan ladda bara regionen i vyn; True om förteckningen ändrats"""
+    manifest = {
+        'regions': [
+            {
+                'id': region['id'],
+                'name': region['name'],
+                'center': region['center'],
+                'bounds': region['bounds'],
+                'data_file': region['data_file'],
+                'search_index': f"{region['search_dir']}/manifest.json",
+                'delta_feed': f"{region['delta_dir']}/feed.json",
+                'cold_archive': f"{region['cold_dir']}/manifest.json",
+                'hotspots': f"{region['hotspot_dir']}/hotspots.json"
+            }
+            for region in regions
+        ]
+    }
+    content = json.dumps(manifest, ensure_ascii=False, indent=2) + '\n'
     try:
-        # 1. Ladda befintlig data
-        existing_data = load_existing_data()
-        existing_events = existing_data.get('events', [])
-        logger.info(f"📊 Befintliga händelser: {len(existing_events)}")
+        with open(REGIONS_MANIFEST, 'r', encoding='utf-8') as f:
+            if f.read() == content:
+                return False
+    except FileNotFoundError:
+        pass
+    write_atomic(REGIONS_MANIFEST, content)
+    return True
+
+def deploy_site():
+    """Deploya ändrade filer till Netlify om konfigurerat; False om deployen misslyckades"""
+    netlify_config = load_netlify_config()
+    if netlify_config['site_id'] and netlify_config['access_token']:
+        logger.info("🚀 Deployer till Netlify...")
+        return deploy_to_netlify(
+            netlify_config['site_id'],
+            netlify_config['access_token'],
+            patterns=netlify_config['publish'],
+            max_workers=netlify_config['upload_workers']
+        )
+    return True
+
+def publish_outputs(store, timeline, existing_count, context, backup=True, region=DEFAULT_REGION, added=None):
+    """Exportera JSON för en region och returnera regionens del av rapporten (daemon-läge)"""
+    exports = export_region(store, timeline, backup, region, added)
+    
+    return {
+        'existing_events': existing_count,
+        'new_events_fetched': context.counts['fetch'],
+        'new_events_added': len(context.added_events),
+        'final_event_count': len(timeline),
+        'duplicates_removed': context.counts['duplicates'],
+        'exports': exports
+    }
+
+def summary_report(region_reports, success=True):
+    """Körningens rapport: summor över regionerna och varje regions egen del"""
+    def total(key):
+        return sum(report.get(key, 0) for report in region_reports.values())
+    
+    return {
+        'timestamp': datetime.now().isoformat(),
+        'existing_events': total('existing_events'),
+        'new_events_fetched': total('new_events_fetched'),
+        'new_events_added': total('new_events_added'),
+        'final_event_count': total('final_event_count'),
+        'duplicates_removed': total('duplicates_removed'),
+        'regions': region_reports,
+        'success': success
+    }
+
+def update_region(region, client=None, queued=()):
+    """
+    Hämta, slå samman och exportera en region.
+
+    Körs i en egen tråd med egen databasanslutning; regionerna delar inga
+    filer, så en långsam eller trasig region påverkar inte de andra.
+    Regionen publicerar sina utdata i en egen transaktion och deployar så
+    fort den är klar, utan att vänta på övriga regioner; en region som
+    fallerar halvvägs publicerar inget.
+    """
+    store = open_event_store(region)
+    try:
+        with staged_outputs():
+            existing_count = store.count()
+            logger.info(f"📊 [{region['id']}] Befintliga händelser: {existing_count}")
+            
+            context = run_update_pipeline(store, region, client, queued=queued)
+            fetched_count = context.counts['fetch']
+            if not fetched_count:
+                logger.warning(f"⚠️ [{region['id']}] Inga nya händelser hämtades")
+                return {
+                    'existing_events': existing_count,
+                    'new_events_fetched': 0,
+                    'new_events_added': 0,
+                    'final_event_count': existing_count
+                }
+            
+            timeline = list(store.timeline())
+            exports = export_region(store, timeline, region=region)
         
-        # 2. Hämta nya händelser från polisen.se
-        new_events = get_violence_events()
+        with DEPLOY_LOCK:
+            deployed = deploy_site()
         
-        if not new_events:
-            logger.warning("⚠️ Inga nya händelser hämtades")
-            return
+        return {
+            'existing_events': existing_count,
+            'new_events_fetched': fetched_count,
+            'new_events_added': len(context.added_events),
+            'final_event_count': len(timeline),
+            'duplicates_removed': context.counts['duplicates'],
+            'pipeline': dict(context.counts),
+            'enrichment': context.enrichment,
+            'exports': exports,
+            'deployed': deployed
+        }
+    finally:
+        store.close()
+
+def run_lock():
+    lock_config = load_config().get('lock', {})
+    return RunLock(stale_seconds=lock_config.get('stale_minutes', DEFAULT_STALE_MINUTES) * 60), lock_config.get('wait_seconds', 0)
+
+def queue_update(client):
+    """Låset är upptaget: hämta bara (fetch → window) och lägg händelserna i kön"""
+    events_by_region = {
+        region['id']: get_violence_events(locationname=region['locationname'], client=client)
+        for region in load_regions()
+    }
+    path = enqueue_update(events_by_region)
+    logger.info(f"📨 En annan körning håller låset; {sum(map(len, events_by_region.values()))} händelser köade i {path}")
+
+def main(client=None):
+    """
+    Huvudfunktion för auto-update; client delar session och svarscache med anroparen.
+
+    Körningen tar körningslåset. Får den inte låset inom lock.wait_seconds
+    köas de hämtade händelserna åt körningen som håller det. Köade
+    händelser slås in i den egna uppdateringen, och kön töms igen innan
+    låset släpps så att inget blir liggande.
+
+    Returnerar False om någon region misslyckades (rapporten har då
+    success: false).
+    """
+    client = client or PoliceApiClient()
+    lock, wait_seconds = run_lock()
+    
+    queued_only = False
+    if not lock.acquire(timeout=wait_seconds):
+        queue_update(client)
+        # Släpptes låset medan vi hämtade tar vi själva hand om kön
+        if not lock.acquire():
+            return True
+        queued_only = True
+    
+    success = True
+    try:
+        recover_staged_outputs()
         
-        # 3. Slå samman och ta bort dubletter
-        all_events = merge_events(existing_events, new_events)
+        pending = pending_updates()
+        if pending or not queued_only:
+            success = update_all_regions(client, pending)
         
-        # 4. Spara uppdaterad data
-        save_data(all_events)
+        # Körningar som startade under tiden har lagt sina händelser i kön
+        attempted = set()
+        while True:
+            attempted.update(path for path, _ in pending)
+            pending = [entry for entry in pending_updates() if entry[0] not in attempted]
+            if not pending:
+                break
+            logger.info(f"📨 Slår in {len(pending)} köade uppdateringar")
+            success = update_all_regions(client, pending) and success
+    finally:
+        lock.release()
+    return success
+
+def update_all_regions(client, pending=()):
+    """
+    Uppdatera alla regioner parallellt. Varje region publicerar och deployar
+    för sig när den är klar (update_region), så en långsam region fördröjer
+    inte de andra. Returnerar False om någon region misslyckades.
+    """
+    logger.info("🚀 Startar Stockholm Violence Map auto-update med dublettkontroll")
+    
+    try:
+        regions = load_regions()
+        logger.info(f"🗺️ Regioner: {', '.join(region['id'] for region in regions)}")
         
-        # 5. Skapa rapport
-        report = {
-            'timestamp': datetime.now().isoformat(),
-            'existing_events': len(existing_events),
-            'new_events_fetched': len(new_events),
-            'final_event_count': len(all_events),
-            'duplicates_removed': len(existing_events) + len(new_events) - len(all_events),
-            'success': True
-        }
+        # 1-3. Hämta, slå samman, exportera och deploya varje region parallellt
+        region_reports = {}
+        with ThreadPoolExecutor(max_workers=len(regions)) as executor:
+            futures = {
+                executor.submit(update_region, region, client, queued_events(pending, region['id'])): region
+                for region in regions
+            }
+            for future in as_completed(futures):
+                region = futures[future]
+                try:
+                    region_reports[region['id']] = future.result()
+                except Exception as e:
+                    logger.error(f"❌ [{region['id']}] Uppdatering misslyckades: {e}")
+                    region_reports[region['id']] = {'error': str(e)}
+        
+        failed = any('error' in report for report in region_reports.values())
         
-        with open('update_report.json', 'w', encoding='utf-8') as f:
-            json.dump(report, f, indent=2, ensure_ascii=False)
+        with staged_outputs():
+            # Köfilerna tas bort när regionerna de hör till har publicerats; filer
+            # med händelser för en misslyckad region ligger kvar till nästa körning
+            merged = [region_id for region_id, report in region_reports.items() if 'error' not in report]
+            consume_updates(merged_updates(pending, merged))
+            
+            # Utan fel och utan nya händelser finns inget att skriva; en trasig region rapporteras alltid
+            if not failed and not any(report.get('new_events_fetched') for report in region_reports.values()):
+                logger.warning("⚠️ Inga nya händelser hämtades")
+                return True
+            
+            # 4. Skriv regionförteckning (efter regionernas filer) och rapport
+            manifest_changed = write_regions_manifest(regions)
+            report = summary_report(region_reports, success=not failed)
+            write_report(report)
         
-        logger.info("🎉 Auto-update slutförd framgångsrikt!")
-        logger.info(f"📊 Slutlig statistik: {len(all_events)} händelser totalt")
+        # 5. En ny eller ändrad region blir synlig i kartan först nu
+        if manifest_changed:
+            with DEPLOY_LOCK:
+                deploy_site()
+        
+        if failed:
+            failed_regions = ', '.join(region_id for region_id, report in region_reports.items() if 'error' in report)
+            logger.error(f"❌ Auto-update slutförd med fel i: {failed_regions}")
+        else:
+            logger.info("🎉 Auto-update slutförd framgångsrikt!")
+        logger.info(f"📊 Slutlig statistik: {report['final_event_count']} händelser totalt")
+        return not failed
         
     except Exception as e:
         logger.error(f"❌ Auto-update misslyckades: {e}")
@@ -304,11 +696,229 @@ def main():
             'success': False
         }
         
-        with open('update_report.json', 'w', encoding='utf-8') as f:
-            json.dump(error_report, f, indent=2, ensure_ascii=False)
+        write_report(error_report)
         
         raise
 
-if __name__ == '__main__':
-    main()
+class ArrivalRateModel:
+    """
+    Förväntad händelsetakt (händelser per timme) för varje timme i veckan.
+
+    Startvärden tas från arkivets fördelning och justeras sedan med EWMA
+    efter varje hämtning, så att kvällar och helger där händelser klustrar
+    pollas oftare.
+    """
+
+    HOURS_PER_WEEK = 7 * 24
+
+    def __init__(self, alpha=0.2):
+        self.alpha = alpha
+        self.rates = [0.0] * self.HOURS_PER_WEEK
+
+    @staticmethod
+    def slot(moment):
+        local = moment.astimezone(STOCKHOLM_TZ)
+        return local.weekday() * 24 + local.hour
+
+    def seed(self, events):
+        """Initiera takten från arkivets händelser per timme i veckan"""
+        counts = [0] * self.HOURS_PER_WEEK
+        moments = [parse_event_datetime(event.get('datetime', '')) for event in events]
+        moments = [moment for moment in moments if moment]
+        if not moments:
+            return
+        
+        for moment in moments:
+            counts[self.slot(moment)] += 1
+        
+        weeks = max((max(moments) - min(moments)).days / 7, 1)
+        self.rates = [count / weeks for count in counts]
+
+    def observe(self, moment, added, hours):
+        """Uppdatera takten för aktuell timme med en ny observation"""
+        if hours <= 0:
+            return
+        slot = self.slot(moment)
+        self.rates[slot] = (1 - self.alpha) * self.rates[slot] + self.alpha * (added / hours)
+
+    def poll_interval(self, moment, min_seconds, max_seconds, target_events=1.0):
+        """Sekunder tills ungefär target_events nya händelser väntas"""
+        rate = self.rates[self.slot(moment)]
+        if rate <= 0:
+            return max_seconds
+        return int(min(max(target_events / rate * 3600, min_seconds), max_seconds))
 
+def write_health(path, health):
+    """Skriv daemonens hälsostatus atomärt, direkt och utanför körningens staging"""
+    write_atomic(path, json.dumps(health, indent=2, ensure_ascii=False), staged=False)
+
+def run_daemon():
+    """
+    Långlivat daemon-läge: databas, hash-set, gazetteer, arkiv och
+    hotspot-tillstånd hålls varma i minnet per region. Bara regioner med
+    ändringar skrivs ut efter varje hämtning, och av årsarkiven bara de år
+    som fått nya händelser.
+    """
+    daemon_config = load_config().get('daemon', {})
+    min_seconds = daemon_config.get('min_interval_minutes', 5) * 60
+    max_seconds = daemon_config.get('max_interval_minutes', 60) * 60
+    health_file = daemon_config.get('health_file', 'daemon_health.json')
+    
+    logger.info("🔁 Startar daemon-läge")
+    
+    # Daemonen håller låset hela livstiden; cron-körningar köar sina händelser åt den
+    lock, _ = run_lock()
+    if not lock.acquire():
+        logger.info("⏳ Väntar på körningslåset")
+        lock.acquire(timeout=None)
+    recover_staged_outputs()
+    
+    session = requests.Session()
+    regions = load_regions()
+    stores = {region['id']: open_event_store(region) for region in regions}
+    # Händelserna hålls tidsordnade (epoch, händelse) så att retentionsgränsen hittas med bisektion
+    archives = {region_id: list(store.timeline()) for region_id, store in stores.items()}
+    known_hashes = {
+        region_id: {create_event_hash(event) for _, event in archive}
+        for region_id, archive in archives.items()
+    }
+    
+    def events_total():
+        return sum(len(archive) for archive in archives.values())
+    
+    rate_model = ArrivalRateModel()
+    rate_model.seed([event for archive in archives.values() for _, event in archive])
+    
+    # Hotspot-tillstånd per region; läses från fil första varvet och hålls sedan i minnet
+    trackers = {}
+    
+    # Regioner vars nya händelser finns i databasen men ännu inte är publicerade
+    # och deployade, med händelserna sedan förra publiceringen (None efter ett
+    # fel: allt skrivs om). De skrivs ut varje varv tills commit och deploy lyckats.
+    unpublished = {}
+    
+    started_at = datetime.now(STOCKHOLM_TZ)
+    last_poll = None
+    last_success = None
+    failures = 0
+    
+    logger.info(f"🧠 {events_total()} händelser i {len(regions)} regioner ({', '.join(stores)}) i minnet")
+    
+    try:
+        while True:
+            poll_started = datetime.now(STOCKHOLM_TZ)
+            added_events = []
+            
+            try:
+                lock.heartbeat()
+                pending = pending_updates()
+                region_reports = {}
+                failed = []
+                
+                # Ny klient per hämtning (samma session) så att svarscachen inte ger gamla svar
+                client = PoliceApiClient(session)
+                for region in regions:
+                    region_id = region['id']
+                    try:
+                        # Egen transaktion och deploy per region: en region som fallerar
+                        # publicerar inget och en långsam region fördröjer inte de andra
+                        with staged_outputs():
+                            archive = archives[region_id]
+                            existing_count = len(archive)
+                            context = run_update_pipeline(
+                                stores[region_id], region, client=client, known_hashes=known_hashes[region_id],
+                                session=session, queued=queued_events(pending, region_id),
+                                hotspots=trackers.get(region_id)
+                            )
+                            trackers[region_id] = context.hotspots
+                            added_events.extend(context.added_events)
+                            
+                            # Skriv bara ut regioner där något ändrats eller som inte hann publiceras
+                            if context.added_events:
+                                insert_events(archive, context.added_events)
+                                added = unpublished.setdefault(region_id, [])
+                                if added is not None:
+                                    added.extend(context.added_events)
+                            if region_id in unpublished:
+                                # Ingen tidsstämplad backup per flush; databasen är den beständiga kopian
+                                region_reports[region_id] = publish_outputs(
+                                    stores[region_id], archive, existing_count, context,
+                                    backup=False, region=region, added=unpublished[region_id]
+                                )
+                        
+                        if region_id in region_reports:
+                            with DEPLOY_LOCK:
+                                if not deploy_site():
+                                    raise RuntimeError("Deploy misslyckades, publiceras igen nästa varv")
+                            unpublished.pop(region_id)
+                    except Exception as e:
+                        logger.error(f"❌ [{region_id}] Hämtning misslyckades: {e}")
+                        failed.append(region_id)
+                        # Händelser kan redan ha sparats; läs om regionen och publicera allt nästa varv
+                        archives[region_id] = list(stores[region_id].timeline())
+                        known_hashes[region_id] = {create_event_hash(event) for _, event in archives[region_id]}
+                        unpublished[region_id] = None
+                        # Tillståndet kan ha räknat händelser som rullades tillbaka; bygg om det från databasen
+                        if trackers.get(region_id) is not None:
+                            trackers[region_id].reset()
+                
+                with staged_outputs():
+                    if region_reports:
+                        write_report(summary_report(region_reports, success=not failed))
+                    # Bara köfiler vars händelser slogs in för alla sina regioner tas bort
+                    consume_updates(merged_updates(pending, [region['id'] for region in regions if region['id'] not in failed]))
+                
+                if failed:
+                    raise RuntimeError(f"Misslyckades för {', '.join(failed)}")
+                
+                if last_poll:
+                    hours = (poll_started - last_poll).total_seconds() / 3600
+                    rate_model.observe(poll_started, len(added_events), hours)
+                
+                last_success = poll_started
+                failures = 0
+                
+            except Exception as e:
+                failures += 1
+                logger.error(f"❌ Hämtning misslyckades ({failures} i rad): {e}")
+            
+            last_poll = poll_started
+            
+            if failures:
+                # Exponentiell backoff vid fel
+                interval = min(min_seconds * 2 ** failures, max_seconds)
+            else:
+                interval = rate_model.poll_interval(poll_started, min_seconds, max_seconds)
+            
+            write_health(health_file, {
+                'pid': os.getpid(),
+                'started_at': started_at.isoformat(),
+                'last_poll': last_poll.isoformat(),
+                'last_success': last_success.isoformat() if last_success else None,
+                'consecutive_failures': failures,
+                'events_total': events_total(),
+                'events_added_last_poll': len(added_events),
+                'poll_interval_seconds': interval,
+                'next_poll': (poll_started + timedelta(seconds=interval)).isoformat()
+            })
+            
+            logger.info(f"⏱️ Nästa hämtning om {interval // 60} min")
+            time.sleep(interval)
+            
+    except KeyboardInterrupt:
+        logger.info("👋 Avslutar daemon")
+    finally:
+        for store in stores.values():
+            store.close()
+        session.close()
+        lock.release()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Stockholm Violence Map auto-update')
+    parser.add_argument('--daemon', action='store_true', help='Kör som långlivad process med adaptiv pollning')
+    args = parser.parse_args()
+    
+    if args.daemon:
+        run_daemon()
+    else:
+        sys.exit(0 if main() else 1)
@@ -0,0 +1,251 @@
+// Canvas-punktlager för Stockholm Våldskarta
+// Ritar alla händelser från en typad array på en enda canvas i stället för
+// en SVG-nod per händelse. Klick hittas via ett rutnätsindex i skärmpixlar.
+
+(function () {
+    const TILE_SIZE = 256;
+    const HIT_CELL_SIZE = 16;
+    const HIT_TOLERANCE = 3;
+
+    // Project lat/lng to Web Mercator world pixels at zoom 0
+    function projectPoints(coords) {
+        const count = coords.length / 2;
+        const projected = new Float64Array(count * 2);
+
+        for (let k = 0; k < count; k++) {
+            const lat = Math.max(Math.min(coords[k * 2], 85.0511), -85.0511);
+            const lng = coords[k * 2 + 1];
+            const sin = Math.sin(lat * Math.PI / 180);
+
+            projected[k * 2] = TILE_SIZE * (lng + 180) / 360;
+            projected[k * 2 + 1] = TILE_SIZE * (0.5 - Math.log((1 + sin) / (1 - sin)) / (4 * Math.PI));
+        }
+
+        return projected;
+    }
+
+    L.CanvasPointLayer = L.Layer.extend({
+        options: {
+            radius: 6,
+            offsetRadius: 5,
+            defaultColor: '#718096',
+            onClick: null
+        },
+
+        initialize: function (options) {
+            L.setOptions(this, options);
+            this._points = null;
+            this._sprites = {};
+        },
+
+        onAdd: function (map) {
+            this._canvas = L.DomUtil.create('canvas', 'leaflet-zoom-hide');
+            this._canvas.style.pointerEvents = 'none';
+            map.getPane('overlayPane').appendChild(this._canvas);
+
+            map.on('moveend viewreset resize', this._redraw, this);
+            map.on('click', this._onMapClick, this);
+            map.on('mousemove', this._onMouseMove, this);
+            this._redraw();
+        },
+
+        onRemove: function (map) {
+            L.DomUtil.remove(this._canvas);
+            map.off('moveend viewreset resize', this._redraw, this);
+            map.off('click', this._onMapClick, this);
+            map.off('mousemove', this._onMouseMove, this);
+        },
+
+        // points: { coords, groupSizes, typeCodes, typeNames, indices } from the data worker
+        setData: function (points, colors) {
+            this._points = points;
+            this._projected = projectPoints(points.coords);
+            this._typeColors = points.typeNames.map(type => colors[type] || this.options.defaultColor);
+            this._redraw();
+        },
+
+        clear: function () {
+            this._points = null;
+            this._redraw();
+        },
+
+        // Pre-render one circle per color/radius; drawImage is much cheaper than arc+fill per point
+        _sprite: function (color, radius, weight, fillOpacity) {
+            const key = `${color}|${radius}`;
+            if (this._sprites[key]) {
+                return this._sprites[key];
+            }
+
+            const ratio = window.devicePixelRatio || 1;
+            const size = Math.ceil((radius + weight) * 2 * ratio);
+            const sprite = document.createElement('canvas');
+            sprite.width = size;
+            sprite.height = size;
+
+            const ctx = sprite.getContext('2d');
+            ctx.scale(ratio, ratio);
+            ctx.beginPath();
+            ctx.arc(size / ratio / 2, size / ratio / 2, radius, 0, 2 * Math.PI);
+            ctx.globalAlpha = fillOpacity;
+            ctx.fillStyle = color;
+            ctx.fill();
+            ctx.globalAlpha = 1;
+            ctx.lineWidth = weight;
+            ctx.strokeStyle = '#fff';
+            ctx.stroke();
+
+            this._sprites[key] = sprite;
+            return sprite;
+        },
+
+        _redraw: function () {
+            if (!this._map) {
+                return;
+            }
+
+            const map = this._map;
+            const size = map.getSize();
+            const ratio = window.devicePixelRatio || 1;
+            const canvas = this._canvas;
+
+            // Keep the canvas aligned with the container after panning
+            L.DomUtil.setPosition(canvas, map.containerPointToLayerPoint([0, 0]));
+            canvas.width = size.x * ratio;
+            canvas.height = size.y * ratio;
+            canvas.style.width = `${size.x}px`;
+            canvas.style.height = `${size.y}px`;
+
+            const ctx = canvas.getContext('2d');
+            ctx.clearRect(0, 0, canvas.width, canvas.height);
+
+            this._screen = null;
+            if (!this._points) {
+                return;
+            }
+
+            const { groupSizes, typeCodes } = this._points;
+            const projected = this._projected;
+            const count = groupSizes.length;
+
+            const scale = Math.pow(2, map.getZoom());
+            const origin = map.getPixelBounds().min;
+            const margin = this.options.radius + 2;
+
+            // Screen positions of visible points, reused by the hit-test grid
+            const screen = new Float32Array(count * 2);
+            const visible = new Uint32Array(count);
+            let visibleCount = 0;
+
+            for (let k = 0; k < count; k++) {
+                const x = projected[k * 2] * scale - origin.x;
+                const y = projected[k * 2 + 1] * scale - origin.y;
+                screen[k * 2] = x;
+                screen[k * 2 + 1] = y;
+
+                if (x < -margin || y < -margin || x > size.x + margin || y > size.y + margin) {
+                    continue;
+                }
+                visible[visibleCount++] = k;
+            }
+
+            // Sprite lookup table: [type * 2] = single point, [type * 2 + 1] = offset point
+            const sprites = [];
+            this._typeColors.forEach(color => {
+                sprites.push(this._sprite(color, this.options.radius, 2, 0.8));
+                sprites.push(this._sprite(color, this.options.offsetRadius, 1.5, 0.9));
+            });
+
+            for (let v = 0; v < visibleCount; v++) {
+                const k = visible[v];
+                const sprite = sprites[typeCodes[k] * 2 + (groupSizes[k] > 1 ? 1 : 0)];
+                const half = sprite.width / 2;
+                ctx.drawImage(sprite, screen[k * 2] * ratio - half, screen[k * 2 + 1] * ratio - half);
+            }
+
+            this._screen = screen;
+            this._buildHitGrid(visible.subarray(0, visibleCount), size);
+        },
+
+        // Bucket visible points into fixed-size screen cells (counting sort, CSR layout)
+        _buildHitGrid: function (visible, size) {
+            const columns = Math.ceil(size.x / HIT_CELL_SIZE) + 1;
+            const rows = Math.ceil(size.y / HIT_CELL_SIZE) + 1;
+            const cellOf = new Int32Array(visible.length);
+            const cellStart = new Uint32Array(columns * rows + 1);
+
+            for (let v = 0; v < visible.length; v++) {
+                const k = visible[v];
+                const column = Math.min(Math.max(Math.floor(this._screen[k * 2] / HIT_CELL_SIZE), 0), columns - 1);
+                const row = Math.min(Math.max(Math.floor(this._screen[k * 2 + 1] / HIT_CELL_SIZE), 0), rows - 1);
+                cellOf[v] = row * columns + column;
+                cellStart[cellOf[v] + 1]++;
+            }
+
+            for (let c = 0; c < columns * rows; c++) {
+                cellStart[c + 1] += cellStart[c];
+            }
+
+            const fill = cellStart.slice(0, columns * rows);
+            const cellItems = new Uint32Array(visible.length);
+            for (let v = 0; v < visible.length; v++) {
+                cellItems[fill[cellOf[v]]++] = visible[v];
+            }
+
+            this._grid = { columns, rows, cellStart, cellItems };
+        },
+
+        // Nearest drawn point under a container point, or -1
+        _hitTest: function (point) {
+            if (!this._screen || !this._grid) {
+                return -1;
+            }
+
+            const { columns, rows, cellStart, cellItems } = this._grid;
+            const reach = this.options.radius + HIT_TOLERANCE;
+            const column = Math.floor(point.x / HIT_CELL_SIZE);
+            const row = Math.floor(point.y / HIT_CELL_SIZE);
+
+            let best = -1;
+            let bestDistance = reach * reach;
+
+            // Later points are drawn on top, so prefer them on ties
+            for (let r = Math.max(row - 1, 0); r <= Math.min(row + 1, rows - 1); r++) {
+                for (let c = Math.max(column - 1, 0); c <= Math.min(column + 1, columns - 1); c++) {
+                    const cell = r * columns + c;
+                    for (let i = cellStart[cell]; i < cellStart[cell + 1]; i++) {
+                        const k = cellItems[i];
+                        const dx = this._screen[k * 2] - point.x;
+                        const dy = this._screen[k * 2 + 1] - point.y;
+                        const distance = dx * dx + dy * dy;
+                        if (distance < bestDistance || (distance === bestDistance && k > best)) {
+                            best = k;
+                            bestDistance = distance;
+                        }
+                    }
+                }
+            }
+
+            return best;
+        },
+
+        _onMapClick: function (e) {
+            const k = this._hitTest(e.containerPoint);
+            if (k >= 0 && this.options.onClick) {
+                const { coords, indices, groupSizes } = this._points;
+                this.options.onClick({
+                    latlng: L.latLng(coords[k * 2], coords[k * 2 + 1]),
+                    index: indices[k],
+                    groupSize: groupSizes[k]
+                });
+            }
+        },
+
+        _onMouseMove: function (e) {
+            this._map.getContainer().style.cursor = this._hitTest(e.containerPoint) >= 0 ? 'pointer' : '';
+        }
+    });
+
+    L.canvasPointLayer = function (options) {
+        return new L.CanvasPointLayer(options);
+    };
+})();
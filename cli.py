@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+"""
+Gemensam ingång för Stockholm Våldskarta
+
+    python cli.py update [--diagnose]   hämta, slå samman, exportera och deploya
+    python cli.py diagnose              kontrollera API-svaret och befintliga filer
+    python cli.py probe                 jämför olika parametrar mot polisen.se API
+    python cli.py stats                 statistik över arkivet (utan nätverk)
+
+Kommandona delar en HTTP-session och svarscache: `update --diagnose`
+diagnostiserar samma svar som uppdateringen hämtade. Moduler importeras
+först i respektive kommando så att `stats` startar utan requests och
+resten av uppdateringskedjan.
+"""
+
+import argparse
+import sys
+
+def print_header(title, width=40):
+    print(f"\n{title}")
+    print("=" * width)
+
+def print_event(number, event):
+    location = event.get('location_name') or (event.get('location') or {}).get('name', 'N/A')
+    print(f"  {number}. {event.get('type', 'N/A')} - {event.get('datetime', 'N/A')}")
+    print(f"     Plats: {location}")
+
+def last_added_count(region_id, report_file='update_report.json'):
+    """Antal tillagda händelser för regionen enligt senaste körningens rapport"""
+    import json
+
+    try:
+        with open(report_file, 'r', encoding='utf-8') as f:
+            report = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return 'N/A'
+    region_report = report.get('regions', {}).get(region_id) or report
+    return region_report.get('new_events_added', 'N/A')
+
+def diagnose_region(client, region):
+    """API-svaret för regionen (från cachen om uppdateringen redan hämtat det) och dess datafil"""
+    import json
+
+    import requests
+
+    from auto_update import is_violence_event
+
+    print_header(f"🔍 {region['name'].upper()}: POLISEN.SE API")
+
+    requests_before = client.requests_made
+    try:
+        response = client.fetch(locationname=region['locationname'])
+    except requests.RequestException as e:
+        print(f"❌ API-fel: {e}")
+        return False
+
+    source = 'cache, hämtat av uppdateringen' if client.requests_made == requests_before else 'nytt anrop'
+    print(f"📡 API Response: {response.status_code} ({source})")
+    print(f"🔗 URL: {response.url}")
+    print(f"📏 {response.size} bytes på {response.elapsed * 1000:.0f} ms")
+    print(f"📥 Totalt antal händelser: {len(response.events)}")
+
+    print("\n📋 FÖRSTA 5 HÄNDELSER:")
+    for i, event in enumerate(response.events[:5]):
+        print_event(i + 1, event)
+
+    violence_events = [event for event in response.events if is_violence_event(event)]
+    print(f"\n📊 TOTALT VÅLDSHÄNDELSER: {len(violence_events)}")
+
+    print_header(f"🔍 {region['name'].upper()}: {region['data_file']}")
+    try:
+        with open(region['data_file'], 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError) as e:
+        print(f"❌ Fel vid läsning av JSON: {e}")
+        return False
+
+    events = data.get('events', [])
+    metadata = data.get('metadata', {})
+    print(f"📊 Antal händelser i fil: {len(events)}")
+    print(f"📅 Senast uppdaterad: {metadata.get('last_updated', 'N/A')}")
+    print(f"➕ Nya händelser senast: {last_added_count(region['id'])}")
+
+    if events:
+        print("\n📋 SENASTE 3 HÄNDELSER I FILEN:")
+        latest = sorted(events, key=lambda event: event.get('datetime', ''), reverse=True)
+        for i, event in enumerate(latest[:3]):
+            print_event(i + 1, event)
+
+    return True
+
+def run_diagnose(client, region_id=None):
+    from auto_update import load_regions
+
+    regions = [region for region in load_regions() if region_id in (None, region['id'])]
+    results = [diagnose_region(client, region) for region in regions]
+    return 0 if all(results) else 1
+
+def cmd_update(args):
+    from auto_update import main as update_main
+    from police_api import PoliceApiClient
+
+    with PoliceApiClient() as client:
+        try:
+            success = update_main(client)
+        finally:
+            if args.diagnose:
+                run_diagnose(client)
+    return 0 if success else 1
+
+def cmd_diagnose(args):
+    from police_api import PoliceApiClient
+
+    with PoliceApiClient() as client:
+        return run_diagnose(client, args.region)
+
+def cmd_probe(args):
+    """Samma frågor som de gamla API-testerna; dubbletter besvaras från cachen"""
+    from datetime import datetime, timedelta
+
+    import requests
+
+    from police_api import PoliceApiClient
+
+    end_date = datetime.now()
+    start_date = end_date - timedelta(days=7)
+    date_range = f"{start_date.strftime('%Y-%m-%d')},{end_date.strftime('%Y-%m-%d')}"
+
+    probes = [
+        ('Grundläggande API-anrop', {}),
+        ('Med Stockholm som locationname', {'locationname': 'Stockholm'}),
+        ('Med datum-parametrar', {'DateTime': date_range, 'locationname': 'Stockholm'}),
+    ] + [(f"Location '{location}'", {'locationname': location}) for location in args.locations]
+
+    failures = 0
+    with PoliceApiClient() as client:
+        for number, (title, params) in enumerate(probes, 1):
+            print_header(f"🧪 TEST {number}: {title}", width=50)
+            try:
+                response = client.fetch(**params)
+            except requests.RequestException as e:
+                print(f"❌ Exception: {e}")
+                failures += 1
+                continue
+
+            print(f"📡 Status: {response.status_code}")
+            print(f"🔗 URL: {response.url}")
+            print(f"📥 Antal händelser: {len(response.events)}")
+            for i, event in enumerate(response.events[:3]):
+                print_event(i + 1, event)
+
+        print(f"\n📡 {client.requests_made} API-anrop för {len(probes)} tester")
+    return 1 if failures else 0
+
+def cmd_stats(args):
+    """Statistik direkt från arkivfilen; importerar bara standardbiblioteket"""
+    import json
+    from collections import Counter
+
+    paths = [args.file] if args.file else [f"{args.region}_violence_archive.json", f"{args.region}_violence_data.json"]
+    for path in paths:
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            break
+        except FileNotFoundError:
+            continue
+    else:
+        print(f"❌ Hittade ingen datafil: {', '.join(paths)}")
+        return 1
+
+    events = data.get('events', [])
+    metadata = data.get('metadata', {})
+    dates = sorted(event['datetime'] for event in events if event.get('datetime'))
+
+    print_header(f"📊 {path}")
+    print(f"📊 Antal händelser: {len(events)}")
+    print(f"📅 Senast uppdaterad: {metadata.get('last_updated', 'N/A')}")
+    if dates:
+        print(f"🗓️ Period: {dates[0][:10]} till {dates[-1][:10]}")
+
+    sections = [
+        ('🗓️ PER ÅR', Counter(date[:4] for date in dates)),
+        ('🚨 PER TYP', Counter(event.get('type', 'N/A') for event in events)),
+        ('📍 PER OMRÅDE', Counter(event.get('matched_area') or event.get('improved_area') or 'okänt' for event in events)),
+    ]
+    for title, counts in sections:
+        print(f"\n{title}:")
+        items = sorted(counts.items()) if title.endswith('ÅR') else counts.most_common(args.top)
+        for name, count in items:
+            print(f"  {name}: {count}")
+    return 0
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Stockholm Våldskarta')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    update_parser = subparsers.add_parser('update', help='Hämta, slå samman, exportera och deploya')
+    update_parser.add_argument('--diagnose', action='store_true', help='Diagnostisera de hämtade svaren efteråt')
+    update_parser.set_defaults(handler=cmd_update)
+
+    diagnose_parser = subparsers.add_parser('diagnose', help='Kontrollera API-svaret och befintliga datafiler')
+    diagnose_parser.add_argument('--region', help='Bara en region (id i config.json)')
+    diagnose_parser.set_defaults(handler=cmd_diagnose)
+
+    probe_parser = subparsers.add_parser('probe', help='Jämför olika API-parametrar')
+    probe_parser.add_argument('--locations', nargs='*', default=['Stockholm', 'Stockholms län', 'Stockholm stad'])
+    probe_parser.set_defaults(handler=cmd_probe)
+
+    stats_parser = subparsers.add_parser('stats', help='Statistik över arkivet')
+    stats_parser.add_argument('--region', default='stockholm')
+    stats_parser.add_argument('--file', help='Annan datafil än regionens arkiv')
+    stats_parser.add_argument('--top', type=int, default=10)
+    stats_parser.set_defaults(handler=cmd_stats)
+
+    args = parser.parse_args(argv)
+    return args.handler(args)
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,611 @@
+// Data worker för Stockholm Våldskarta
+// Parsning, filtrering och spridning av överlappande markörer körs här,
+// utanför huvudtråden. Huvudtråden får bara tillbaka typade arrayer med
+// visningskoordinater och index, och hämtar enskilda händelser vid klick.
+
+let events = [];
+let latitudes = new Float64Array(0);
+let longitudes = new Float64Array(0);
+let typeCodes = new Uint16Array(0);
+let typeNames = [];
+
+// Filter bitsets: one bit per event, 32-bit words, aligned with event order
+let wordCount = 0;
+let typeBitsets = new Map();
+let yearBitsets = new Map();
+let validBitset = new Uint32Array(0);
+
+const OFFSET_RADIUS = 0.002; // About 200 meters
+
+// Full-text search index (search_index.py): manifest and shards are fetched
+// lazily, shards are cached for the lifetime of the dataset
+let searchIndexUrl = null;
+let searchManifest = null;
+let searchShards = new Map();
+let lastSearch = { query: '', mask: null };
+
+// Tokenisation and Snowball stemming, kept in sync with search_index.py
+const TOKEN_PATTERN = /[0-9a-zåäöéü]+/g;
+const STOPWORDS = new Set(`
+alla allt att av blev bli blir de dem den denna deras dess det detta dig din
+ditt du där efter ej eller en er era ett från för ha hade han hans har hon
+honom hur här i icke ingen inom inte jag ju kan kunde man med mellan men mig
+min mina mot mycket ni nu någon något några när och om oss på samma sedan sig
+sin sina sitta själv skulle som så sådan till under upp ut utan vad var vara
+varit vars vart vem vi vid vilka vilken vilket vår vårt än är åt över
+`.split(/\s+/).filter(Boolean));
+const VOWELS = new Set('aeiouyäåö');
+const S_ENDINGS = new Set('bcdfghjklmnoprtvy');
+const STEP1_SUFFIXES = `
+a arna erna heterna orna ad e ade ande arne are aste en anden aren heten ern
+ar er heter or as arnas ernas ornas es ades andes ens arens hetens erns at
+andet het ast
+`.split(/\s+/).filter(Boolean).sort((a, b) => b.length - a.length);
+const STEP2_ENDINGS = ['dd', 'gd', 'nn', 'dt', 'gt', 'kt', 'tt'];
+
+function regionOne(word) {
+    for (let i = 1; i < word.length; i++) {
+        if (!VOWELS.has(word[i]) && VOWELS.has(word[i - 1])) {
+            return Math.max(i + 1, 3);
+        }
+    }
+    return word.length;
+}
+
+function stem(word) {
+    const r1 = regionOne(word);
+    const inR1 = suffix => word.endsWith(suffix) && word.length - suffix.length >= r1;
+
+    const suffix = STEP1_SUFFIXES.find(inR1);
+    if (suffix) {
+        word = word.slice(0, -suffix.length);
+    } else if (inR1('s') && word.length > 1 && S_ENDINGS.has(word[word.length - 2])) {
+        word = word.slice(0, -1);
+    }
+
+    if (STEP2_ENDINGS.some(inR1)) {
+        word = word.slice(0, -1);
+    }
+
+    if (inR1('fullt') || inR1('löst')) {
+        word = word.slice(0, -1);
+    } else {
+        const derivational = ['lig', 'els', 'ig'].find(inR1);
+        if (derivational) {
+            word = word.slice(0, -derivational.length);
+        }
+    }
+
+    return word;
+}
+
+function searchTokens(query) {
+    return (query.toLowerCase().match(TOKEN_PATTERN) || [])
+        .filter(token => token.length > 1 && !STOPWORDS.has(token))
+        .map(stem);
+}
+
+// Decode a base64 bitset from the export (little-endian words, as on all browser platforms)
+function decodeBitset(encoded) {
+    const binary = atob(encoded);
+    const bytes = new Uint8Array(wordCount * 4);
+    for (let i = 0; i < binary.length && i < bytes.length; i++) {
+        bytes[i] = binary.charCodeAt(i);
+    }
+    return new Uint32Array(bytes.buffer);
+}
+
+function setBit(bitsets, key, i) {
+    let bitset = bitsets.get(key);
+    if (!bitset) {
+        bitset = new Uint32Array(wordCount);
+        bitsets.set(key, bitset);
+    }
+    bitset[i >> 5] |= 1 << (i & 31);
+}
+
+// Build columnar arrays once per dataset so filtering never touches the event objects.
+// The precomputed filter_index from the export is used when it matches the events.
+function indexEvents(newEvents, filterIndex) {
+    events = newEvents;
+    const count = events.length;
+    wordCount = (count + 31) >> 5;
+
+    latitudes = new Float64Array(count);
+    longitudes = new Float64Array(count);
+    typeCodes = new Uint16Array(count);
+    typeNames = [];
+    typeBitsets = new Map();
+    yearBitsets = new Map();
+    validBitset = new Uint32Array(wordCount);
+
+    const shipped = filterIndex && filterIndex.version === 1 && filterIndex.count === count;
+    if (shipped) {
+        Object.entries(filterIndex.types).forEach(([type, encoded]) => typeBitsets.set(type, decodeBitset(encoded)));
+        Object.entries(filterIndex.years).forEach(([year, encoded]) => yearBitsets.set(year, decodeBitset(encoded)));
+    }
+
+    const typeIndex = new Map();
+    const typeCounts = {};
+
+    for (let i = 0; i < count; i++) {
+        const event = events[i];
+        const type = event.type || 'Okänd';
+
+        let code = typeIndex.get(type);
+        if (code === undefined) {
+            code = typeNames.length;
+            typeIndex.set(type, code);
+            typeNames.push(type);
+        }
+
+        latitudes[i] = parseFloat(event.latitude);
+        longitudes[i] = parseFloat(event.longitude);
+        typeCodes[i] = code;
+        typeCounts[type] = (typeCounts[type] || 0) + 1;
+
+        if (!isNaN(latitudes[i]) && !isNaN(longitudes[i])) {
+            validBitset[i >> 5] |= 1 << (i & 31);
+        }
+
+        if (!shipped) {
+            setBit(typeBitsets, type, i);
+            const year = event.datetime ? event.datetime.substring(0, 4) : '';
+            if (year) {
+                setBit(yearBitsets, year, i);
+            }
+        }
+    }
+
+    const years = Array.from(yearBitsets.keys()).sort();
+    return { count, typeCounts, typeNames, years, filterIndex: shipped ? 'shipped' : 'built' };
+}
+
+// Indices of events matching the year and type filters (types === null means all).
+// Resolved with OR over the type bitsets and AND with the year, coordinate and search bitsets.
+function filterEvents(year, types, search = null) {
+    const mask = new Uint32Array(wordCount);
+
+    if (types === null) {
+        mask.set(validBitset);
+    } else {
+        types.forEach(type => {
+            const bitset = typeBitsets.get(type);
+            if (!bitset) return;
+            for (let w = 0; w < wordCount; w++) {
+                mask[w] |= bitset[w];
+            }
+        });
+        for (let w = 0; w < wordCount; w++) {
+            mask[w] &= validBitset[w];
+        }
+    }
+
+    if (year !== 'all') {
+        const bitset = yearBitsets.get(year);
+        for (let w = 0; w < wordCount; w++) {
+            mask[w] &= bitset ? bitset[w] : 0;
+        }
+    }
+
+    if (search) {
+        for (let w = 0; w < wordCount; w++) {
+            mask[w] &= search[w];
+        }
+    }
+
+    const matches = new Uint32Array(events.length);
+    let count = 0;
+
+    for (let w = 0; w < wordCount; w++) {
+        let bits = mask[w];
+        while (bits) {
+            const lowest = bits & -bits;
+            matches[count++] = (w << 5) + (31 - Math.clz32(lowest));
+            bits ^= lowest;
+        }
+    }
+
+    return matches.slice(0, count);
+}
+
+// Spread events sharing the exact same location on a small circle
+function computeDisplayPoints(indices) {
+    const groups = new Map();
+
+    for (let k = 0; k < indices.length; k++) {
+        const i = indices[k];
+        const key = `${Math.round(latitudes[i] * 1e6)}:${Math.round(longitudes[i] * 1e6)}`;
+
+        let group = groups.get(key);
+        if (!group) {
+            group = [];
+            groups.set(key, group);
+        }
+        group.push(i);
+    }
+
+    const count = indices.length;
+    const outIndices = new Uint32Array(count);
+    const coords = new Float64Array(count * 2);
+    const groupSizes = new Uint16Array(count);
+    const outTypes = new Uint16Array(count);
+
+    let pos = 0;
+    groups.forEach(group => {
+        const size = group.length;
+        const originalLat = latitudes[group[0]];
+        const originalLng = longitudes[group[0]];
+
+        group.forEach((i, index) => {
+            let lat = originalLat;
+            let lng = originalLng;
+
+            if (size > 1) {
+                const angle = (index / size) * 2 * Math.PI;
+                lat += OFFSET_RADIUS * Math.cos(angle);
+                lng += OFFSET_RADIUS * Math.sin(angle);
+            }
+
+            outIndices[pos] = i;
+            coords[pos * 2] = lat;
+            coords[pos * 2 + 1] = lng;
+            groupSizes[pos] = Math.min(size, 65535);
+            outTypes[pos] = typeCodes[i];
+            pos++;
+        });
+    });
+
+    return { indices: outIndices, coords, groupSizes, typeCodes: outTypes, typeNames };
+}
+
+function resetSearch(url) {
+    searchIndexUrl = url;
+    searchManifest = null;
+    searchShards = new Map();
+    lastSearch = { query: '', mask: null };
+}
+
+async function loadSearchManifest() {
+    if (!searchManifest) {
+        const response = await fetch(`${searchIndexUrl}?v=${Date.now()}`, { cache: 'no-cache' });
+        if (!response.ok) {
+            throw new Error(`HTTP ${response.status}`);
+        }
+        searchManifest = await response.json();
+    }
+    return searchManifest;
+}
+
+// Sorted terms and decoded posting lists for one prefix shard
+async function loadSearchShard(key) {
+    const entry = searchManifest.shards[key];
+    if (!entry) {
+        return null;
+    }
+    if (!searchShards.has(key)) {
+        const base = searchIndexUrl.slice(0, searchIndexUrl.lastIndexOf('/') + 1);
+        const shard = fetch(`${base}${entry.file}?v=${entry.digest}`)
+            .then(response => {
+                if (!response.ok) {
+                    throw new Error(`HTTP ${response.status}`);
+                }
+                return response.json();
+            })
+            .then(data => {
+                const terms = Object.keys(data.terms).sort();
+                const postings = terms.map(term => {
+                    const deltas = data.terms[term];
+                    const positions = new Uint32Array(deltas.length);
+                    let position = 0;
+                    deltas.forEach((delta, i) => {
+                        position += delta;
+                        positions[i] = position;
+                    });
+                    return positions;
+                });
+                return { terms, postings };
+            });
+        searchShards.set(key, shard);
+        shard.catch(() => searchShards.delete(key));
+    }
+    return searchShards.get(key);
+}
+
+// Bitset of events matching every token as a prefix of an indexed term
+async function indexedSearchMask(tokens) {
+    const manifest = await loadSearchManifest();
+    if (manifest.version !== 1 || manifest.count !== events.length) {
+        throw new Error('Search index does not match the loaded data');
+    }
+
+    let mask = null;
+    for (const token of tokens) {
+        const tokenMask = new Uint32Array(wordCount);
+        const shard = await loadSearchShard(token.slice(0, manifest.prefix_length));
+
+        if (shard) {
+            // Binary search for the first term >= token, then walk the prefix range
+            let low = 0;
+            let high = shard.terms.length;
+            while (low < high) {
+                const mid = (low + high) >> 1;
+                if (shard.terms[mid] < token) {
+                    low = mid + 1;
+                } else {
+                    high = mid;
+                }
+            }
+            for (let t = low; t < shard.terms.length && shard.terms[t].startsWith(token); t++) {
+                shard.postings[t].forEach(i => {
+                    tokenMask[i >> 5] |= 1 << (i & 31);
+                });
+            }
+        }
+
+        if (mask) {
+            for (let w = 0; w < wordCount; w++) {
+                mask[w] &= tokenMask[w];
+            }
+        } else {
+            mask = tokenMask;
+        }
+    }
+    return mask;
+}
+
+// Fallback without a usable index (viewport mode, stale index): scan the events
+function scanSearchMask(tokens) {
+    const mask = new Uint32Array(wordCount);
+    for (let i = 0; i < events.length; i++) {
+        const event = events[i];
+        const location = event.location_name || (event.location && event.location.name) || '';
+        const terms = searchTokens(`${event.summary || ''} ${location}`);
+        if (tokens.every(token => terms.some(term => term.startsWith(token)))) {
+            mask[i >> 5] |= 1 << (i & 31);
+        }
+    }
+    return mask;
+}
+
+async function searchMask(query) {
+    const tokens = searchTokens(query || '');
+    if (!tokens.length) {
+        return null;
+    }
+
+    const key = tokens.join(' ');
+    if (lastSearch.query === key) {
+        return lastSearch.mask;
+    }
+
+    let mask;
+    try {
+        mask = searchIndexUrl ? await indexedSearchMask(tokens) : scanSearchMask(tokens);
+    } catch (error) {
+        console.warn('Search index unavailable, scanning events:', error);
+        mask = scanSearchMask(tokens);
+    }
+
+    lastSearch = { query: key, mask };
+    return mask;
+}
+
+function displayTransfer(result) {
+    return [result.indices.buffer, result.coords.buffer, result.groupSizes.buffer, result.typeCodes.buffer];
+}
+
+// Dataset cache (delta_feed.py): each region's events are kept in IndexedDB
+// with their data version; a returning visitor fetches feed.json and only
+// the delta files since the cached version
+const CACHE_DB = 'stockholm-violence-map';
+const CACHE_STORE = 'datasets';
+let cacheDb = null;
+
+function openCacheDb() {
+    if (!cacheDb) {
+        cacheDb = new Promise((resolve, reject) => {
+            const request = indexedDB.open(CACHE_DB, 1);
+            request.onupgradeneeded = () => request.result.createObjectStore(CACHE_STORE);
+            request.onsuccess = () => resolve(request.result);
+            request.onerror = () => reject(request.error);
+        });
+        cacheDb.catch(() => { cacheDb = null; });
+    }
+    return cacheDb;
+}
+
+async function cacheRequest(mode, operation) {
+    const db = await openCacheDb();
+    return new Promise((resolve, reject) => {
+        const request = operation(db.transaction(CACHE_STORE, mode).objectStore(CACHE_STORE));
+        request.onsuccess = () => resolve(request.result);
+        request.onerror = () => reject(request.error);
+    });
+}
+
+function readCachedDataset(key) {
+    return cacheRequest('readonly', store => store.get(key));
+}
+
+function writeCachedDataset(key, dataset) {
+    return cacheRequest('readwrite', store => store.put(dataset, key)).catch(error => {
+        console.warn('Could not cache dataset:', error);
+    });
+}
+
+// Same identity as create_event_hash in data_format.py
+function eventKey(event) {
+    return `${event.datetime || ''}\u0000${event.type || ''}\u0000${(event.summary || '').trim()}`;
+}
+
+// Same order as event_sort_key in data_format.py, so search index positions match
+function compareEvents(a, b) {
+    const aNumeric = Number.isInteger(a.id);
+    const bNumeric = Number.isInteger(b.id);
+    if (aNumeric !== bNumeric) {
+        return aNumeric ? -1 : 1;
+    }
+    if (aNumeric && a.id !== b.id) {
+        return a.id - b.id;
+    }
+    const aTiebreak = `${a.datetime || ''}${a.type || ''}${a.summary || ''}`;
+    const bTiebreak = `${b.datetime || ''}${b.type || ''}${b.summary || ''}`;
+    return aTiebreak < bTiebreak ? -1 : aTiebreak > bTiebreak ? 1 : 0;
+}
+
+async function fetchJson(url, options) {
+    const response = await fetch(url, options);
+    if (!response.ok) {
+        throw new Error(`HTTP ${response.status}`);
+    }
+    return response.json();
+}
+
+// Bring a cached dataset up to the feed's version, null when the snapshot is cheaper
+async function applyDeltas(cached, feed, feedUrl) {
+    if (cached.version === feed.version) {
+        return cached;
+    }
+    if (cached.version > feed.version || cached.version < feed.oldest_version) {
+        return null;
+    }
+
+    const needed = feed.deltas.filter(delta => delta.version > cached.version);
+    const deltaBytes = needed.reduce((sum, delta) => sum + delta.bytes, 0);
+    if (deltaBytes > feed.snapshot_bytes / 2) {
+        return null;
+    }
+
+    const base = feedUrl.slice(0, feedUrl.lastIndexOf('/') + 1);
+    const deltas = await Promise.all(needed.map(delta => fetchJson(`${base}${delta.file}`)));
+
+    const byKey = new Map(cached.events.map(event => [eventKey(event), event]));
+    deltas.forEach(delta => {
+        delta.removals.forEach(removed => byKey.delete(eventKey(removed)));
+        delta.upserts.forEach(event => byKey.set(eventKey(event), event));
+    });
+
+    const events = Array.from(byKey.values()).sort(compareEvents);
+    if (events.length !== feed.count) {
+        return null; // Out of step with the feed, start over from the snapshot
+    }
+    return { version: feed.version, events, filterIndex: null, deltas: needed.length };
+}
+
+async function fetchSnapshot(url) {
+    return fetchJson(url, {
+        cache: 'no-cache',
+        headers: {
+            'Cache-Control': 'no-cache, no-store, must-revalidate',
+            'Pragma': 'no-cache',
+            'Expires': '0'
+        }
+    });
+}
+
+// Cached dataset plus deltas when possible, otherwise the full data file
+async function loadDataset(url, feedUrl, cacheKey) {
+    let feed = null;
+    if (feedUrl && cacheKey && self.indexedDB) {
+        try {
+            feed = await fetchJson(`${feedUrl}?v=${Date.now()}`, { cache: 'no-cache' });
+        } catch (error) {
+            console.warn('Delta feed unavailable, loading the full data file:', error);
+        }
+    }
+
+    if (feed) {
+        try {
+            const cached = await readCachedDataset(cacheKey);
+            const dataset = cached && await applyDeltas(cached, feed, feedUrl);
+            if (dataset) {
+                if (dataset !== cached) {
+                    writeCachedDataset(cacheKey, { version: dataset.version, events: dataset.events, filterIndex: null });
+                }
+                return { events: dataset.events, filterIndex: dataset.filterIndex, source: dataset.deltas ? 'delta' : 'cache', deltas: dataset.deltas || 0 };
+            }
+        } catch (error) {
+            console.warn('Could not update the cached dataset, loading the full data file:', error);
+        }
+    }
+
+    const data = await fetchSnapshot(url);
+    const events = data.events || [];
+    // Only cache a snapshot that is the one the feed describes
+    if (feed && data.metadata && data.metadata.last_updated === feed.snapshot_updated) {
+        writeCachedDataset(cacheKey, { version: feed.version, events, filterIndex: data.filter_index || null });
+    }
+    return { events, filterIndex: data.filter_index, source: 'snapshot', deltas: 0 };
+}
+
+// Cold yearly archives (time_index.py) are gzip files, merged into the dataset
+// when the user picks an old year. Positions change, so search falls back to scanning.
+async function loadColdArchive(url) {
+    const response = await fetch(url);
+    if (!response.ok) {
+        throw new Error(`HTTP ${response.status}`);
+    }
+
+    // Some hosts already decode the gzip (Content-Encoding), check the magic bytes
+    const bytes = new Uint8Array(await response.arrayBuffer());
+    let text;
+    if (bytes[0] === 0x1f && bytes[1] === 0x8b) {
+        const stream = new Blob([bytes]).stream().pipeThrough(new DecompressionStream('gzip'));
+        text = await new Response(stream).text();
+    } else {
+        text = new TextDecoder().decode(bytes);
+    }
+
+    const byKey = new Map(events.map(event => [eventKey(event), event]));
+    (JSON.parse(text).events || []).forEach(event => byKey.set(eventKey(event), event));
+
+    lastSearch = { query: '', mask: null };
+    return indexEvents(Array.from(byKey.values()).sort(compareEvents), null);
+}
+
+// Only the latest load may replace the dataset (region switches can overlap)
+let latestLoad = 0;
+
+async function loadEvents(url, searchIndex, deltaFeed, cacheKey) {
+    const load = ++latestLoad;
+    const dataset = await loadDataset(url, deltaFeed, cacheKey);
+    if (load !== latestLoad) {
+        throw new Error('Superseded by a newer load');
+    }
+    resetSearch(searchIndex || null);
+    const result = indexEvents(dataset.events, dataset.filterIndex);
+    return { ...result, source: dataset.source, deltas: dataset.deltas };
+}
+
+self.onmessage = async (message) => {
+    const { id, type, payload } = message.data;
+
+    try {
+        if (type === 'load') {
+            self.postMessage({ id, result: await loadEvents(payload.url, payload.searchIndex, payload.deltaFeed, payload.region) });
+
+        } else if (type === 'cold') {
+            self.postMessage({ id, result: await loadColdArchive(payload.url) });
+
+        } else if (type === 'set') {
+            resetSearch(null);
+            indexEvents(payload.events, null);
+            const result = computeDisplayPoints(filterEvents('all', null, await searchMask(payload.query)));
+            self.postMessage({ id, result }, displayTransfer(result));
+
+        } else if (type === 'filter') {
+            const search = await searchMask(payload.query);
+            const result = computeDisplayPoints(filterEvents(payload.year, payload.types, search));
+            self.postMessage({ id, result }, displayTransfer(result));
+
+        } else if (type === 'details') {
+            self.postMessage({ id, result: events[payload.index] || null });
+
+        } else {
+            throw new Error(`Unknown message type: ${type}`);
+        }
+    } catch (error) {
+        self.postMessage({ id, error: error.message });
+    }
+};
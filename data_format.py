@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""
+Kanoniskt filformat för Stockholm Våldskarta
+Stabil sortering på id, en händelse per rad och inga flyktiga fält,
+så att varje git-commit bara innehåller de rader som faktiskt ändrats
+"""
+
+import hashlib
+import json
+import os
+import re
+from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+from staging import active_transaction
+
+# Fält som ändras mellan körningar utan att händelsen ändras
+VOLATILE_EVENT_FIELDS = ('fetch_timestamp', 'added_timestamp')
+
+# Koordinater avrundas till ~0.1 m så att flyttalsbrus inte ger diffar
+COORDINATE_FIELDS = ('latitude', 'longitude')
+COORDINATE_DECIMALS = 6
+
+# Exporternas schema: fullt internt arkiv och publik projektion för kartan.
+# Höj SCHEMA_VERSION när fält i någon av dem byter namn eller tas bort.
+SCHEMA_VERSION = 1
+ARCHIVE_SCHEMA = 'archive'
+PUBLIC_SCHEMA = 'public'
+
+# Fälten kartan faktiskt använder (index.html och data-worker.js)
+PUBLIC_EVENT_FIELDS = ('id', 'datetime', 'type', 'summary', 'latitude', 'longitude', 'location_name', 'matched_area', 'url')
+
+POLISEN_BASE_URL = 'https://polisen.se'
+
+# Lokal tid för dygn, veckotimmar och retentionsgränser
+STOCKHOLM_TZ = ZoneInfo('Europe/Stockholm')
+
+# polisen.se skriver timmar utan inledande nolla ("2025-08-02 7:12:22 +02:00"),
+# vilket datetime.fromisoformat() inte accepterar
+DATETIME_PATTERN = re.compile(
+    r'^(\d{4})-(\d{2})-(\d{2})[ T](\d{1,2}):(\d{2}):(\d{2})(?:\.\d+)?\s*(Z|[+-]\d{2}:?\d{2})?$'
+)
+
+def create_event_hash(event):
+    """Skapa unik hash för en händelse baserat på datum, typ och beskrivning"""
+    hash_string = f"{event.get('datetime', '')}{event.get('type', '')}{event.get('summary', '').strip()}"
+    return hashlib.md5(hash_string.encode('utf-8')).hexdigest()
+
+def parse_event_datetime(value):
+    """Tolka händelsens datumsträng till en tidszonsmedveten datetime, None om ogiltig"""
+    match = DATETIME_PATTERN.match((value or '').strip())
+    if not match:
+        return None
+
+    year, month, day, hour, minute, second, offset = match.groups()
+    if not offset or offset == 'Z':
+        tz = timezone.utc
+    else:
+        sign = -1 if offset[0] == '-' else 1
+        digits = offset[1:].replace(':', '')
+        tz = timezone(sign * timedelta(hours=int(digits[:2]), minutes=int(digits[2:])))
+
+    try:
+        return datetime(int(year), int(month), int(day), int(hour), int(minute), int(second), tzinfo=tz)
+    except ValueError:
+        return None
+
+def event_area(event):
+    """Mest specifika områdesnamn som finns för händelsen"""
+    return (
+        event.get('matched_area')
+        or event.get('improved_area')
+        or event.get('location_name')
+        or (event.get('location') or {}).get('name')
+        or ''
+    )
+
+def event_sort_key(event):
+    """Sorteringsnyckel: numeriskt id först, händelser utan id sist"""
+    event_id = event.get('id')
+    tiebreak = f"{event.get('datetime', '')}{event.get('type', '')}{event.get('summary', '')}"
+    if isinstance(event_id, int):
+        return (0, event_id, tiebreak)
+    return (1, 0, tiebreak)
+
+def canonical_event(event):
+    """Returnera en kopia av händelsen utan flyktiga fält och med avrundade koordinater"""
+    canonical = {}
+    for key, value in event.items():
+        if key in VOLATILE_EVENT_FIELDS:
+            continue
+        if key in COORDINATE_FIELDS and isinstance(value, float):
+            value = round(value, COORDINATE_DECIMALS)
+        canonical[key] = value
+    return canonical
+
+def public_event(event):
+    """Publik projektion: bara kartans fält, url som sökväg på polisen.se"""
+    projected = {}
+    for key in PUBLIC_EVENT_FIELDS:
+        value = event.get(key)
+        if key == 'location_name' and not value:
+            value = (event.get('location') or {}).get('name')
+        if key == 'url' and isinstance(value, str) and value.startswith(POLISEN_BASE_URL):
+            value = value[len(POLISEN_BASE_URL):]
+        if value is not None and value != '':
+            projected[key] = value
+    return projected
+
+def _event_line(event):
+    return json.dumps(event, ensure_ascii=False, sort_keys=True, separators=(',', ':'))
+
+def _assemble(lines, metadata, sections):
+    parts = ['{"events":[\n' + ',\n'.join(lines) + '\n]']
+    for key, value in sorted((sections or {}).items()):
+        parts.append(f'"{key}":' + json.dumps(value, ensure_ascii=False, sort_keys=True, indent=1))
+    parts.append('"metadata":' + json.dumps(metadata, ensure_ascii=False, sort_keys=True, indent=1))
+
+    return ',\n'.join(parts) + '}\n'
+
+def dumps_canonical(events, metadata, sections=None):
+    """
+    Serialisera dataset kanoniskt: en händelse per rad, sorterade nycklar.
+
+    sections är valfria extra toppnivånycklar (t.ex. filterindex) som
+    skrivs mellan händelserna och metadata.
+    """
+    lines = [_event_line(canonical_event(event)) for event in sorted(events, key=event_sort_key)]
+    return _assemble(lines, metadata, sections)
+
+def dumps_public(events, metadata, sections=None):
+    """Serialisera den publika projektionen kanoniskt"""
+    lines = [_event_line(public_event(canonical_event(event))) for event in sorted(events, key=event_sort_key)]
+    return _assemble(lines, metadata, sections)
+
+def dumps_exports(events, archive_metadata, public_metadata, public_sections=None, public_events=None):
+    """
+    Fullt arkiv och publik projektion i ett pass över de sorterade händelserna.
+
+    Båda har samma händelseordning, så filterindexet (public_sections)
+    gäller även för arkivet. Med public_events (t.ex. bara händelser inom
+    retentionsgränsen) innehåller den publika filen bara dem.
+    Returnerar (arkivtext, publik text).
+    """
+    if public_events is not None:
+        archive_lines = [_event_line(canonical_event(event)) for event in sorted(events, key=event_sort_key)]
+        return (
+            _assemble(archive_lines, archive_metadata, None),
+            dumps_public(public_events, public_metadata, public_sections)
+        )
+
+    archive_lines = []
+    public_lines = []
+    for event in sorted(events, key=event_sort_key):
+        canonical = canonical_event(event)
+        archive_lines.append(_event_line(canonical))
+        public_lines.append(_event_line(public_event(canonical)))
+
+    return (
+        _assemble(archive_lines, archive_metadata, None),
+        _assemble(public_lines, public_metadata, public_sections)
+    )
+
+def write_atomic(path, content, staged=True):
+    """
+    Skriv text (eller bytes) till en temporär fil och ersätt målet i ett steg.
+
+    Under staged_outputs() (staging.py) skrivs filen i stället till
+    körningens katalog och publiceras med övriga utdata. Cachar och
+    checkpoints som ska överleva en avbruten körning anger staged=False.
+    """
+    transaction = active_transaction() if staged else None
+    if transaction is not None:
+        path = transaction.stage(path)
+    elif os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    if isinstance(content, bytes):
+        with open(tmp_path, 'wb') as f:
+            f.write(content)
+    else:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(content)
+    os.replace(tmp_path, path)
+
+def output_files(directory):
+    """Filnamn som redan finns i en utdatakatalog; tom lista innan katalogen skapats"""
+    try:
+        return os.listdir(directory)
+    except FileNotFoundError:
+        return []
+
+def remove_output(path):
+    """Ta bort en utdatafil (vid commit om en körning pågår)"""
+    transaction = active_transaction()
+    if transaction is not None:
+        transaction.remove(path)
+    else:
+        os.remove(path)
+
+def write_canonical(path, events, metadata, sections=None):
+    """Skriv dataset i kanoniskt format till fil (atomärt)"""
+    content = dumps_canonical(events, metadata, sections)
+    write_atomic(path, content)
+    return len(content.encode('utf-8'))
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Deltaflöde för Stockholm Våldskarta
+Varje uppdatering som ändrar den publika datafilen får ett nytt
+versionsnummer och en liten deltafil med tillagda, ändrade och borttagna
+händelser sedan förra versionen. Kartan cachar datan i IndexedDB och
+hämtar bara de deltan den saknar; den publika datafilen är den fullständiga
+ögonblicksbilden som används när glappet är för stort.
+"""
+
+import json
+import os
+
+from data_format import create_event_hash, output_files, remove_output, write_atomic
+
+FEED_VERSION = 1
+FEED_FILE = 'feed.json'
+DEFAULT_MAX_DELTAS = 50
+
+# Fälten som identifierar en händelse (samma som create_event_hash)
+KEY_FIELDS = ('datetime', 'type', 'summary')
+
+EVENTS_PREFIX = '{"events":[\n'
+
+def event_lines(text):
+    """
+    Händelseraderna i en kanoniskt skriven fil (en händelse per rad),
+    None om texten saknas eller har ett annat format.
+    """
+    if not text or not text.startswith(EVENTS_PREFIX):
+        return None
+    end = text.find('\n]', len(EVENTS_PREFIX))
+    if end < 0:
+        return None
+    body = text[len(EVENTS_PREFIX):end]
+    return body.split(',\n') if body else []
+
+def diff_lines(old_lines, new_lines):
+    """
+    Ändringar mellan två versioner: (upserts, removals).
+
+    Bara rader som skiljer sig tolkas som JSON. En ändrad händelse ger en
+    upsert; borttagning anges med händelsens nyckelfält.
+    """
+    old_set = set(old_lines)
+    new_set = set(new_lines)
+    upserts = [json.loads(line) for line in new_lines if line not in old_set]
+    upserted = {create_event_hash(event) for event in upserts}
+
+    removals = []
+    for line in old_lines:
+        if line in new_set:
+            continue
+        event = json.loads(line)
+        if create_event_hash(event) not in upserted:
+            removals.append({field: event.get(field, '') for field in KEY_FIELDS})
+
+    return upserts, removals
+
+def load_feed(delta_dir):
+    try:
+        with open(os.path.join(delta_dir, FEED_FILE), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+def write_delta_feed(delta_dir, data_file, previous_text, current_text, last_updated, max_deltas=DEFAULT_MAX_DELTAS):
+    """
+    Jämför förra och nya publika filen och skriv delta och feed.json.
+
+    Utan förändring behålls versionen (feed.json uppdateras ändå så att
+    den pekar på den nya ögonblicksbilden). Saknas förra filen eller
+    feed.json går det inte att räkna fram en delta; versionen räknas då
+    upp utan delta så att alla cachade kopior hämtar ögonblicksbilden.
+    """
+    feed = load_feed(delta_dir)
+    current_lines = event_lines(current_text) or []
+    previous_lines = event_lines(previous_text) if feed else None
+
+    version = feed['version'] if feed else 0
+    deltas = feed['deltas'] if feed else []
+    oldest_version = feed['oldest_version'] if feed else 0
+    stats = {'version': version, 'upserts': 0, 'removals': 0}
+
+    if previous_lines is None:
+        version += 1
+        oldest_version = version
+        deltas = []
+    else:
+        upserts, removals = diff_lines(previous_lines, current_lines)
+        if upserts or removals:
+            version += 1
+            content = json.dumps(
+                {'version': version, 'base_version': version - 1, 'upserts': upserts, 'removals': removals},
+                ensure_ascii=False, sort_keys=True, separators=(',', ':')
+            )
+            file_name = f"{version}.json"
+            write_atomic(os.path.join(delta_dir, file_name), content)
+            deltas.append({
+                'version': version,
+                'file': file_name,
+                'bytes': len(content.encode('utf-8')),
+                'upserts': len(upserts),
+                'removals': len(removals)
+            })
+            stats.update(upserts=len(upserts), removals=len(removals))
+
+    # Äldre deltan tas bort; klienter med äldre version hämtar ögonblicksbilden
+    if len(deltas) > max_deltas:
+        deltas = deltas[-max_deltas:]
+        oldest_version = deltas[0]['version'] - 1
+    current_files = {delta['file'] for delta in deltas}
+    for file_name in output_files(delta_dir):
+        if file_name.endswith('.json') and file_name != FEED_FILE and file_name not in current_files:
+            remove_output(os.path.join(delta_dir, file_name))
+
+    feed = {
+        'feed_version': FEED_VERSION,
+        'version': version,
+        'oldest_version': oldest_version,
+        'count': len(current_lines),
+        'snapshot': data_file,
+        'snapshot_bytes': len(current_text.encode('utf-8')),
+        'snapshot_updated': last_updated,
+        'deltas': deltas
+    }
+    write_atomic(os.path.join(delta_dir, FEED_FILE), json.dumps(feed, ensure_ascii=False, sort_keys=True, indent=1) + '\n')
+
+    stats['version'] = version
+    stats['deltas'] = len(deltas)
+    return stats
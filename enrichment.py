@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+"""
+Berikning från polisens detaljsidor för Stockholm Våldskarta
+Hämtar händelsernas detaljsidor parallellt (med begränsat antal trådar),
+cachar texten på disk per URL och plockar ut gator och områden som
+geokodningen kan använda. En sida som redan behandlats hämtas aldrig igen.
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from html.parser import HTMLParser
+
+import requests
+
+from data_format import write_atomic
+
+logger = logging.getLogger(__name__)
+
+# POLISEN_BASE_URL pekar om hämtningen, t.ex. mot en lokal testserver
+POLISEN_BASE_URL = 'https://polisen.se'
+DEFAULT_CACHE_DIR = 'detail_cache'
+DEFAULT_MAX_WORKERS = 4
+DEFAULT_TIMEOUT = 15
+
+# Element vars text är själva händelsebeskrivningen
+TEXT_CLASSES = ('preamble', 'text-body', 'editorial-html', 'event-page')
+
+STREET_PATTERN = re.compile(
+    r'\b([A-ZÅÄÖ][a-zåäöéü]+(?:gatan|vägen|gränd|gränden|torget|platsen|plan|stigen|allén|backen|leden|gången|kajen|bron|stråket|esplanaden))\b'
+)
+
+class DetailTextParser(HTMLParser):
+    """Samla text i beskrivningselementen; alla <p> om sidan saknar dem"""
+
+    def __init__(self):
+        super().__init__()
+        self.depth = 0
+        self.in_paragraph = 0
+        self.text_parts = []
+        self.paragraph_parts = []
+
+    def handle_starttag(self, tag, attrs):
+        classes = (dict(attrs).get('class') or '').split()
+        if self.depth:
+            self.depth += 1
+        elif any(name in classes for name in TEXT_CLASSES):
+            self.depth = 1
+        if tag == 'p':
+            self.in_paragraph += 1
+
+    def handle_endtag(self, tag):
+        if self.depth:
+            self.depth -= 1
+        if tag == 'p' and self.in_paragraph:
+            self.in_paragraph -= 1
+
+    def handle_data(self, data):
+        if self.depth:
+            self.text_parts.append(data)
+        elif self.in_paragraph:
+            self.paragraph_parts.append(data)
+
+    def text(self):
+        parts = self.text_parts or self.paragraph_parts
+        return ' '.join(' '.join(parts).split())
+
+def extract_text(html):
+    """Händelsetexten från en detaljsida"""
+    parser = DetailTextParser()
+    parser.feed(html)
+    parser.close()
+    return parser.text()
+
+def extract_location(text, gazetteer):
+    """Gator och kända områden i texten, mest specifika först ("Rinkebystråket, Rinkeby")"""
+    found = []
+    for street in STREET_PATTERN.findall(text or ''):
+        if street not in found:
+            found.append(street)
+
+    lowered = (text or '').lower()
+    for area in gazetteer:
+        if re.search(rf'\b{re.escape(area)}\b', lowered):
+            name = area.title()
+            if name not in found:
+                found.append(name)
+
+    return ', '.join(found[:4])
+
+class DetailCache:
+    """En JSON-fil per detaljsida, nycklad på sidans URL"""
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR):
+        self.cache_dir = cache_dir
+
+    def path(self, url):
+        digest = hashlib.sha1(url.encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, digest[:2], f"{digest}.json")
+
+    def get(self, url):
+        try:
+            with open(self.path(url), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def put(self, url, entry):
+        path = self.path(url)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        write_atomic(path, json.dumps(entry, ensure_ascii=False), staged=False)
+
+def fetch_detail(session, url, base_url, timeout=DEFAULT_TIMEOUT):
+    """
+    Hämta en detaljsida och returnera cacheposten.
+
+    Svar från servern (även 404) cachas så att sidan inte hämtas igen;
+    nätverksfel och 5xx ger None så att sidan försöks igen nästa körning.
+    """
+    full_url = url if url.startswith('http') else f"{base_url}{url if url.startswith('/') else '/' + url}"
+    try:
+        response = session.get(full_url, timeout=timeout)
+    except requests.RequestException as e:
+        logger.debug(f"⚠️ Kunde inte hämta {full_url}: {e}")
+        return None
+
+    if response.status_code >= 500:
+        return None
+
+    return {
+        'url': url,
+        'status': response.status_code,
+        'fetched_at': datetime.now().isoformat(),
+        'text': extract_text(response.text) if response.ok else ''
+    }
+
+def enrich_events(events, gazetteer, cache_dir=DEFAULT_CACHE_DIR, max_workers=DEFAULT_MAX_WORKERS,
+                  timeout=DEFAULT_TIMEOUT, base_url=None, session=None):
+    """
+    Sätt detail_location på händelserna från deras detaljsidor.
+
+    Cachade sidor läses från disk; övriga hämtas parallellt med högst
+    max_workers samtidiga anrop. Returnerar statistik för rapporten.
+    """
+    base_url = (base_url or os.environ.get('POLISEN_BASE_URL') or POLISEN_BASE_URL).rstrip('/')
+    cache = DetailCache(cache_dir)
+    stats = {'events': len(events), 'cached': 0, 'fetched': 0, 'failed': 0, 'located': 0}
+
+    entries = {}
+    missing = []
+    for url in {event.get('url') for event in events if event.get('url')}:
+        entry = cache.get(url)
+        if entry is None:
+            missing.append(url)
+        else:
+            entries[url] = entry
+            stats['cached'] += 1
+
+    if missing:
+        own_session = session is None
+        session = session or requests.Session()
+        try:
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                results = executor.map(lambda url: (url, fetch_detail(session, url, base_url, timeout)), missing)
+                for url, entry in results:
+                    if entry is None:
+                        stats['failed'] += 1
+                        continue
+                    cache.put(url, entry)
+                    entries[url] = entry
+                    stats['fetched'] += 1
+        finally:
+            if own_session:
+                session.close()
+
+    for event in events:
+        entry = entries.get(event.get('url'))
+        if entry and apply_detail(event, entry, gazetteer):
+            stats['located'] += 1
+
+    logger.info(
+        f"🔗 Detaljsidor: {stats['cached']} från cache, {stats['fetched']} hämtade, "
+        f"{stats['failed']} misslyckade, {stats['located']} med platstext"
+    )
+    return stats
+
+def apply_detail(event, entry, gazetteer):
+    """Sätt platstexten från en cachepost, True om något hittades"""
+    location = extract_location(entry.get('text', ''), gazetteer)
+    if location:
+        event['detail_location'] = location
+    return bool(location)
+
+def apply_cached_detail(event, cache, gazetteer):
+    """Som enrich_events för en händelse men bara från cachen (ingen nätverkstrafik)"""
+    entry = cache.get(event['url']) if event.get('url') else None
+    if entry:
+        apply_detail(event, entry, gazetteer)
+    return event
+
+def main():
+    """Värm cachen med detaljsidor för redan sparade händelser"""
+    from auto_update import load_config, load_regions, open_event_store
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    parser = argparse.ArgumentParser(description='Hämta och cacha polisens detaljsidor')
+    parser.add_argument('--region', default='stockholm')
+    parser.add_argument('--all', action='store_true', help='Alla händelser, inte bara de med ungefärliga koordinater')
+    parser.add_argument('--limit', type=int)
+    args = parser.parse_args()
+
+    enrichment_config = load_config().get('enrichment', {})
+    regions = {region['id']: region for region in load_regions()}
+    if args.region not in regions:
+        parser.error(f"Okänd region: {args.region}")
+    region = regions[args.region]
+
+    store = open_event_store(region)
+    try:
+        events = [
+            event for event in store.all_events()
+            if args.all or event.get('location_source') != 'location_list_matched'
+        ]
+    finally:
+        store.close()
+
+    events = events[:args.limit] if args.limit else events
+    enrich_events(
+        events,
+        region['gazetteer'],
+        cache_dir=enrichment_config.get('cache_dir', DEFAULT_CACHE_DIR),
+        max_workers=enrichment_config.get('max_workers', DEFAULT_MAX_WORKERS),
+        timeout=enrichment_config.get('timeout_seconds', DEFAULT_TIMEOUT)
+    )
+    print("ℹ️ Kör reprocess.py för att geokoda om händelserna med den cachade platstexten")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,360 @@
+#!/usr/bin/env python3
+"""
+SQLite-baserad händelsedatabas för Stockholm Våldskarta
+Databasen är arbetslagret; den publicerade JSON-filen exporteras från den
+"""
+
+import argparse
+import json
+import sqlite3
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+
+from data_format import (
+    ARCHIVE_SCHEMA, SCHEMA_VERSION,
+    create_event_hash, event_area, parse_event_datetime, write_canonical
+)
+from search_index import STEMMER_VERSION, event_terms
+
+DATABASE_FILE = 'stockholm_violence.db'
+ARCHIVE_FILE = 'stockholm_violence_archive.json'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    hash TEXT PRIMARY KEY,
+    id INTEGER,
+    datetime TEXT,
+    epoch INTEGER,
+    type TEXT,
+    area TEXT,
+    body TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_events_id ON events(id);
+CREATE INDEX IF NOT EXISTS idx_events_epoch ON events(epoch);
+CREATE INDEX IF NOT EXISTS idx_events_type ON events(type, epoch);
+CREATE INDEX IF NOT EXISTS idx_events_area ON events(area COLLATE NOCASE, epoch);
+CREATE VIRTUAL TABLE IF NOT EXISTS events_rtree USING rtree(
+    id,
+    min_lat, max_lat,
+    min_lng, max_lng
+);
+CREATE TABLE IF NOT EXISTS search_terms (
+    term TEXT NOT NULL,
+    hash TEXT NOT NULL,
+    PRIMARY KEY (term, hash)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_search_terms_hash ON search_terms(hash);
+CREATE TABLE IF NOT EXISTS metadata (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+def event_epoch(event):
+    """Händelsens tidpunkt som Unix-tid, None om datumet inte kan tolkas"""
+    parsed = parse_event_datetime(event.get('datetime', ''))
+    return int(parsed.timestamp()) if parsed else None
+
+class EventStore:
+    """Händelser indexerade på hash, id, tid, typ och område"""
+
+    def __init__(self, path=DATABASE_FILE, check_same_thread=True):
+        self.path = path
+        self.conn = sqlite3.connect(path, check_same_thread=check_same_thread)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.executescript(SCHEMA)
+        self._sync_spatial_index()
+        self._sync_search_terms()
+
+    def _sync_spatial_index(self):
+        """Lägg in händelser som saknas i R*-trädet (t.ex. databaser skapade före indexet)"""
+        with self.conn:
+            self.conn.execute(
+                'INSERT INTO events_rtree (id, min_lat, max_lat, min_lng, max_lng) '
+                "SELECT e.rowid, json_extract(e.body, '$.latitude'), json_extract(e.body, '$.latitude'), "
+                "json_extract(e.body, '$.longitude'), json_extract(e.body, '$.longitude') "
+                'FROM events e LEFT JOIN events_rtree r ON r.id = e.rowid '
+                "WHERE r.id IS NULL AND json_type(e.body, '$.latitude') IN ('real', 'integer') "
+                "AND json_type(e.body, '$.longitude') IN ('real', 'integer')"
+            )
+
+    def _sync_search_terms(self):
+        """Indexera söktermer för händelser som saknar dem; allt byggs om vid ny stemmer"""
+        with self.conn:
+            if self.get_metadata('search_stemmer_version') != STEMMER_VERSION:
+                self.conn.execute('DELETE FROM search_terms')
+                self.set_metadata('search_stemmer_version', STEMMER_VERSION)
+
+            missing = self.conn.execute(
+                'SELECT e.hash, e.body FROM events e '
+                'WHERE NOT EXISTS (SELECT 1 FROM search_terms s WHERE s.hash = e.hash)'
+            ).fetchall()
+            for event_hash, body in missing:
+                self._index_terms(event_hash, json.loads(body))
+
+    def _index_terms(self, event_hash, event):
+        self.conn.executemany(
+            'INSERT OR IGNORE INTO search_terms (term, hash) VALUES (?, ?)',
+            [(term, event_hash) for term in event_terms(event)]
+        )
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    @contextmanager
+    def transaction(self):
+        """Allt eller inget: commit vid framgång, rollback vid fel"""
+        with self.conn:
+            yield self
+
+    def count(self):
+        return self.conn.execute('SELECT COUNT(*) FROM events').fetchone()[0]
+
+    def contains(self, event_hash):
+        row = self.conn.execute('SELECT 1 FROM events WHERE hash = ?', (event_hash,)).fetchone()
+        return row is not None
+
+    def insert_event(self, event, event_hash=None):
+        """Lägg till en händelse, returnerar False om den redan finns"""
+        event_hash = event_hash or create_event_hash(event)
+        cursor = self.conn.execute(
+            'INSERT OR IGNORE INTO events (hash, id, datetime, epoch, type, area, body) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?)',
+            (
+                event_hash,
+                event.get('id'),
+                event.get('datetime', ''),
+                event_epoch(event),
+                event.get('type', ''),
+                event_area(event),
+                json.dumps(event, ensure_ascii=False, sort_keys=True)
+            )
+        )
+        if cursor.rowcount != 1:
+            return False
+
+        lat, lng = event.get('latitude'), event.get('longitude')
+        if isinstance(lat, (int, float)) and isinstance(lng, (int, float)):
+            self.conn.execute(
+                'INSERT INTO events_rtree (id, min_lat, max_lat, min_lng, max_lng) VALUES (?, ?, ?, ?, ?)',
+                (cursor.lastrowid, lat, lat, lng, lng)
+            )
+        self._index_terms(event_hash, event)
+        return True
+
+    def replace_event(self, event, event_hash=None):
+        """Skriv över en befintlig händelse (samma hash) och dess plats i R*-trädet"""
+        event_hash = event_hash or create_event_hash(event)
+        row = self.conn.execute('SELECT rowid FROM events WHERE hash = ?', (event_hash,)).fetchone()
+        if row is None:
+            return False
+
+        rowid = row[0]
+        self.conn.execute(
+            'UPDATE events SET id = ?, epoch = ?, area = ?, body = ? WHERE rowid = ?',
+            (
+                event.get('id'),
+                event_epoch(event),
+                event_area(event),
+                json.dumps(event, ensure_ascii=False, sort_keys=True),
+                rowid
+            )
+        )
+        self.conn.execute('DELETE FROM events_rtree WHERE id = ?', (rowid,))
+
+        lat, lng = event.get('latitude'), event.get('longitude')
+        if isinstance(lat, (int, float)) and isinstance(lng, (int, float)):
+            self.conn.execute(
+                'INSERT INTO events_rtree (id, min_lat, max_lat, min_lng, max_lng) VALUES (?, ?, ?, ?, ?)',
+                (rowid, lat, lat, lng, lng)
+            )
+
+        self.conn.execute('DELETE FROM search_terms WHERE hash = ?', (event_hash,))
+        self._index_terms(event_hash, event)
+        return True
+
+    def delete_event(self, event_hash):
+        """Ta bort en händelse, returnerar False om den inte finns"""
+        row = self.conn.execute('SELECT rowid FROM events WHERE hash = ?', (event_hash,)).fetchone()
+        if row is None:
+            return False
+        self.conn.execute('DELETE FROM events_rtree WHERE id = ?', (row[0],))
+        self.conn.execute('DELETE FROM search_terms WHERE hash = ?', (event_hash,))
+        self.conn.execute('DELETE FROM events WHERE rowid = ?', (row[0],))
+        return True
+
+    def import_events(self, events):
+        """Importera en händelselista (t.ex. från JSON-filen) i en transaktion"""
+        added = 0
+        with self.transaction():
+            for event in events:
+                if self.insert_event(event):
+                    added += 1
+        return added
+
+    def all_events(self):
+        """Alla händelser sorterade på id"""
+        for (body,) in self.conn.execute('SELECT body FROM events ORDER BY id, hash'):
+            yield json.loads(body)
+
+    def timeline(self):
+        """(epoch, händelse) i tidsordning via epoch-indexet; otolkbara datum (None) först"""
+        for epoch, body in self.conn.execute('SELECT epoch, body FROM events ORDER BY epoch, hash'):
+            yield epoch, json.loads(body)
+
+    def query(self, area=None, types=None, since=None, until=None, limit=None):
+        """Filtrera händelser på område, typer och tidsintervall (Unix-tid)"""
+        clauses = []
+        params = []
+
+        if area:
+            clauses.append('area = ? COLLATE NOCASE')
+            params.append(area)
+        if types:
+            clauses.append(f"type IN ({','.join('?' * len(types))})")
+            params.extend(types)
+        if since is not None:
+            clauses.append('epoch >= ?')
+            params.append(since)
+        if until is not None:
+            clauses.append('epoch < ?')
+            params.append(until)
+
+        sql = 'SELECT body FROM events'
+        if clauses:
+            sql += ' WHERE ' + ' AND '.join(clauses)
+        sql += ' ORDER BY epoch DESC'
+        if limit:
+            sql += ' LIMIT ?'
+            params.append(limit)
+
+        return [json.loads(body) for (body,) in self.conn.execute(sql, params)]
+
+    def query_region(self, bbox=None, since=None, until=None, types=None, limit=500, after=None):
+        """
+        Sök händelser inom en bounding box (min_lng, min_lat, max_lng, max_lat)
+        och ett tidsintervall, nyast först.
+
+        Returnerar (rader, nästa_markör) där raderna är (rowid, epoch, händelse).
+        Markören är (epoch, rowid) för sista raden och skickas som after för
+        nästa sida.
+        """
+        clauses = ['e.epoch IS NOT NULL']
+        params = []
+
+        if bbox:
+            min_lng, min_lat, max_lng, max_lat = bbox
+            sql = 'SELECT e.rowid, e.epoch, e.body FROM events_rtree r JOIN events e ON e.rowid = r.id'
+            clauses += ['r.min_lat >= ?', 'r.max_lat <= ?', 'r.min_lng >= ?', 'r.max_lng <= ?']
+            params += [min_lat, max_lat, min_lng, max_lng]
+        else:
+            sql = 'SELECT e.rowid, e.epoch, e.body FROM events e'
+
+        if since is not None:
+            clauses.append('e.epoch >= ?')
+            params.append(since)
+        if until is not None:
+            clauses.append('e.epoch < ?')
+            params.append(until)
+        if types:
+            clauses.append(f"e.type IN ({','.join('?' * len(types))})")
+            params.extend(types)
+        if after:
+            clauses.append('(e.epoch < ? OR (e.epoch = ? AND e.rowid < ?))')
+            params += [after[0], after[0], after[1]]
+
+        sql += ' WHERE ' + ' AND '.join(clauses) + ' ORDER BY e.epoch DESC, e.rowid DESC LIMIT ?'
+        params.append(limit + 1)
+
+        rows = [(rowid, epoch, json.loads(body)) for rowid, epoch, body in self.conn.execute(sql, params)]
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = (rows[-1][1], rows[-1][0])
+        return rows, next_cursor
+
+    def term_postings(self):
+        """Alla (term, hash) i termordning, för export av sökindexet"""
+        return self.conn.execute('SELECT term, hash FROM search_terms ORDER BY term')
+
+    def type_counts(self):
+        """Antal händelser per brottstyp"""
+        return dict(self.conn.execute('SELECT type, COUNT(*) FROM events GROUP BY type'))
+
+    def data_version(self):
+        """Sträng som ändras när innehållet ändras (för ETag och cache)"""
+        count, max_rowid = self.conn.execute('SELECT COUNT(*), MAX(rowid) FROM events').fetchone()
+        last_updated = self.get_metadata('metadata', {}).get('last_updated', '')
+        return f"{count}-{max_rowid or 0}-{last_updated}"
+
+    def get_metadata(self, key, default=None):
+        row = self.conn.execute('SELECT value FROM metadata WHERE key = ?', (key,)).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def set_metadata(self, key, value):
+        self.conn.execute(
+            'INSERT INTO metadata (key, value) VALUES (?, ?) '
+            'ON CONFLICT(key) DO UPDATE SET value = excluded.value',
+            (key, json.dumps(value, ensure_ascii=False))
+        )
+
+def main():
+    parser = argparse.ArgumentParser(description='Händelsedatabas för Stockholm Våldskarta')
+    parser.add_argument('--db', default=DATABASE_FILE)
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    import_parser = subparsers.add_parser('import', help='Importera händelser från JSON')
+    import_parser.add_argument('json_file', nargs='?', default=ARCHIVE_FILE)
+
+    export_parser = subparsers.add_parser('export', help='Exportera databasen till JSON (fullständigt arkiv)')
+    export_parser.add_argument('json_file', nargs='?', default=ARCHIVE_FILE)
+
+    query_parser = subparsers.add_parser('query', help='Sök händelser')
+    query_parser.add_argument('--area')
+    query_parser.add_argument('--type', action='append', dest='types')
+    query_parser.add_argument('--days', type=int, help='Bara de senaste N dagarna')
+    query_parser.add_argument('--limit', type=int)
+
+    args = parser.parse_args()
+
+    with EventStore(args.db) as store:
+        if args.command == 'import':
+            with open(args.json_file, 'r', encoding='utf-8') as f:
+                events = json.load(f).get('events', [])
+            added = store.import_events(events)
+            print(f"📥 Importerade {added} av {len(events)} händelser till {args.db}")
+
+        elif args.command == 'export':
+            events = list(store.all_events())
+            metadata = store.get_metadata('metadata', {})
+            metadata.update({
+                'total_events': len(events),
+                'last_updated': datetime.now().isoformat(),
+                'schema': ARCHIVE_SCHEMA,
+                'schema_version': SCHEMA_VERSION
+            })
+            write_canonical(args.json_file, events, metadata)
+            print(f"💾 Exporterade {len(events)} händelser till {args.json_file}")
+
+        elif args.command == 'query':
+            since = None
+            if args.days:
+                since = int((datetime.now(timezone.utc) - timedelta(days=args.days)).timestamp())
+
+            started = time.perf_counter()
+            events = store.query(area=args.area, types=args.types, since=since, limit=args.limit)
+            elapsed_ms = (time.perf_counter() - started) * 1000
+
+            for event in events:
+                print(f"  {event.get('datetime', 'N/A')}  {event.get('type', 'N/A')}  {event_area(event)}")
+            print(f"📊 {len(events)} händelser ({elapsed_ms:.1f} ms)")
+
+if __name__ == '__main__':
+    main()
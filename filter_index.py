@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+"""
+Förberäknat filterindex för Stockholm Våldskarta
+Bitmängder per år och brottstyp i samma ordning som händelserna i den
+publicerade filen, så att kartan kan filtrera med AND/OR över ord
+"""
+
+import base64
+
+from data_format import event_sort_key
+
+FILTER_INDEX_VERSION = 1
+
+# Samma etikett som kartan använder för händelser utan typ
+UNKNOWN_TYPE = 'Okänd'
+
+def encode_bitset(positions, count):
+    """
+    Bitmängd som base64-kodade 32-bitars little-endian-ord.
+
+    I little-endian ligger bit i i byte i // 8, så en bytearray räcker.
+    """
+    bits = bytearray(((count + 31) // 32) * 4)
+    for position in positions:
+        bits[position >> 3] |= 1 << (position & 7)
+    return base64.b64encode(bytes(bits)).decode('ascii')
+
+def build_filter_index(events):
+    """Bygg bitmängder per år och typ för händelserna i kanonisk ordning"""
+    ordered = sorted(events, key=event_sort_key)
+
+    years = {}
+    types = {}
+    for position, event in enumerate(ordered):
+        year = (event.get('datetime') or '')[:4]
+        if year.isdigit():
+            years.setdefault(year, []).append(position)
+        types.setdefault(event.get('type') or UNKNOWN_TYPE, []).append(position)
+
+    count = len(ordered)
+    return {
+        'version': FILTER_INDEX_VERSION,
+        'count': count,
+        'encoding': 'base64-u32le',
+        'years': {year: encode_bitset(positions, count) for year, positions in sorted(years.items())},
+        'types': {event_type: encode_bitset(positions, count) for event_type, positions in sorted(types.items())}
+    }
@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+Hotspots för Stockholm Våldskarta
+Löpande antal per område och brottskategori: ett rullande fönster med
+dagsräkningar och en EWMA-baslinje för dagarna före fönstret. Tillståndet
+sparas mellan körningar och uppdateras bara med nya händelser, så att en
+körning kostar O(nya händelser) i stället för en genomräkning av arkivet.
+Områden där fönstrets antal avviker kraftigt från baslinjen skrivs till
+hotspots.json. En serie rapporteras först när baslinjen har min_history_days
+dagars historik; annars vore varje nytt område med några händelser en hotspot.
+"""
+
+import json
+import math
+import os
+from datetime import datetime
+
+from data_format import STOCKHOLM_TZ, event_area, write_atomic
+
+STATE_VERSION = 1
+STATE_FILE = 'state.json'
+HOTSPOTS_FILE = 'hotspots.json'
+
+DEFAULTS = {
+    'window_days': 7,
+    'alpha': 0.05,
+    'z_threshold': 3.0,
+    'min_count': 3,
+    'min_history_days': 28,
+    'max_hotspots': 20
+}
+
+def event_category(event):
+    """Brottskategori: typen utan gradering ("Misshandel, grov" -> "Misshandel")"""
+    return (event.get('type') or 'Okänd').split(',')[0].strip()
+
+def day_number(epoch):
+    """Lokalt datum (Stockholm) som dagnummer"""
+    return datetime.fromtimestamp(epoch, STOCKHOLM_TZ).date().toordinal()
+
+class HotspotTracker:
+    """
+    Tillstånd per serie (område|kategori):
+      recent   -- {dag: antal} för dagarna i fönstret
+      baseline -- EWMA av antal per dag för dagarna före fönstret
+      folded   -- sista dagen som ingår i baslinjen
+      history  -- antal dagar i baslinjen
+
+    Bara serier med händelser i fönstret (active) gås igenom vid export.
+    """
+
+    def __init__(self, state=None, **options):
+        self.options = dict(DEFAULTS, **options)
+        state = state if state and state.get('version') == STATE_VERSION else None
+        self.series = state['series'] if state else {}
+        self.active = set(state['active']) if state else set()
+        self.seeded = state is not None
+        # Dagen tillståndet senast sparades; None tills det sparats av den här instansen
+        self.saved_day = None
+
+    @classmethod
+    def load(cls, directory, **options):
+        try:
+            with open(os.path.join(directory, STATE_FILE), 'r', encoding='utf-8') as f:
+                state = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            state = None
+        return cls(state, **options)
+
+    def reset(self):
+        """Glöm tillståndet så att det byggs om från databasen vid nästa körning"""
+        self.series = {}
+        self.active = set()
+        self.seeded = False
+        self.saved_day = None
+
+    def state(self):
+        return {'version': STATE_VERSION, 'series': self.series, 'active': sorted(self.active)}
+
+    def window_start(self, today):
+        return today - self.options['window_days'] + 1
+
+    def advance(self, series, today):
+        """Flytta dagar som lämnat fönstret in i baslinjen (tomma dagar i ett steg)"""
+        decay = 1 - self.options['alpha']
+        first_day = self.window_start(today)
+        if series['folded'] >= first_day - 1:
+            return
+
+        for day in sorted(int(day) for day in series['recent'] if int(day) < first_day):
+            gap = day - series['folded'] - 1
+            series['baseline'] = series['baseline'] * decay ** gap * decay + self.options['alpha'] * series['recent'].pop(str(day))
+            series['history'] += gap + 1
+            series['folded'] = day
+
+        gap = first_day - 1 - series['folded']
+        series['baseline'] *= decay ** gap
+        series['history'] += gap
+        series['folded'] = first_day - 1
+
+    def add(self, event, epoch, today):
+        """Räkna en ny händelse; händelser äldre än fönstret ignoreras"""
+        day = min(day_number(epoch), today)
+        key = f"{event_area(event) or 'Okänt område'}|{event_category(event)}"
+
+        series = self.series.get(key)
+        if series is None:
+            # Ny serie: baslinjen börjar dagen före händelsen
+            series = self.series[key] = {'recent': {}, 'baseline': 0.0, 'folded': day - 1, 'history': 0}
+        self.advance(series, max(day, series['folded'] + 1))
+        if day <= series['folded']:
+            return False
+
+        series['recent'][str(day)] = series['recent'].get(str(day), 0) + 1
+        self.active.add(key)
+        return True
+
+    def seed(self, timeline, today):
+        """Bygg tillståndet en gång från databasens tidsordnade händelser"""
+        for epoch, event in timeline:
+            if epoch is not None:
+                self.add(event, epoch, today)
+        self.seeded = True
+
+    def hotspots(self, today):
+        """
+        Serier vars antal i fönstret avviker från baslinjen. Avvikelsen är
+        ett Poisson-z-värde mot förväntat antal (baslinje * fönsterdagar).
+        """
+        window_days = self.options['window_days']
+        found = []
+
+        for key in sorted(self.active):
+            series = self.series[key]
+            self.advance(series, today)
+            recent = sum(series['recent'].values())
+            if not recent:
+                self.active.discard(key)
+                continue
+
+            # Utan historik är baslinjen 0 och z-värdet säger ingenting
+            if series['history'] < self.options['min_history_days']:
+                continue
+            
+            expected = series['baseline'] * window_days
+            z = (recent - expected) / math.sqrt(max(expected, 1.0))
+            if recent >= self.options['min_count'] and z >= self.options['z_threshold']:
+                area, category = key.split('|', 1)
+                found.append({
+                    'area': area,
+                    'category': category,
+                    'recent': recent,
+                    'expected': round(expected, 2),
+                    'z': round(z, 2),
+                    'baseline_days': series['history'],
+                    'last_day': datetime.fromordinal(max(int(day) for day in series['recent'])).date().isoformat()
+                })
+
+        found.sort(key=lambda hotspot: (-hotspot['z'], hotspot['area'], hotspot['category']))
+        return found[:self.options['max_hotspots']]
+
+    def dumps_state(self):
+        """Tillståndet med sorterade nycklar och en serie per rad, så att en commit bara ändrar berörda serier"""
+        lines = [
+            f"  {json.dumps(key, ensure_ascii=False)}: {json.dumps(self.series[key], ensure_ascii=False, sort_keys=True, separators=(',', ':'))}"
+            for key in sorted(self.series)
+        ]
+        active = json.dumps(sorted(self.active), ensure_ascii=False)
+        series = '{\n' + ',\n'.join(lines) + '\n }' if lines else '{}'
+        return f'{{\n "active": {active},\n "series": {series},\n "version": {STATE_VERSION}\n}}\n'
+
+    def save(self, directory, region_id, today):
+        """Skriv tillståndet och hotspots.json; returnerar antal hotspots"""
+        hotspots = self.hotspots(today)
+        write_atomic(os.path.join(directory, STATE_FILE), self.dumps_state())
+
+        output = {
+            'region': region_id,
+            'date': datetime.fromordinal(today).date().isoformat(),
+            'window_days': self.options['window_days'],
+            'z_threshold': self.options['z_threshold'],
+            'hotspots': hotspots
+        }
+        write_atomic(os.path.join(directory, HOTSPOTS_FILE), json.dumps(output, ensure_ascii=False, sort_keys=True, indent=1) + '\n')
+        self.saved_day = today
+        return len(hotspots)
+
+def today_number():
+    return datetime.now(STOCKHOLM_TZ).date().toordinal()
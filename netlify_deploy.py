@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""
+Netlify Deploy för Stockholm Våldskarta
+Inkrementell deploy via Netlifys digest-API: skickar bara ett SHA1-manifest,
+väntar tills Netlify har jämfört det och laddar upp de filer som Netlify
+rapporterar som saknade
+"""
+
+import fnmatch
+import hashlib
+import json
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+NETLIFY_API_URL = 'https://api.netlify.com/api/v1'
+
+# Hur länge vi väntar på att Netlify ska jämföra manifestet ('prepared')
+PREPARE_TIMEOUT = 300
+PREPARE_POLL_SECONDS = 2.0
+
+class DeployError(RuntimeError):
+    """Netlify rapporterade fel eller blev inte klar i tid"""
+
+# Filer som publiceras på sajten (glob-mönster relativt projektroten)
+DEFAULT_PUBLISH_PATTERNS = [
+    'index.html',
+    'brottstyper.html',
+    'd49d015fed054d1.html',
+    '*_violence_data.json',
+    'regions.json',
+    'search/**/*.json',
+    'deltas/**/*.json',
+    'cold/**/*.json',
+    'cold/**/*.json.gz',
+    'hotspots/**/hotspots.json',
+    'affiliate-products.js',
+    'data-worker.js',
+    'canvas-points.js',
+    'affiliate-styles.css',
+    'ads.txt',
+    '_headers'
+]
+
+def file_digest(path):
+    """Beräkna SHA1-digest för en fil"""
+    sha1 = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(65536), b''):
+            sha1.update(chunk)
+    return sha1.hexdigest()
+
+def collect_site_files(root='.', patterns=None):
+    """Samla publicerade filer som {'/sökväg': Path}"""
+    root = Path(root)
+    site_files = {}
+
+    for pattern in patterns or DEFAULT_PUBLISH_PATTERNS:
+        for path in sorted(root.glob(pattern)):
+            if path.is_file():
+                site_files['/' + path.relative_to(root).as_posix()] = path
+
+    return site_files
+
+def is_published(site_path, patterns=None):
+    """Om '/sökväg' omfattas av publiceringsmönstren (samma urval som collect_site_files)"""
+    relative = site_path.lstrip('/')
+    for pattern in patterns or DEFAULT_PUBLISH_PATTERNS:
+        if '/' not in pattern and '/' in relative:
+            continue
+        # '**/' matchar även noll kataloger, som i Path.glob
+        if fnmatch.fnmatchcase(relative, pattern) or fnmatch.fnmatchcase(relative, pattern.replace('**/', '')):
+            return True
+    return False
+
+def build_manifest(site_files):
+    """Bygg digest-manifestet {'/sökväg': sha1} som Netlify förväntar sig"""
+    return {site_path: file_digest(path) for site_path, path in site_files.items()}
+
+def wait_until_prepared(session, api_url, deploy, timeout=PREPARE_TIMEOUT):
+    """
+    Hämta deployen tills Netlify har jämfört manifestet. Först i läget
+    'prepared' är 'required' fullständig och filer tas emot ('ready' om
+    inget saknades).
+    """
+    deadline = time.monotonic() + timeout
+    while deploy.get('state') not in ('prepared', 'ready'):
+        if deploy.get('state') == 'error':
+            raise DeployError(f"Deploy {deploy['id']} misslyckades: {deploy.get('error_message')}")
+        if time.monotonic() >= deadline:
+            raise DeployError(f"Deploy {deploy['id']} fastnade i läget {deploy.get('state')}")
+        time.sleep(PREPARE_POLL_SECONDS)
+        response = session.get(f"{api_url}/deploys/{deploy['id']}", timeout=60)
+        response.raise_for_status()
+        deploy = response.json()
+    return deploy
+
+def upload_file(session, api_url, deploy_id, site_path, path):
+    """Ladda upp en enskild fil till en pågående deploy"""
+    with open(path, 'rb') as f:
+        response = session.put(
+            f"{api_url}/deploys/{deploy_id}/files{site_path}",
+            data=f.read(),
+            headers={'Content-Type': 'application/octet-stream'},
+            timeout=60
+        )
+    response.raise_for_status()
+    return site_path
+
+def deploy_to_netlify(site_id, access_token, root='.', patterns=None, api_url=None, max_workers=8):
+    """
+    Deploya sajten till Netlify med digest-metoden.
+
+    Endast manifestet skickas i första anropet. När deployen nått läget
+    'prepared' laddas filer vars SHA1 finns i Netlifys 'required'-lista upp
+    parallellt.
+    """
+    api_url = (api_url or os.environ.get('NETLIFY_API_URL') or NETLIFY_API_URL).rstrip('/')
+
+    site_files = collect_site_files(root, patterns)
+    if not site_files:
+        logger.error("❌ Inga filer att deploya")
+        return False
+
+    manifest = build_manifest(site_files)
+    logger.info(f"🧾 Digest-manifest med {len(manifest)} filer")
+
+    session = requests.Session()
+    session.headers['Authorization'] = f'Bearer {access_token}'
+
+    try:
+        response = session.post(
+            f"{api_url}/sites/{site_id}/deploys",
+            json={'files': manifest},
+            timeout=60
+        )
+        response.raise_for_status()
+        deploy = wait_until_prepared(session, api_url, response.json())
+
+        deploy_id = deploy['id']
+        required = set(deploy.get('required', []))
+
+        # En uppladdning per saknad digest räcker, Netlify deduplicerar på SHA1
+        uploads = {}
+        for site_path, digest in manifest.items():
+            if digest in required and digest not in uploads:
+                uploads[digest] = site_path
+
+        logger.info(f"📤 Netlify saknar {len(uploads)} av {len(manifest)} filer (deploy {deploy_id})")
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [
+                executor.submit(upload_file, session, api_url, deploy_id, site_path, site_files[site_path])
+                for site_path in uploads.values()
+            ]
+            for future in futures:
+                logger.debug(f"⬆️ Uppladdad: {future.result()}")
+
+        logger.info("✅ Netlify deployment successful!")
+        return True
+
+    except (requests.RequestException, KeyError, ValueError, DeployError) as e:
+        logger.error(f"❌ Netlify deployment error: {e}")
+        return False
+    finally:
+        session.close()
+
+def load_netlify_config(config_file='config.json'):
+    """Läs Netlify-inställningar från config.json, miljövariabler har företräde"""
+    try:
+        with open(config_file, 'r', encoding='utf-8') as f:
+            netlify_config = json.load(f).get('netlify', {})
+    except (FileNotFoundError, json.JSONDecodeError):
+        netlify_config = {}
+
+    site_id = os.environ.get('NETLIFY_SITE_ID') or netlify_config.get('site_id')
+    access_token = os.environ.get('NETLIFY_ACCESS_TOKEN') or netlify_config.get('access_token')
+
+    # Platshållarna i config.json räknas inte som konfigurerade
+    if site_id and site_id.startswith('YOUR_'):
+        site_id = None
+    if access_token and access_token.startswith('YOUR_'):
+        access_token = None
+
+    return {
+        'site_id': site_id,
+        'access_token': access_token,
+        'publish': netlify_config.get('publish'),
+        'upload_workers': netlify_config.get('upload_workers', 8)
+    }
+
+def main():
+    """Deploya aktuell katalog till Netlify"""
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    netlify_config = load_netlify_config()
+    if not (netlify_config['site_id'] and netlify_config['access_token']):
+        logger.info("ℹ️ Netlify credentials not configured, skipping deployment")
+        return
+
+    success = deploy_to_netlify(
+        netlify_config['site_id'],
+        netlify_config['access_token'],
+        patterns=netlify_config['publish'],
+        max_workers=netlify_config['upload_workers']
+    )
+    sys.exit(0 if success else 1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,310 @@
+#!/usr/bin/env python3
+"""
+Strömmande uppdateringskedja för Stockholm Våldskarta
+Hämtningen körs som en kedja av generatorsteg (fetch → parse → classify →
+window → dedup → enrich → geocode → store → hotspots) där händelserna
+flödar en i taget. Bara steg som behöver batcha (detaljsidorna) håller en
+buffert.
+Kedjan kan ändras i config.json under "pipeline", inklusive egna steg.
+"""
+
+import importlib
+import logging
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+import requests
+
+from data_format import create_event_hash, event_area, parse_event_datetime
+from enrichment import DEFAULT_CACHE_DIR, DEFAULT_MAX_WORKERS, DEFAULT_TIMEOUT, enrich_events
+from event_store import event_epoch
+from hotspots import HotspotTracker, today_number
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_STAGES = ['fetch', 'parse', 'classify', 'window', 'dedup', 'enrich', 'geocode', 'store', 'hotspots']
+DEFAULT_WINDOW_DAYS = 14
+DEFAULT_ENRICH_BATCH = 50
+
+class PipelineContext:
+    """
+    Delat tillstånd för en körning: region, databas, API-klient och
+    funktionerna för klassificering och geokodning, plus räknare per steg.
+    """
+
+    def __init__(self, region, store=None, client=None, classify=None, geocode=None,
+                 known_hashes=None, session=None, config=None, hotspots=None):
+        self.region = region
+        self.store = store
+        self.client = client
+        self.classify = classify
+        self.geocode = geocode
+        self.known_hashes = known_hashes
+        self.session = session
+        self.config = config or {}
+        self.counts = defaultdict(int)
+        self.added_events = []
+        self.enrichment = None
+        # Hotspot-tillståndet; daemonen håller det i minnet mellan hämtningarna
+        self.hotspots = hotspots
+
+class Stage:
+    """
+    Ett steg tar emot en iterator med händelser och ger en ny.
+
+    Egna steg ärver från Stage, implementerar process() och anges i
+    config.json som "modul:Klass"; övriga nycklar i stegets post blir
+    options.
+    """
+
+    name = None
+
+    def __init__(self, context, **options):
+        self.context = context
+        self.options = options
+
+    def process(self, events):
+        raise NotImplementedError
+
+class FetchStage(Stage):
+    """
+    Källa: regionens händelser från polisen.se (svaret delas via klientens
+    cache). Ett API-fel avbryter kedjan så att regionen räknas som
+    misslyckad i stället för att se ut som en period utan händelser.
+    """
+
+    name = 'fetch'
+
+    def process(self, events):
+        yield from events
+        try:
+            fetched = self.context.client.events(locationname=self.context.region['locationname'])
+        except (requests.RequestException, ValueError) as e:
+            logger.error(f"❌ Fel vid API-anrop: {e}")
+            raise
+        logger.info(f"📥 Hämtade {len(fetched)} händelser från polisen.se")
+        yield from fetched
+
+class ParseStage(Stage):
+    """Släpp igenom poster som ser ut som händelser"""
+
+    name = 'parse'
+
+    def process(self, events):
+        for event in events:
+            if isinstance(event, dict) and event.get('type') is not None:
+                yield event
+            else:
+                logger.debug(f"⚠️ Ogiltig post ignorerad: {event!r:.80}")
+
+class ClassifyStage(Stage):
+    name = 'classify'
+
+    def process(self, events):
+        return (event for event in events if self.context.classify(event))
+
+class WindowStage(Stage):
+    """
+    Bara händelser från de senaste `days` dagarna (från midnatt), jämfört
+    som Unix-tid; otolkbara datum släpps igenom.
+    """
+
+    name = 'window'
+
+    def process(self, events):
+        start = datetime.now().astimezone() - timedelta(days=self.options.get('days', DEFAULT_WINDOW_DAYS))
+        cutoff = int(start.replace(hour=0, minute=0, second=0, microsecond=0).timestamp())
+        for event in events:
+            if not event.get('datetime'):
+                continue
+            parsed = parse_event_datetime(event['datetime'])
+            if parsed is None or int(parsed.timestamp()) >= cutoff:
+                yield event
+
+class DedupStage(Stage):
+    """Dubletter inom hämtningen och mot databasen (och hash-setet i daemon-läge)"""
+
+    name = 'dedup'
+
+    def process(self, events):
+        seen_hashes = set()
+        known_hashes = self.context.known_hashes
+        store = self.context.store
+
+        for event in events:
+            event_hash = create_event_hash(event)
+            if event_hash in seen_hashes:
+                logger.debug(f"🗑️ Dublett borttagen: {event.get('type', 'Okänt')} - {event.get('datetime', 'Okänt datum')}")
+                self.context.counts['duplicates'] += 1
+                continue
+            seen_hashes.add(event_hash)
+
+            if (known_hashes is not None and event_hash in known_hashes) or (store is not None and store.contains(event_hash)):
+                self.context.counts['duplicates'] += 1
+                continue
+            yield event
+
+class EnrichStage(Stage):
+    """
+    Platstext från detaljsidorna. Hämtningen är parallell, så händelserna
+    buffras i batchar om högst batch_size; det är kedjans största buffert.
+    """
+
+    name = 'enrich'
+
+    def process(self, events):
+        enrichment_config = self.context.config.get('enrichment', {})
+        if not enrichment_config.get('enabled', True):
+            yield from events
+            return
+
+        batch_size = self.options.get('batch_size', DEFAULT_ENRICH_BATCH)
+        batch = []
+        for event in events:
+            batch.append(event)
+            if len(batch) >= batch_size:
+                yield from self.enrich(batch, enrichment_config)
+                batch = []
+        if batch:
+            yield from self.enrich(batch, enrichment_config)
+
+    def enrich(self, batch, enrichment_config):
+        stats = enrich_events(
+            batch,
+            self.context.region['gazetteer'],
+            cache_dir=enrichment_config.get('cache_dir', DEFAULT_CACHE_DIR),
+            max_workers=enrichment_config.get('max_workers', DEFAULT_MAX_WORKERS),
+            timeout=enrichment_config.get('timeout_seconds', DEFAULT_TIMEOUT),
+            session=self.context.session
+        )
+        if self.context.enrichment is None:
+            self.context.enrichment = dict.fromkeys(stats, 0)
+        for key, value in stats.items():
+            self.context.enrichment[key] += value
+        return batch
+
+class GeocodeStage(Stage):
+    name = 'geocode'
+
+    def process(self, events):
+        for event in events:
+            yield self.context.geocode(event.copy(), self.context.region)
+
+class StoreStage(Stage):
+    """Sänka: spara i databasen och samla de tillagda händelserna för exporten"""
+
+    name = 'store'
+
+    def process(self, events):
+        for event in events:
+            event_hash = create_event_hash(event)
+            self.context.store.insert_event(event, event_hash)
+            if self.context.known_hashes is not None:
+                self.context.known_hashes.add(event_hash)
+            self.context.added_events.append(event)
+            logger.info(f"➕ Ny händelse: {event.get('type', 'Okänt')} - {event_area(event) or 'Okänt område'}")
+            yield event
+
+class HotspotStage(Stage):
+    """
+    Räkna de tillagda händelserna in i de löpande antalen per område och
+    kategori (hotspots.py) och skriv hotspots.json när strömmen är slut.
+    Står efter store, så bara nya händelser räknas. Saknas sparat
+    tillstånd byggs det en gång från databasen. Ett tillstånd i kontexten
+    (daemon-läge) används i stället för filen och skrivs bara ut när nya
+    händelser räknats eller dagen bytts.
+    """
+
+    name = 'hotspots'
+
+    def process(self, events):
+        options = dict(self.context.config.get('hotspots', {}), **self.options)
+        if not options.pop('enabled', True):
+            yield from events
+            return
+
+        directory = self.context.region['hotspot_dir']
+        tracker = self.context.hotspots
+        if tracker is None:
+            tracker = self.context.hotspots = HotspotTracker.load(directory, **options)
+        today = today_number()
+        if not tracker.seeded and self.context.store is not None:
+            tracker.seed(self.context.store.timeline(), today)
+            logger.info(f"🔥 Hotspot-tillstånd byggt från databasen ({len(tracker.series)} serier)")
+
+        counted_events = 0
+        for event in events:
+            epoch = event_epoch(event)
+            if epoch is not None and tracker.add(event, epoch, today):
+                counted_events += 1
+            yield event
+
+        if not counted_events and tracker.saved_day == today:
+            return
+        found = tracker.save(directory, self.context.region['id'], today)
+        logger.info(f"🔥 Hotspots: {found} avvikande områden av {len(tracker.active)} aktiva serier")
+
+BUILTIN_STAGES = {
+    stage.name: stage
+    for stage in (FetchStage, ParseStage, ClassifyStage, WindowStage, DedupStage, EnrichStage, GeocodeStage, StoreStage, HotspotStage)
+}
+
+def resolve_stage(spec):
+    """Stegklass och options för en post i config.json ("window", {"stage": "window", "days": 7} eller "modul:Klass")"""
+    if isinstance(spec, str):
+        spec = {'stage': spec}
+    options = {key: value for key, value in spec.items() if key != 'stage'}
+    name = spec['stage']
+
+    if name in BUILTIN_STAGES:
+        return BUILTIN_STAGES[name], options
+    if ':' not in name:
+        raise ValueError(f"Okänt steg i pipeline: {name}")
+
+    module_name, class_name = name.split(':', 1)
+    stage_class = getattr(importlib.import_module(module_name), class_name)
+    if not (isinstance(stage_class, type) and issubclass(stage_class, Stage)):
+        raise ValueError(f"{name} är inte ett Stage")
+    return stage_class, options
+
+def build_stages(context, specs=None):
+    """Instansiera kedjan från config.json (pipeline.stages) eller standardkedjan"""
+    specs = specs or context.config.get('pipeline', {}).get('stages') or DEFAULT_STAGES
+    stages = []
+    for spec in specs:
+        stage_class, options = resolve_stage(spec)
+        stages.append(stage_class(context, **options))
+    return stages
+
+def stage_name(stage):
+    return stage.name or type(stage).__name__
+
+def counted(events, context, name):
+    for event in events:
+        context.counts[name] += 1
+        yield event
+
+def chain(context, stages, events=()):
+    """Koppla ihop stegen till en generator; inget körs förrän den itereras"""
+    stream = iter(events)
+    for stage in stages:
+        stream = counted(stage.process(stream), context, stage_name(stage))
+    return stream
+
+def run_pipeline(context, stages, events=()):
+    """
+    Dra händelserna genom kedjan. Allt som sparas skrivs i en transaktion.
+    Returnerar context med räknare per steg.
+    """
+    stream = chain(context, stages, events)
+    if context.store is not None:
+        with context.store.transaction():
+            for _ in stream:
+                pass
+    else:
+        for _ in stream:
+            pass
+
+    summary = ' → '.join(f"{stage_name(stage)} {context.counts[stage_name(stage)]}" for stage in stages)
+    logger.info(f"🧮 Pipeline: {summary}")
+    return context
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Klient för polisen.se API
+En delad HTTP-session och en svarscache per körning, så att uppdatering
+och diagnostik kan dela samma hämtning i stället för att anropa API:t igen
+"""
+
+import os
+import threading
+import time
+
+import requests
+
+# Samma bas-URL som detaljsidorna; POLISEN_BASE_URL pekar om mot en testserver
+POLISEN_BASE_URL = 'https://polisen.se'
+DEFAULT_TIMEOUT = 30
+
+class ApiResponse:
+    """Ett hämtat och tolkat svar"""
+
+    def __init__(self, url, status_code, size, elapsed, events):
+        self.url = url
+        self.status_code = status_code
+        self.size = size
+        self.elapsed = elapsed
+        self.events = events
+
+class PoliceApiClient:
+    """
+    Anrop mot /api/events med delad session och cache per parameteruppsättning.
+
+    Cachen gäller klientens livstid; en långlivad process skapar en ny
+    klient (med samma session) för varje hämtning.
+    """
+
+    def __init__(self, session=None, base_url=None, timeout=DEFAULT_TIMEOUT):
+        self.session = session or requests.Session()
+        self.base_url = (base_url or os.environ.get('POLISEN_BASE_URL') or POLISEN_BASE_URL).rstrip('/')
+        self.timeout = timeout
+        self.requests_made = 0
+        self._responses = {}
+        self._lock = threading.Lock()
+
+    @property
+    def events_url(self):
+        return f"{self.base_url}/api/events"
+
+    def fetch(self, **params):
+        """Hämta /api/events (eller ta svaret från cachen), kastar requests.RequestException vid fel"""
+        key = tuple(sorted(params.items()))
+        with self._lock:
+            cached = self._responses.get(key)
+        if cached:
+            return cached
+
+        started = time.perf_counter()
+        response = self.session.get(self.events_url, params=params or None, timeout=self.timeout)
+        response.raise_for_status()
+        result = ApiResponse(response.url, response.status_code, len(response.content), time.perf_counter() - started, response.json())
+
+        with self._lock:
+            self.requests_made += 1
+            self._responses[key] = result
+        return result
+
+    def events(self, **params):
+        return self.fetch(**params).events
+
+    def cached_responses(self):
+        """Alla svar som hämtats under körningen, i parameterordning"""
+        with self._lock:
+            return dict(self._responses)
+
+    def close(self):
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
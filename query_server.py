@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+Lokal frågetjänst för Stockholm Våldskarta
+Besvarar bbox-, tids- och typfrågor mot händelsedatabasen så att kartan
+bara behöver hämta händelserna i aktuell vy
+"""
+
+import argparse
+import gzip
+import hashlib
+import json
+import logging
+import posixpath
+import threading
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlparse
+
+from data_format import parse_event_datetime
+from event_store import DATABASE_FILE, EventStore
+from netlify_deploy import is_published, load_netlify_config
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Fält i kompakta svar, i samma ordning som varje rad
+RESPONSE_FIELDS = ['id', 'datetime', 'type', 'latitude', 'longitude', 'location_name', 'matched_area', 'summary', 'url']
+
+DEFAULT_LIMIT = 500
+MAX_LIMIT = 5000
+CACHE_MAX_AGE = 60
+
+class QueryError(ValueError):
+    """Ogiltig parameter i en fråga"""
+
+def parse_bbox(value):
+    """'min_lng,min_lat,max_lng,max_lat' -> tupel av flyttal"""
+    try:
+        parts = [float(part) for part in value.split(',')]
+    except ValueError:
+        raise QueryError(f"Ogiltig bbox: {value}")
+    if len(parts) != 4 or parts[0] > parts[2] or parts[1] > parts[3]:
+        raise QueryError(f"Ogiltig bbox: {value}")
+    return tuple(parts)
+
+def parse_time(value):
+    """Unix-tid eller ISO-datum (YYYY-MM-DD eller fullständig tidsstämpel)"""
+    if value.isdigit():
+        return int(value)
+    parsed = parse_event_datetime(value if ' ' in value or 'T' in value else f"{value} 00:00:00")
+    if parsed is None:
+        raise QueryError(f"Ogiltig tid: {value}")
+    return int(parsed.timestamp())
+
+def parse_cursor(value):
+    """Markör från föregående sida: 'epoch.rowid'"""
+    try:
+        epoch, rowid = value.split('.')
+        return int(epoch), int(rowid)
+    except ValueError:
+        raise QueryError(f"Ogiltig markör: {value}")
+
+def response_value(event, field):
+    """Fältvärde för svaret; äldre händelser har platsnamnet under location.name"""
+    if field == 'location_name':
+        return event.get('location_name') or (event.get('location') or {}).get('name')
+    return event.get(field)
+
+def build_events_response(store, params):
+    """Besvara /api/events med kompakt radformat"""
+    bbox = parse_bbox(params['bbox'][0]) if 'bbox' in params else None
+    since = parse_time(params['from'][0]) if 'from' in params else None
+    until = parse_time(params['to'][0]) if 'to' in params else None
+    after = parse_cursor(params['cursor'][0]) if 'cursor' in params else None
+    types = [t for t in params.get('types', []) if t]
+
+    try:
+        limit = min(int(params.get('limit', [DEFAULT_LIMIT])[0]), MAX_LIMIT)
+    except ValueError:
+        raise QueryError("Ogiltig limit")
+
+    rows, next_cursor = store.query_region(
+        bbox=bbox, since=since, until=until, types=types, limit=limit, after=after
+    )
+
+    return {
+        'fields': RESPONSE_FIELDS,
+        'rows': [[response_value(event, field) for field in RESPONSE_FIELDS] for _, _, event in rows],
+        'next': f"{next_cursor[0]}.{next_cursor[1]}" if next_cursor else None
+    }
+
+class QueryHandler(SimpleHTTPRequestHandler):
+    """
+    Serverar /api/* från databasen och de publicerade filerna statiskt.
+    Bara det som deployas till Netlify (netlify.publish) serveras; config,
+    databas, kö, backuper och liknande ger 404.
+    """
+
+    store = None
+    store_lock = threading.Lock()
+    publish_patterns = None
+
+    def log_message(self, format, *args):
+        logger.debug(format % args)
+
+    def end_headers(self):
+        self.send_header('Access-Control-Allow-Origin', '*')
+        super().end_headers()
+
+    def static_allowed(self, path):
+        """Statiska filer bara om de ingår i publiceringen ('/' är index.html)"""
+        site_path = posixpath.normpath(unquote(path)) if path != '/' else '/index.html'
+        if is_published(site_path, self.publish_patterns):
+            return True
+        self.send_json(404, {'error': 'Okänd sökväg'})
+        return False
+
+    def do_HEAD(self):
+        if self.static_allowed(urlparse(self.path).path):
+            super().do_HEAD()
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if not url.path.startswith('/api/'):
+            if self.static_allowed(url.path):
+                super().do_GET()
+            return
+
+        params = parse_qs(url.query)
+
+        try:
+            with self.store_lock:
+                version = self.store.data_version()
+                etag = '"' + hashlib.sha1(f"{version}|{url.path}|{url.query}".encode('utf-8')).hexdigest() + '"'
+
+                if self.headers.get('If-None-Match') == etag:
+                    self.send_response(304)
+                    self.send_header('ETag', etag)
+                    self.send_header('Cache-Control', f'public, max-age={CACHE_MAX_AGE}')
+                    self.end_headers()
+                    return
+
+                if url.path == '/api/events':
+                    payload = build_events_response(self.store, params)
+                elif url.path == '/api/types':
+                    payload = {'types': self.store.type_counts()}
+                else:
+                    self.send_json(404, {'error': 'Okänd sökväg'})
+                    return
+
+            payload['version'] = version
+            self.send_json(200, payload, etag)
+
+        except QueryError as e:
+            self.send_json(400, {'error': str(e)})
+
+    def send_json(self, status, payload, etag=None):
+        body = json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        if etag:
+            self.send_header('ETag', etag)
+            self.send_header('Cache-Control', f'public, max-age={CACHE_MAX_AGE}')
+        else:
+            self.send_header('Cache-Control', 'no-store')
+
+        if 'gzip' in self.headers.get('Accept-Encoding', '') and len(body) > 1024:
+            body = gzip.compress(body)
+            self.send_header('Content-Encoding', 'gzip')
+        self.send_header('Vary', 'Accept-Encoding')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+def main():
+    parser = argparse.ArgumentParser(description='Frågetjänst för Stockholm Våldskarta')
+    parser.add_argument('--db', default=DATABASE_FILE)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    args = parser.parse_args()
+
+    QueryHandler.store = EventStore(args.db, check_same_thread=False)
+    QueryHandler.publish_patterns = load_netlify_config()['publish']
+    server = ThreadingHTTPServer((args.host, args.port), QueryHandler)
+
+    logger.info(f"🌐 Frågetjänst på http://{args.host}:{args.port}/ ({QueryHandler.store.count()} händelser)")
+    logger.info(f"🗺️ Vyläge: http://{args.host}:{args.port}/index.html?api=http://{args.host}:{args.port}")
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        logger.info("👋 Avslutar")
+    finally:
+        server.server_close()
+        QueryHandler.store.close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+"""
+Omprocessering av arkivet för Stockholm Våldskarta
+Kör aktuell klassificering och geokodning på alla sparade händelser,
+uppdelat i shards över en processpool. Färdiga shards sparas som
+checkpoints så att en avbruten körning kan återupptas. Platstext från
+cachade detaljsidor (enrichment.py) används, men inget hämtas från nätet.
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+import shutil
+import sys
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+from auto_update import DEFAULT_REGION, export_region, improve_coordinates, is_violence_event, load_config, load_regions, open_event_store, run_lock
+from data_format import create_event_hash, write_atomic
+from enrichment import DEFAULT_CACHE_DIR, DetailCache, apply_cached_detail
+from staging import staged_outputs
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Höj när klassificering eller geokodning ändras, så att gamla checkpoints ignoreras
+STAGES_VERSION = 2
+
+CHECKPOINT_DIR = 'reprocess_checkpoints'
+DEFAULT_SHARD_SIZE = 250
+
+def normalized_confidence(value):
+    """Äldre händelser anger säkerhet i procent (50), nyare som andel (0.95)"""
+    if not isinstance(value, (int, float)):
+        return 0.0
+    return value / 100 if value > 1 else float(value)
+
+def migrate_legacy_fields(event):
+    """Äldre händelser har platsnamnet under location.name i stället för location_name"""
+    location = event.get('location')
+    if not event.get('location_name') and isinstance(location, dict) and location.get('name'):
+        event['location_name'] = location['name']
+    return event
+
+def geocode(event, region):
+    """
+    Kör aktuell geokodning. Koordinater från en källa (location_source)
+    behålls om geokodningen inte ger högre säkerhet.
+    """
+    candidate = improve_coordinates(dict(event), region)
+    if event.get('location_source') and (
+        normalized_confidence(event.get('location_confidence')) >= normalized_confidence(candidate['location_confidence'])
+    ):
+        return event
+    return candidate
+
+def reprocess_event(event, region=DEFAULT_REGION, detail_cache=None):
+    """Klassificering och geokodning för en händelse, None om den inte längre klassas som våld"""
+    if not is_violence_event(event):
+        return None
+    event = migrate_legacy_fields(dict(event))
+    if detail_cache:
+        event = apply_cached_detail(event, detail_cache, region['gazetteer'])
+    return geocode(event, region)
+
+def process_shard(shard_no, events, region, detail_cache_dir=None):
+    """Arbetsprocess: omprocessera en shard och returnera resultat och tidsåtgång"""
+    started = time.perf_counter()
+    detail_cache = DetailCache(detail_cache_dir) if detail_cache_dir else None
+    processed = []
+    dropped = []
+    changed = 0
+
+    for event_hash, event in events:
+        result = reprocess_event(event, region, detail_cache)
+        if result is None:
+            dropped.append(event_hash)
+            continue
+        if result != event:
+            changed += 1
+        processed.append([event_hash, result])
+
+    return {
+        'shard': shard_no,
+        'pid': os.getpid(),
+        'events': processed,
+        'dropped': dropped,
+        'changed': changed,
+        'count': len(events),
+        'elapsed': time.perf_counter() - started
+    }
+
+def shard_signature(events):
+    """Signatur för en shards indata och stegversion; checkpoints med annan signatur körs om"""
+    sha1 = hashlib.sha1(f"stages-v{STAGES_VERSION}".encode('utf-8'))
+    for event_hash, _ in events:
+        sha1.update(event_hash.encode('utf-8'))
+    return sha1.hexdigest()
+
+def checkpoint_path(checkpoint_dir, shard_no):
+    return Path(checkpoint_dir) / f"shard_{shard_no:05d}.json"
+
+def load_checkpoint(checkpoint_dir, shard_no, signature):
+    """Läs en färdig shard, None om den saknas eller gäller annan indata"""
+    try:
+        with open(checkpoint_path(checkpoint_dir, shard_no), 'r', encoding='utf-8') as f:
+            checkpoint = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+    return checkpoint if checkpoint.get('signature') == signature else None
+
+def save_checkpoint(checkpoint_dir, result, signature):
+    """Spara en färdig shard atomärt, en halvskriven checkpoint kan aldrig läsas"""
+    checkpoint = dict(result, signature=signature)
+    write_atomic(checkpoint_path(checkpoint_dir, result['shard']), json.dumps(checkpoint, ensure_ascii=False), staged=False)
+
+def reprocess_archive(region=DEFAULT_REGION, workers=None, shard_size=DEFAULT_SHARD_SIZE, checkpoint_dir=CHECKPOINT_DIR, restart=False, dry_run=False):
+    """Omprocessera en regions arkiv och skriv tillbaka resultatet"""
+    checkpoint_dir = os.path.join(checkpoint_dir, region['id'])
+    if restart:
+        shutil.rmtree(checkpoint_dir, ignore_errors=True)
+    os.makedirs(checkpoint_dir, exist_ok=True)
+
+    detail_cache_dir = load_config().get('enrichment', {}).get('cache_dir', DEFAULT_CACHE_DIR)
+
+    store = open_event_store(region)
+    try:
+        archive = [(create_event_hash(event), event) for event in store.all_events()]
+        shards = [archive[i:i + shard_size] for i in range(0, len(archive), shard_size)]
+        signatures = [shard_signature(shard) for shard in shards]
+
+        results = {}
+        pending = []
+        for shard_no, shard in enumerate(shards):
+            checkpoint = load_checkpoint(checkpoint_dir, shard_no, signatures[shard_no])
+            if checkpoint:
+                results[shard_no] = checkpoint
+            else:
+                pending.append(shard_no)
+
+        logger.info(f"🧩 {len(archive)} händelser i {len(shards)} shards, {len(results)} klara från checkpoint")
+
+        # Genomströmning per arbetsprocess (bara shards som kördes nu)
+        worker_events = defaultdict(int)
+        worker_seconds = defaultdict(float)
+        started = time.perf_counter()
+
+        if pending:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                futures = [executor.submit(process_shard, shard_no, shards[shard_no], region, detail_cache_dir) for shard_no in pending]
+                for future in as_completed(futures):
+                    result = future.result()
+                    save_checkpoint(checkpoint_dir, result, signatures[result['shard']])
+                    results[result['shard']] = result
+                    worker_events[result['pid']] += result['count']
+                    worker_seconds[result['pid']] += result['elapsed']
+                    logger.info(f"✅ Shard {result['shard'] + 1}/{len(shards)}: {result['changed']} ändrade, {len(result['dropped'])} borttagna")
+
+        wall_seconds = time.perf_counter() - started
+        for pid in sorted(worker_events):
+            rate = worker_events[pid] / worker_seconds[pid] if worker_seconds[pid] else 0
+            logger.info(f"⚙️ Process {pid}: {worker_events[pid]} händelser, {rate:.0f} händelser/s")
+        if worker_events:
+            total = sum(worker_events.values())
+            logger.info(f"📊 Totalt {total} händelser på {wall_seconds:.2f} s ({total / wall_seconds:.0f} händelser/s)")
+
+        changed = sum(results[shard_no]['changed'] for shard_no in range(len(shards)))
+        dropped = [event_hash for shard_no in range(len(shards)) for event_hash in results[shard_no]['dropped']]
+
+        if dry_run:
+            logger.info(f"🔍 Testkörning: {changed} skulle ändras, {len(dropped)} tas bort")
+            return
+
+        # Allt skrivs tillbaka i en transaktion, sedan exporteras JSON-filen atomärt
+        with store.transaction():
+            for shard_no in range(len(shards)):
+                for event_hash, event in results[shard_no]['events']:
+                    store.replace_event(event, event_hash)
+            for event_hash in dropped:
+                store.delete_event(event_hash)
+
+        timeline = list(store.timeline())
+        with staged_outputs():
+            export_region(store, timeline, region=region)
+
+        logger.info(f"💾 Omprocessering klar: {changed} ändrade, {len(dropped)} borttagna, {len(timeline)} händelser")
+    finally:
+        store.close()
+
+    # Checkpoints behövs inte längre när resultatet är skrivet
+    shutil.rmtree(checkpoint_dir, ignore_errors=True)
+
+def main():
+    parser = argparse.ArgumentParser(description='Omprocessera arkivet med aktuell klassificering och geokodning')
+    parser.add_argument('--region', default=DEFAULT_REGION['id'], help='Regionens id i config.json')
+    parser.add_argument('--workers', type=int, help='Antal processer (standard: antal kärnor)')
+    parser.add_argument('--shard-size', type=int, default=DEFAULT_SHARD_SIZE)
+    parser.add_argument('--checkpoint-dir', default=CHECKPOINT_DIR)
+    parser.add_argument('--restart', action='store_true', help='Ignorera befintliga checkpoints')
+    parser.add_argument('--dry-run', action='store_true', help='Rapportera ändringar utan att skriva')
+    parser.add_argument('--lock-timeout', type=int, default=300, help='Sekunder att vänta på körningslåset')
+    args = parser.parse_args()
+
+    regions = {region['id']: region for region in load_regions()}
+    if args.region not in regions:
+        parser.error(f"Okänd region: {args.region}")
+
+    # Samma lås som auto_update.py, så att en schemalagd körning inte skriver samtidigt.
+    # En daemon håller låset hela livstiden, så vi väntar inte för evigt.
+    lock, _ = run_lock()
+    if not lock.acquire():
+        logger.info(f"⏳ Väntar på körningslåset (högst {args.lock_timeout} s)")
+        if not lock.acquire(timeout=args.lock_timeout):
+            owner = lock.owner() or {}
+            logger.error(
+                f"❌ Körningslåset hålls av pid {owner.get('pid', '?')} på {owner.get('host', '?')}; "
+                f"stoppa daemonen eller försök igen senare"
+            )
+            sys.exit(1)
+    try:
+        reprocess_archive(
+            region=regions[args.region],
+            workers=args.workers,
+            shard_size=args.shard_size,
+            checkpoint_dir=args.checkpoint_dir,
+            restart=args.restart,
+            dry_run=args.dry_run
+        )
+    finally:
+        lock.release()
+
+if __name__ == '__main__':
+    main()
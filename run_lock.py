@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+Körningslås och uppdateringskö för Stockholm Våldskarta
+Cron, daemon och manuella körningar tar samma lås (en lockfil med pid,
+värd och senaste livstecken) innan de rör databasen eller utdata. Ett lås
+vars process inte längre finns, eller som inte förnyats på länge, räknas
+som övergivet och bryts. En körning som inte får låset lägger sina
+hämtade händelser i kön; körningen som håller låset slår in dem.
+"""
+
+import json
+import logging
+import os
+import socket
+import time
+import uuid
+from datetime import datetime
+
+from data_format import remove_output, write_atomic
+
+logger = logging.getLogger(__name__)
+
+LOCK_FILE = 'auto_update.lock'
+QUEUE_DIR = 'update_queue'
+DEFAULT_STALE_MINUTES = 120
+POLL_SECONDS = 1.0
+
+def process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+class RunLock:
+    """
+    Rådgivande lås i en fil som skapas med O_EXCL. Ägaren identifieras med
+    en token så att bara den som tog låset kan släppa eller förnya det.
+    """
+
+    def __init__(self, path=LOCK_FILE, stale_seconds=DEFAULT_STALE_MINUTES * 60):
+        self.path = path
+        self.stale_seconds = stale_seconds
+        self.token = uuid.uuid4().hex
+        self.held = False
+
+    def owner(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except json.JSONDecodeError:
+            # Skrivs just nu, eller trasig efter en krasch; avgörs av filens ålder
+            try:
+                return {'token': None, 'heartbeat': os.path.getmtime(self.path)}
+            except FileNotFoundError:
+                return None
+
+    def owner_record(self):
+        return {
+            'token': self.token,
+            'pid': os.getpid(),
+            'host': socket.gethostname(),
+            'started_at': datetime.now().isoformat(),
+            'heartbeat': time.time()
+        }
+
+    def is_stale(self, owner):
+        """På samma värd avgör processen; annars (t.ex. delad katalog) livstecknets ålder"""
+        if owner.get('host') == socket.gethostname() and owner.get('pid'):
+            return not process_alive(owner['pid'])
+        return time.time() - owner.get('heartbeat', 0) > self.stale_seconds
+
+    def try_acquire(self):
+        try:
+            fd = os.open(self.path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+        except FileExistsError:
+            return False
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(self.owner_record(), f)
+        self.held = True
+        return True
+
+    def break_stale(self, owner):
+        """Ta bort ett övergivet lås; ett lås som hunnit bytas ägare läggs tillbaka"""
+        broken_path = f"{self.path}.stale-{self.token}"
+        try:
+            os.rename(self.path, broken_path)
+        except FileNotFoundError:
+            return
+        with open(broken_path, 'r', encoding='utf-8', errors='replace') as f:
+            content = f.read()
+        if owner.get('token') and owner['token'] not in content:
+            try:
+                os.link(broken_path, self.path)
+            except FileExistsError:
+                pass
+        else:
+            logger.warning(f"🔓 Bröt övergivet lås (pid {owner.get('pid', '?')}, värd {owner.get('host', '?')})")
+        os.remove(broken_path)
+
+    def acquire(self, timeout=0):
+        """
+        Ta låset. timeout=0 ger upp direkt, None väntar tills låset är
+        ledigt. Returnerar True om låset togs.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            if self.try_acquire():
+                return True
+            owner = self.owner()
+            if owner is not None and self.is_stale(owner):
+                self.break_stale(owner)
+                continue
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(POLL_SECONDS)
+
+    def heartbeat(self):
+        """Förnya livstecknet (långa körningar och daemon-läge)"""
+        if not self.held:
+            return
+        owner = self.owner() or {}
+        if owner.get('token') != self.token:
+            logger.error("❌ Körningslåset har tagits av en annan process")
+            self.held = False
+            return
+        owner['heartbeat'] = time.time()
+        write_atomic(self.path, json.dumps(owner), staged=False)
+
+    def release(self):
+        if not self.held:
+            return
+        self.held = False
+        if (self.owner() or {}).get('token') == self.token:
+            os.remove(self.path)
+
+    def __enter__(self):
+        self.acquire(timeout=None)
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+def enqueue_update(events_by_region, queue_dir=QUEUE_DIR):
+    """Lägg en körnings hämtade händelser ({region_id: [händelse]}) i kön"""
+    os.makedirs(queue_dir, exist_ok=True)
+    path = os.path.join(queue_dir, f"{time.time_ns()}-{os.getpid()}.json")
+    payload = {'queued_at': datetime.now().isoformat(), 'pid': os.getpid(), 'regions': events_by_region}
+    write_atomic(path, json.dumps(payload, ensure_ascii=False), staged=False)
+    return path
+
+def pending_updates(queue_dir=QUEUE_DIR):
+    """Köade uppdateringar i ordning: lista med (sökväg, innehåll)"""
+    try:
+        file_names = sorted(name for name in os.listdir(queue_dir) if name.endswith('.json'))
+    except FileNotFoundError:
+        return []
+
+    pending = []
+    for file_name in file_names:
+        path = os.path.join(queue_dir, file_name)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                pending.append((path, json.load(f)))
+        except (FileNotFoundError, json.JSONDecodeError):
+            logger.warning(f"⚠️ Hoppar över oläslig köfil {path}")
+    return pending
+
+def queued_events(pending, region_id):
+    return [event for _, payload in pending for event in payload.get('regions', {}).get(region_id, [])]
+
+def merged_updates(pending, region_ids):
+    """Köfilerna vars händelser alla hör till regionerna i region_ids (och har slagits in)"""
+    region_ids = set(region_ids)
+    return [
+        (path, payload) for path, payload in pending
+        if {region_id for region_id, events in payload.get('regions', {}).items() if events} <= region_ids
+    ]
+
+def consume_updates(pending):
+    """Ta bort köfilerna; under staged_outputs() först när utdata publiceras"""
+    for path, _ in pending:
+        remove_output(path)
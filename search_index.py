@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Fritextindex för Stockholm Våldskarta
+Inverterat index över sammanfattning och platsnamn med svensk stamning,
+publicerat som små shards per begynnelsebokstav som kartan söker i med
+prefixmatchning
+"""
+
+import hashlib
+import json
+import os
+import re
+
+from data_format import output_files, remove_output, write_atomic
+
+SEARCH_INDEX_VERSION = 1
+
+# Höj när tokenisering eller stamning ändras; databasens termer byggs då om
+STEMMER_VERSION = 1
+
+SHARD_PREFIX_LENGTH = 1
+
+TOKEN_PATTERN = re.compile(r'[0-9a-zåäöéü]+')
+
+STOPWORDS = frozenset("""
+alla allt att av blev bli blir de dem den denna deras dess det detta dig din
+ditt du där efter ej eller en er era ett från för ha hade han hans har hon
+honom hur här i icke ingen inom inte jag ju kan kunde man med mellan men mig
+min mina mot mycket ni nu någon något några när och om oss på samma sedan sig
+sin sina sitta själv skulle som så sådan till under upp ut utan vad var vara
+varit vars vart vem vi vid vilka vilken vilket vår vårt än är åt över
+""".split())
+
+# Snowball-stemmern för svenska (steg 1-3)
+VOWELS = set('aeiouyäåö')
+S_ENDINGS = set('bcdfghjklmnoprtvy')
+STEP1_SUFFIXES = sorted("""
+a arna erna heterna orna ad e ade ande arne are aste en anden aren heten ern
+ar er heter or as arnas ernas ornas es ades andes ens arens hetens erns at
+andet het ast
+""".split(), key=len, reverse=True)
+STEP2_ENDINGS = ('dd', 'gd', 'nn', 'dt', 'gt', 'kt', 'tt')
+
+def _r1(word):
+    """Början av R1: efter första icke-vokal som följer en vokal, minst 3 tecken in"""
+    for i in range(1, len(word)):
+        if word[i] not in VOWELS and word[i - 1] in VOWELS:
+            return max(i + 1, 3)
+    return len(word)
+
+def stem(word):
+    """Stamma ett ord ("skottlossningar" -> "skottlossning")"""
+    r1 = _r1(word)
+
+    # Steg 1: längsta böjningsändelse i R1
+    for suffix in STEP1_SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= r1:
+            word = word[:-len(suffix)]
+            break
+    else:
+        if word.endswith('s') and len(word) - 1 >= r1 and len(word) > 1 and word[-2] in S_ENDINGS:
+            word = word[:-1]
+
+    # Steg 2: dubbelkonsonant i slutet av R1
+    if any(word.endswith(ending) and len(word) - 2 >= r1 for ending in STEP2_ENDINGS):
+        word = word[:-1]
+
+    # Steg 3: avledningsändelser
+    if word.endswith('fullt') and len(word) - 5 >= r1:
+        word = word[:-1]
+    elif word.endswith('löst') and len(word) - 4 >= r1:
+        word = word[:-1]
+    else:
+        for suffix in ('lig', 'els', 'ig'):
+            if word.endswith(suffix) and len(word) - len(suffix) >= r1:
+                word = word[:-len(suffix)]
+                break
+
+    return word
+
+def tokenize(text):
+    """Gemener, ord utan stoppord och ensamma tecken"""
+    return [token for token in TOKEN_PATTERN.findall((text or '').lower()) if len(token) > 1 and token not in STOPWORDS]
+
+def event_terms(event):
+    """Stammade söktermer för sammanfattning och platsnamn"""
+    location_name = event.get('location_name') or (event.get('location') or {}).get('name') or ''
+    return {stem(token) for token in tokenize(f"{event.get('summary', '')} {location_name}")}
+
+def shard_key(term):
+    return term[:SHARD_PREFIX_LENGTH]
+
+def shard_file_name(key):
+    """Filnamn utan å/ä/ö: prefixet hexkodat"""
+    return f"{key.encode('utf-8').hex()}.json"
+
+def build_shards(term_positions):
+    """
+    Gruppera {term: [positioner]} i shards per prefix.
+
+    Positionerna är händelsernas plats i den publicerade filen och
+    deltakodas (första värdet absolut, sedan skillnader).
+    """
+    shards = {}
+    for term in sorted(term_positions):
+        positions = sorted(term_positions[term])
+        deltas = [positions[0]] + [b - a for a, b in zip(positions, positions[1:])]
+        shards.setdefault(shard_key(term), {})[term] = deltas
+    return shards
+
+def write_search_index(search_dir, term_positions, count):
+    """
+    Skriv manifest och shards. Oförändrade shards skrivs inte om, så att
+    en inkrementell deploy bara laddar upp de prefix som fått nya termer.
+    """
+    shards = build_shards(term_positions)
+    manifest_shards = {}
+    written = 0
+
+    for key, terms in sorted(shards.items()):
+        content = json.dumps({'terms': terms}, ensure_ascii=False, sort_keys=True, separators=(',', ':'))
+        file_name = shard_file_name(key)
+        path = os.path.join(search_dir, file_name)
+
+        digest = hashlib.sha1(content.encode('utf-8')).hexdigest()[:12]
+        manifest_shards[key] = {'file': file_name, 'digest': digest, 'terms': len(terms)}
+
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                unchanged = f.read() == content
+        except FileNotFoundError:
+            unchanged = False
+        if not unchanged:
+            write_atomic(path, content)
+            written += 1
+
+    # Shards för prefix som inte längre finns tas bort
+    current_files = {entry['file'] for entry in manifest_shards.values()}
+    for file_name in output_files(search_dir):
+        if file_name.endswith('.json') and file_name != 'manifest.json' and file_name not in current_files:
+            remove_output(os.path.join(search_dir, file_name))
+
+    manifest = {
+        'version': SEARCH_INDEX_VERSION,
+        'stemmer': f"snowball-sv-{STEMMER_VERSION}",
+        'count': count,
+        'prefix_length': SHARD_PREFIX_LENGTH,
+        'shards': manifest_shards
+    }
+    write_atomic(os.path.join(search_dir, 'manifest.json'), json.dumps(manifest, ensure_ascii=False, sort_keys=True, indent=1) + '\n')
+
+    return {'terms': len(term_positions), 'shards': len(manifest_shards), 'shards_written': written}
@@ -10,14 +10,21 @@ import subprocess
 import sys
 from pathlib import Path
 
-def setup_cron():
-    """Sätter upp cron job för automatisk uppdatering"""
+def setup_cron(daemon=False):
+    """
+    Sätter upp cron job för automatisk uppdatering.
+
+    Med daemon=True startas auto_update.py --daemon vid omstart i stället,
+    och daemonen sköter själv pollningen med adaptivt intervall.
+    """
     try:
         # Ladda konfiguration
         with open('config.json', 'r') as f:
             config = json.load(f)
         
         schedule = config.get('automation', {}).get('schedule', '0 */6 * * *')
+        if daemon:
+            schedule = '@reboot'
         
         # Få absolut sökväg till script
         script_dir = Path(__file__).parent.absolute()
@@ -29,13 +36,14 @@ def setup_cron():
         (script_dir / 'logs').mkdir(exist_ok=True)
         
         # Cron kommando
-        cron_command = f"cd {script_dir} && {venv_python} {script_path} >> {log_file} 2>&1"
+        daemon_flag = ' --daemon' if daemon else ''
+        cron_command = f"cd {script_dir} && {venv_python} {script_path}{daemon_flag} >> {log_file} 2>&1"
         
         # Lägg till cron job
         cron_entry = f"{schedule} {cron_command}"
         
         print("🕐 Sätter upp automatisk schemaläggning...")
-        print(f"📅 Schema: {schedule} (var 6:e timme)")
+        print(f"📅 Schema: {schedule}" + (" (daemon med adaptiv pollning)" if daemon else " (var 6:e timme)"))
         print(f"📂 Script: {script_path}")
         print(f"📝 Loggar: {log_file}")
         
@@ -144,13 +152,15 @@ def main():
         
         if command == 'install':
             setup_cron()
+        elif command == 'daemon':
+            setup_cron(daemon=True)
         elif command == 'status':
             show_cron_status()
         elif command == 'remove':
             remove_cron()
         else:
             print(f"❌ Okänt kommando: {command}")
-            print("Tillgängliga kommandon: install, status, remove")
+            print("Tillgängliga kommandon: install, daemon, status, remove")
     else:
         print("Välj en åtgärd:")
         print("1. Installera automatisering")
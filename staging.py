@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Stegvisa skrivningar för Stockholm Våldskarta
+Under en uppdatering skrivs alla utdata (datafiler, arkiv, sökindex,
+deltan, årsarkiv, hotspots och rapport) till en temporär katalog. Först när
+allt är skrivet sparas en journal, och filerna flyttas på plats med
+os.replace. En körning som kraschar före journalen lämnar de publicerade
+filerna orörda; en krasch under flytten fullföljs av nästa körning.
+Transaktionen gäller tråden som öppnade den, så att regionerna kan
+publicera var för sig; ett block inne i en pågående transaktion blir en
+deltransaktion som bara tas med om blocket lyckas.
+"""
+
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+STAGING_ROOT = '.staging'
+JOURNAL_FILE = 'COMMIT'
+
+# Pågående transaktion per tråd (regionerna körs i egna trådar)
+_local = threading.local()
+
+class OutputTransaction:
+    """
+    Utdata för en körning. Målsökvägarna speglas under transaktionens
+    katalog; borttagningar noteras och utförs vid commit. Deltransaktioner
+    (parent) tas över med adopt() när de lyckas.
+    """
+
+    def __init__(self, root=STAGING_ROOT, parent=None):
+        if parent is not None:
+            self.directory = os.path.join(parent.directory, 'parts', uuid.uuid4().hex[:8])
+        else:
+            self.directory = os.path.join(root, f"{time.strftime('%Y%m%d_%H%M%S')}-{os.getpid()}-{uuid.uuid4().hex[:6]}")
+        self.files = {}
+        self.removed = set()
+        self.lock = threading.Lock()
+
+    def stage(self, path):
+        """Sökvägen som en skrivning till path ska gå till"""
+        target = os.path.normpath(path)
+        staged = os.path.join(self.directory, 'files', target.lstrip(os.sep))
+        os.makedirs(os.path.dirname(staged), exist_ok=True)
+        with self.lock:
+            self.files[target] = staged
+            self.removed.discard(target)
+        return staged
+
+    def remove(self, path):
+        target = os.path.normpath(path)
+        with self.lock:
+            staged = self.files.pop(target, None)
+            self.removed.add(target)
+        if staged:
+            os.remove(staged)
+
+    def adopt(self, child):
+        """Ta över en lyckad deltransaktions skrivningar och borttagningar"""
+        with self.lock:
+            for target in child.removed:
+                self.files.pop(target, None)
+                self.removed.add(target)
+            for target, staged in child.files.items():
+                self.files[target] = staged
+                self.removed.discard(target)
+
+    def commit(self):
+        """Skriv journalen och flytta filerna på plats"""
+        os.makedirs(self.directory, exist_ok=True)
+        journal = {'files': self.files, 'removed': sorted(self.removed)}
+        journal_path = os.path.join(self.directory, JOURNAL_FILE)
+        with open(f"{journal_path}.tmp", 'w', encoding='utf-8') as f:
+            json.dump(journal, f, ensure_ascii=False)
+        os.replace(f"{journal_path}.tmp", journal_path)
+
+        apply_journal(self.directory)
+        logger.info(f"📦 {len(self.files)} filer publicerade, {len(self.removed)} borttagna")
+
+    def abort(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+def apply_journal(directory):
+    """Flytta journalens filer på plats; kan köras om efter en krasch"""
+    with open(os.path.join(directory, JOURNAL_FILE), 'r', encoding='utf-8') as f:
+        journal = json.load(f)
+
+    for target, staged in journal['files'].items():
+        if os.path.exists(staged):
+            if os.path.dirname(target):
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+            os.replace(staged, target)
+    for target in journal['removed']:
+        try:
+            os.remove(target)
+        except FileNotFoundError:
+            pass
+
+    shutil.rmtree(directory, ignore_errors=True)
+
+def recover(root=STAGING_ROOT):
+    """
+    Städa efter avbrutna körningar (anropas med körningslåset taget).
+    Transaktioner med journal fullföljs, övriga kastas.
+    """
+    try:
+        entries = sorted(os.listdir(root))
+    except FileNotFoundError:
+        return {'completed': 0, 'discarded': 0}
+
+    stats = {'completed': 0, 'discarded': 0}
+    for entry in entries:
+        directory = os.path.join(root, entry)
+        if os.path.exists(os.path.join(directory, JOURNAL_FILE)):
+            apply_journal(directory)
+            stats['completed'] += 1
+            logger.warning(f"♻️ Fullföljde avbruten publicering {entry}")
+        else:
+            shutil.rmtree(directory, ignore_errors=True)
+            stats['discarded'] += 1
+            logger.warning(f"🗑️ Kastade ofullständig körning {entry}")
+    return stats
+
+def active_transaction():
+    return getattr(_local, 'transaction', None)
+
+@contextmanager
+def staged_outputs(root=STAGING_ROOT):
+    """
+    Samla alla write_atomic()/remove_output() i blocket och publicera dem
+    tillsammans när blocket avslutas utan fel.
+
+    Transaktionen gäller den egna tråden; andra trådar kan ha egna som
+    publiceras oberoende. Inne i en pågående transaktion blir blocket en
+    deltransaktion: vid fel kastas dess filer, vid framgång tas de med i
+    commit.
+    """
+    parent = active_transaction()
+    transaction = OutputTransaction(root) if parent is None else OutputTransaction(parent=parent)
+    _local.transaction = transaction
+    try:
+        yield transaction
+    except BaseException:
+        transaction.abort()
+        raise
+    finally:
+        _local.transaction = parent
+
+    if parent is None:
+        transaction.commit()
+    else:
+        parent.adopt(transaction)
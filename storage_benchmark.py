@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Mäter git-tillväxt för datafilen över ett simulerat år av auto-update-commits
+Jämför det gamla formatet (indent=2, osorterat) med det kanoniska formatet
+"""
+
+import argparse
+import copy
+import json
+import random
+import subprocess
+import tempfile
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from data_format import dumps_canonical
+from event_store import ARCHIVE_FILE
+
+DATA_FILE = 'stockholm_violence_data.json'
+
+def dumps_legacy(events, metadata):
+    """Gamla save_data(): hela datasetet med indent=2 i insättningsordning"""
+    return json.dumps({'events': events, 'metadata': metadata}, indent=2, ensure_ascii=False)
+
+def git(repo, *args):
+    """Kör ett git-kommando i simuleringsrepot"""
+    return subprocess.run(
+        ['git', '-c', 'user.name=bench', '-c', 'user.email=bench@example.com', *args],
+        cwd=repo, check=True, capture_output=True, text=True
+    ).stdout
+
+def make_new_event(template, event_id, when, rng):
+    """Skapa en syntetisk ny händelse baserad på en befintlig"""
+    event = copy.deepcopy(template)
+    event['id'] = event_id
+    event['datetime'] = when.strftime('%Y-%m-%d %H:%M:%S +02:00')
+    event['fetch_timestamp'] = datetime.now().isoformat()
+    event['latitude'] = event.get('latitude', 59.3293) + (rng.random() - 0.5) * 0.01
+    event['longitude'] = event.get('longitude', 18.0686) + (rng.random() - 0.5) * 0.01
+    return event
+
+def simulate(fmt, base_events, days, runs_per_day, seed):
+    """Simulera ett år av commits och returnera storleksmått"""
+    rng = random.Random(seed)
+    dumps = dumps_canonical if fmt == 'canonical' else dumps_legacy
+    events = copy.deepcopy(base_events)
+    next_id = max(e.get('id', 0) for e in events) + 1
+    when = datetime(2026, 1, 1)
+
+    with tempfile.TemporaryDirectory() as repo:
+        git(repo, 'init', '-q')
+        path = Path(repo) / DATA_FILE
+
+        for run in range(days * runs_per_day):
+            when += timedelta(hours=24 / runs_per_day)
+            for _ in range(rng.randint(0, 4)):
+                events.append(make_new_event(rng.choice(base_events), next_id, when, rng))
+                next_id += 1
+
+            metadata = {'last_updated': when.isoformat(), 'total_events': len(events), 'version': '2.0'}
+            path.write_text(dumps(events, metadata), encoding='utf-8')
+            git(repo, 'add', DATA_FILE)
+            git(repo, 'commit', '-q', '-m', f'run {run}')
+
+        changed_lines = 0
+        for line in git(repo, 'log', '--numstat', '--format=').splitlines():
+            added, deleted, _ = line.split('\t')
+            changed_lines += int(added) + int(deleted)
+
+        loose = dict(l.split(': ') for l in git(repo, 'count-objects', '-v').splitlines())
+        git(repo, 'gc', '-q')
+        packed = dict(l.split(': ') for l in git(repo, 'count-objects', '-v').splitlines())
+
+        return {
+            'format': fmt,
+            'commits': days * runs_per_day,
+            'final_events': len(events),
+            'final_file_kb': round(path.stat().st_size / 1024, 1),
+            'changed_lines': changed_lines,
+            'loose_objects_kb': int(loose['size']),
+            'packed_kb': int(packed['size-pack'])
+        }
+
+def main():
+    parser = argparse.ArgumentParser(description='Simulera git-tillväxt för datafilen')
+    parser.add_argument('--days', type=int, default=365)
+    parser.add_argument('--runs-per-day', type=int, default=4)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    # Simuleringen utgår från fullständiga händelser, som före den publika projektionen
+    with open(ARCHIVE_FILE, 'r', encoding='utf-8') as f:
+        base_events = json.load(f)['events']
+
+    print(f"📊 Simulerar {args.days} dagar × {args.runs_per_day} commits per format...")
+    for fmt in ('legacy', 'canonical'):
+        result = simulate(fmt, base_events, args.days, args.runs_per_day, args.seed)
+        print(json.dumps(result, ensure_ascii=False))
+
+if __name__ == '__main__':
+    main()
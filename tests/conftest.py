@@ -0,0 +1,80 @@
+"""
+Gemensamma fixturer: en tom arbetskatalog med config.json, en API-klient
+utan nätverk och lokala stand-in-servrar för externa tjänster
+"""
+
+import json
+import os
+import sys
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data_format import STOCKHOLM_TZ
+
+TEST_CONFIG = {
+    'enrichment': {'enabled': False},
+    'retention': {'hot_months': 12},
+    'netlify': {'site_id': 'YOUR_NETLIFY_SITE_ID', 'access_token': 'YOUR_NETLIFY_ACCESS_TOKEN'}
+}
+
+def make_event(number, hours_ago, event_type='Misshandel', location='Rinkeby, Stockholm'):
+    moment = datetime.now(STOCKHOLM_TZ) - timedelta(hours=hours_ago)
+    return {
+        'id': number,
+        'datetime': moment.strftime('%Y-%m-%d %H:%M:%S %z'),
+        'name': f"{event_type}, {location}",
+        'summary': f"Händelse nummer {number}",
+        'type': event_type,
+        'url': f"/aktuellt/handelser/{number}/",
+        'location': {'name': location, 'gps': '59.3293,18.0686'}
+    }
+
+class FakeClient:
+    """Svarar som PoliceApiClient.events() med en fast lista per locationname"""
+
+    def __init__(self, events=None):
+        self.responses = {}
+        self.calls = 0
+        if events is not None:
+            self.responses['Stockholm'] = events
+
+    def events(self, **params):
+        self.calls += 1
+        return list(self.responses.get(params.get('locationname'), []))
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / 'config.json').write_text(json.dumps(TEST_CONFIG), encoding='utf-8')
+    return tmp_path
+
+def snapshot(root, exclude=('update_report.json',)):
+    """{relativ sökväg: innehåll} för alla filer utom databasen och angivna filer"""
+    files = {}
+    for directory, _, names in os.walk(root):
+        for name in names:
+            path = os.path.join(directory, name)
+            relative = os.path.relpath(path, root)
+            if '.db' in name or relative in exclude or relative.startswith('.staging'):
+                continue
+            with open(path, 'rb') as f:
+                files[relative] = f.read()
+    return files
+
+@contextmanager
+def stand_in_server(handler_class):
+    """Kör handler_class på en ledig port i en egen tråd; ger basadressen"""
+    server = ThreadingHTTPServer(('127.0.0.1', 0), handler_class)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_port}"
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,43 @@
+"""Kommandoraden: stats utan nätverksberoenden och felkoder"""
+
+import os
+import subprocess
+import sys
+
+import cli
+from data_format import dumps_canonical
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def write_archive(events):
+    with open('stockholm_violence_archive.json', 'w', encoding='utf-8') as f:
+        f.write(dumps_canonical(events, {'last_updated': '2025-08-03T10:00:00'}))
+
+def test_stats(workdir, capsys):
+    write_archive([
+        {'id': 1, 'datetime': '2024-12-31 23:00:00 +01:00', 'type': 'Rån', 'matched_area': 'Rinkeby'},
+        {'id': 2, 'datetime': '2025-01-02 10:00:00 +01:00', 'type': 'Rån', 'matched_area': 'Rinkeby'},
+        {'id': 3, 'datetime': '2025-01-03 10:00:00 +01:00', 'type': 'Misshandel'}
+    ])
+    assert cli.main(['stats', '--top', '1']) == 0
+
+    output = capsys.readouterr().out
+    assert '📊 Antal händelser: 3' in output
+    assert '🗓️ Period: 2024-12-31 till 2025-01-03' in output
+    assert '  2024: 1\n  2025: 2' in output
+    assert '  Rån: 2' in output and 'Misshandel' not in output
+
+def test_stats_without_data(workdir, capsys):
+    assert cli.main(['stats', '--region', 'uppsala']) == 1
+    assert 'uppsala_violence_archive.json' in capsys.readouterr().out
+
+def test_stats_does_not_import_update_chain(workdir):
+    write_archive([{'id': 1, 'datetime': '2025-01-02 10:00:00 +01:00', 'type': 'Rån'}])
+    script = (
+        "import sys, cli\n"
+        "assert cli.main(['stats']) == 0\n"
+        "loaded = {'requests', 'auto_update', 'police_api'} & set(sys.modules)\n"
+        "assert not loaded, loaded\n"
+    )
+    result = subprocess.run([sys.executable, '-c', script], env=dict(os.environ, PYTHONPATH=ROOT), capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
@@ -0,0 +1,107 @@
+"""Daemon-läget: alla regioner uppdateras och köade händelser slås in per region"""
+
+import json
+
+import pytest
+
+import auto_update
+from conftest import TEST_CONFIG, FakeClient, make_event
+from hotspots import HotspotTracker
+from run_lock import enqueue_update, pending_updates
+
+REGIONS_CONFIG = dict(TEST_CONFIG, regions=[
+    {'id': 'stockholm'},
+    {'id': 'uppsala', 'name': 'Uppsala län', 'center': [59.86, 17.64], 'bounds': [[59.3, 16.6], [60.7, 18.9]]}
+])
+
+@pytest.fixture
+def regions_workdir(workdir):
+    (workdir / 'config.json').write_text(json.dumps(REGIONS_CONFIG), encoding='utf-8')
+    return workdir
+
+def run_polls(monkeypatch, client, polls=1):
+    """Kör daemonen polls varv; sleep avbryter som Ctrl-C efter sista varvet"""
+    monkeypatch.setattr(auto_update, 'PoliceApiClient', lambda session=None: client)
+    remaining = [polls]
+
+    def sleep(seconds):
+        remaining[0] -= 1
+        if not remaining[0]:
+            raise KeyboardInterrupt
+
+    monkeypatch.setattr(auto_update.time, 'sleep', sleep)
+    auto_update.run_daemon()
+
+def load_ids(path):
+    with open(path, encoding='utf-8') as f:
+        return sorted(event['id'] for event in json.load(f)['events'])
+
+def test_daemon_updates_every_region(regions_workdir, monkeypatch):
+    client = FakeClient([make_event(1, 2)])
+    client.responses['Uppsala län'] = [make_event(2, 3, location='Gottsunda, Uppsala')]
+    enqueue_update({'uppsala': [make_event(3, 5, 'Rån', 'Gottsunda, Uppsala')]})
+
+    run_polls(monkeypatch, client)
+
+    assert load_ids('stockholm_violence_data.json') == [1]
+    assert load_ids('uppsala_violence_data.json') == [2, 3]
+    assert pending_updates() == []
+
+    with open('update_report.json', encoding='utf-8') as f:
+        report = json.load(f)
+    assert report['new_events_added'] == 3
+    assert sorted(report['regions']) == ['stockholm', 'uppsala']
+
+def test_daemon_keeps_queue_files_of_failed_region(regions_workdir, monkeypatch):
+    client = FakeClient([make_event(1, 2)])
+    stockholm_only = enqueue_update({'stockholm': [make_event(2, 4)], 'uppsala': []})
+    with_uppsala = enqueue_update({'stockholm': [make_event(3, 5)], 'uppsala': [make_event(4, 5, location='Gottsunda, Uppsala')]})
+
+    original_events = client.events
+
+    def events(**params):
+        if params.get('locationname') == 'Uppsala län':
+            raise ConnectionError('API:t svarar inte')
+        return original_events(**params)
+
+    client.events = events
+    run_polls(monkeypatch, client)
+
+    assert load_ids('stockholm_violence_data.json') == [1, 2, 3]
+    assert [path for path, _ in pending_updates()] == [with_uppsala]
+    assert stockholm_only != with_uppsala
+
+    with open('daemon_health.json', encoding='utf-8') as f:
+        assert json.load(f)['consecutive_failures'] == 1
+
+def test_daemon_republishes_after_failed_publish(workdir, monkeypatch):
+    client = FakeClient([make_event(1, 2), make_event(2, 6, 'Rån')])
+    export_search_index = auto_update.export_search_index
+    calls = []
+
+    def fails_once(*args, **kwargs):
+        calls.append(args)
+        if len(calls) == 1:
+            raise RuntimeError('sökindex kraschade')
+        return export_search_index(*args, **kwargs)
+
+    monkeypatch.setattr(auto_update, 'export_search_index', fails_once)
+    # Andra varvet ger inga nya händelser; regionen publiceras ändå
+    run_polls(monkeypatch, client, polls=2)
+
+    assert len(calls) == 2
+    assert load_ids('stockholm_violence_data.json') == [1, 2]
+
+def test_daemon_keeps_hotspot_state_in_memory(workdir, monkeypatch):
+    client = FakeClient([make_event(1, 2)])
+    loads = []
+    load = HotspotTracker.load.__func__
+
+    def counting_load(cls, directory, **options):
+        loads.append(directory)
+        return load(cls, directory, **options)
+
+    monkeypatch.setattr(HotspotTracker, 'load', classmethod(counting_load))
+    run_polls(monkeypatch, client, polls=3)
+
+    assert loads == ['hotspots/stockholm']
@@ -0,0 +1,73 @@
+"""Kanoniskt filformat: stabil ordning, en händelse per rad, round-trip och publik projektion"""
+
+import json
+
+from data_format import PUBLIC_EVENT_FIELDS, dumps_canonical, dumps_exports, public_event, write_canonical
+
+EVENTS = [
+    {'id': 3, 'datetime': '2025-08-02 7:12:22 +02:00', 'type': 'Rån', 'summary': 'Rån mot butik', 'latitude': 59.33930123456, 'longitude': 18.0686},
+    {'id': 1, 'datetime': '2025-08-01 22:05:00 +02:00', 'type': 'Misshandel', 'summary': 'Misshandel', 'fetch_timestamp': '2025-08-02T08:00:00'},
+    {'datetime': '2025-08-03 01:00:00 +02:00', 'type': 'Skottlossning', 'summary': 'Skott hörda'},
+    {'id': 2, 'datetime': '2025-08-01 09:00:00 +02:00', 'type': 'Explosion', 'summary': 'Detonation', 'added_timestamp': '2025-08-02T08:00:00'}
+]
+METADATA = {'total_events': 4, 'region': 'stockholm'}
+
+def test_round_trip():
+    text = dumps_canonical(EVENTS, METADATA, {'filter_index': {'count': 4}})
+    data = json.loads(text)
+
+    assert data['metadata'] == METADATA
+    assert data['filter_index'] == {'count': 4}
+    # Flyktiga fält tas bort och koordinater avrundas; övrigt är oförändrat
+    assert data['events'][0] == {k: v for k, v in EVENTS[1].items() if k != 'fetch_timestamp'}
+    assert data['events'][2]['latitude'] == 59.339301
+    # Att serialisera den inlästa datan igen ger samma text
+    assert dumps_canonical(data['events'], data['metadata'], {'filter_index': data['filter_index']}) == text
+
+def test_order_and_lines_are_stable():
+    text = dumps_canonical(EVENTS, METADATA)
+    assert dumps_canonical(list(reversed(EVENTS)), METADATA) == text
+
+    lines = text.split('\n')
+    # Sorterat på id, händelser utan id sist, en händelse per rad
+    assert [json.loads(line.rstrip(','))['id'] for line in lines[1:4]] == [1, 2, 3]
+    assert json.loads(lines[4])['type'] == 'Skottlossning'
+    assert lines[5] == '],'
+
+    # En ny händelse ändrar bara sin egen rad
+    added = dumps_canonical(EVENTS + [{'id': 4, 'datetime': '2025-08-04 10:00:00 +02:00', 'type': 'Rån', 'summary': 'Rån'}], METADATA)
+    changed = set(added.split('\n')) - set(lines)
+    assert len(changed) == 1 and json.loads(changed.pop().rstrip(','))['id'] == 4
+
+def test_write_canonical(workdir):
+    size = write_canonical('data.json', EVENTS, METADATA)
+    with open('data.json', encoding='utf-8') as f:
+        text = f.read()
+    assert text == dumps_canonical(EVENTS, METADATA)
+    assert size == len(text.encode('utf-8'))
+
+def test_public_projection():
+    event = {
+        'id': 7, 'datetime': '2025-08-02 7:12:22 +02:00', 'type': 'Rån', 'summary': 'Rån mot butik',
+        'name': '2 augusti 07.12, Rån, Stockholm', 'url': 'https://polisen.se/aktuellt/handelser/7/',
+        'location': {'name': 'Stockholm', 'gps': '59.3293,18.0686'}, 'latitude': 59.3293, 'longitude': 18.0686,
+        'matched_area': '', 'fetch_timestamp': '2025-08-02T08:00:00'
+    }
+    projected = public_event(event)
+    assert set(projected) <= set(PUBLIC_EVENT_FIELDS)
+    assert projected['url'] == '/aktuellt/handelser/7/'
+    assert projected['location_name'] == 'Stockholm'
+    # Tomma fält utelämnas
+    assert 'matched_area' not in projected
+
+def test_exports_share_event_order():
+    archive_text, public_text = dumps_exports(EVENTS, {'schema': 'archive'}, {'schema': 'public'}, {'filter_index': {'count': 4}})
+    archive, public = json.loads(archive_text), json.loads(public_text)
+
+    assert archive['events'] == json.loads(dumps_canonical(EVENTS, {}))['events']
+    assert [event.get('id') for event in public['events']] == [event.get('id') for event in archive['events']]
+    assert 'filter_index' in public and 'filter_index' not in archive
+
+    # Med retention innehåller den publika filen bara de varma händelserna
+    _, public_text = dumps_exports(EVENTS, {}, {}, public_events=EVENTS[:2])
+    assert [event['id'] for event in json.loads(public_text)['events']] == [1, 3]
@@ -0,0 +1,46 @@
+"""Deltaflödet: versioner, deltan mellan publika filer och gallring"""
+
+import json
+import os
+
+from data_format import dumps_public
+from delta_feed import FEED_FILE, load_feed, write_delta_feed
+
+def event(number, **fields):
+    return dict({'id': number, 'datetime': f"2025-08-0{number} 12:00:00 +02:00", 'type': 'Rån', 'summary': f"Händelse {number}"}, **fields)
+
+def test_deltas_between_versions(workdir):
+    first = dumps_public([event(1), event(2)], {})
+    stats = write_delta_feed('deltas', 'data.json', None, first, 't1')
+    # Utan förra versionen finns ingen delta; kartan hämtar ögonblicksbilden
+    assert stats == {'version': 1, 'upserts': 0, 'removals': 0, 'deltas': 0}
+
+    second = dumps_public([event(2, latitude=59.33), event(3)], {})
+    stats = write_delta_feed('deltas', 'data.json', first, second, 't2')
+    assert stats == {'version': 2, 'upserts': 2, 'removals': 1, 'deltas': 1}
+
+    with open(os.path.join('deltas', '2.json'), encoding='utf-8') as f:
+        delta = json.load(f)
+    assert delta['base_version'] == 1
+    assert sorted(upsert['id'] for upsert in delta['upserts']) == [2, 3]
+    # Händelse 2 har fått koordinater och skickas om; 1 anges med sina nyckelfält
+    assert delta['removals'] == [{'datetime': event(1)['datetime'], 'type': 'Rån', 'summary': 'Händelse 1'}]
+
+    # Oförändrad fil ger ingen ny version
+    assert write_delta_feed('deltas', 'data.json', second, second, 't3')['version'] == 2
+    feed = load_feed('deltas')
+    assert feed['snapshot_updated'] == 't3' and feed['count'] == 2
+
+def test_old_deltas_are_pruned(workdir):
+    previous = dumps_public([], {})
+    write_delta_feed('deltas', 'data.json', None, previous, 't0')
+    for number in range(1, 5):
+        current = dumps_public([event(n) for n in range(1, number + 1)], {})
+        write_delta_feed('deltas', 'data.json', previous, current, f"t{number}", max_deltas=2)
+        previous = current
+
+    feed = load_feed('deltas')
+    assert feed['version'] == 5
+    assert [delta['version'] for delta in feed['deltas']] == [4, 5]
+    assert feed['oldest_version'] == 3
+    assert sorted(os.listdir('deltas')) == ['4.json', '5.json', FEED_FILE]
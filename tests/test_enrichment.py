@@ -0,0 +1,70 @@
+"""Berikning mot en lokal stand-in för polisens detaljsidor (POLISEN_BASE_URL)"""
+
+import time
+from http.server import BaseHTTPRequestHandler
+
+import pytest
+
+from conftest import make_event, stand_in_server
+from enrichment import enrich_events
+
+GAZETTEER = {'rinkeby': (59.3890, 17.9240)}
+
+PAGES = {
+    '/aktuellt/handelser/1/': (200, '<div class="text-body"><p>Polisen larmades till Rinkebystråket i Rinkeby.</p></div>'),
+    '/aktuellt/handelser/2/': (500, 'Internt fel'),
+    '/aktuellt/handelser/3/': (200, '<div class="text-body"><p>Bråk på Tenstagången i Rinkeby.</p></div>'),
+    '/aktuellt/handelser/4/': (404, 'Sidan finns inte')
+}
+SLOW_PAGE = '/aktuellt/handelser/3/'
+
+@pytest.fixture
+def polisen(monkeypatch):
+    requests_seen = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+        def do_GET(self):
+            requests_seen.append(self.path)
+            if self.path == SLOW_PAGE:
+                time.sleep(1)
+            status, body = PAGES[self.path]
+            content = body.encode('utf-8')
+            try:
+                self.send_response(status)
+                self.send_header('Content-Type', 'text/html; charset=utf-8')
+                self.send_header('Content-Length', str(len(content)))
+                self.end_headers()
+                self.wfile.write(content)
+            except OSError:
+                # Klienten har redan gett upp (timeout)
+                pass
+
+    with stand_in_server(Handler) as base_url:
+        monkeypatch.setenv('POLISEN_BASE_URL', base_url)
+        yield requests_seen
+
+def test_detail_pages_are_cached_and_failures_leave_events_unenriched(workdir, polisen):
+    def events():
+        return [make_event(number, number) for number in (1, 2, 3, 4)]
+
+    first = events()
+    stats = enrich_events(first, GAZETTEER, cache_dir='detail_cache', timeout=0.3)
+
+    assert first[0]['detail_location'] == 'Rinkebystråket, Rinkeby'
+    # 5xx, timeout och 404 ger ingen platstext
+    assert all('detail_location' not in event for event in first[1:])
+    assert stats == {'events': 4, 'cached': 0, 'fetched': 2, 'failed': 2, 'located': 1}
+    assert sorted(polisen) == sorted(PAGES)
+
+    # Andra körningen: cachade svar (200 och 404) hämtas inte igen, felen försöks om
+    polisen.clear()
+    second = events()
+    stats = enrich_events(second, GAZETTEER, cache_dir='detail_cache', timeout=0.3)
+
+    assert sorted(polisen) == ['/aktuellt/handelser/2/', SLOW_PAGE]
+    assert second[0]['detail_location'] == 'Rinkebystråket, Rinkeby'
+    assert all('detail_location' not in event for event in second[1:])
+    assert stats == {'events': 4, 'cached': 2, 'fetched': 0, 'failed': 2, 'located': 1}
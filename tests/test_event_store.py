@@ -0,0 +1,59 @@
+"""EventStore: R*-träd, tid och typ i query_region samt sidning med markör"""
+
+import pytest
+
+from event_store import EventStore
+
+def store_event(number, hour, event_type='Misshandel', latitude=59.33, longitude=18.07):
+    return {
+        'id': number,
+        'datetime': f"2025-08-01 {hour:02d}:00:00 +00:00",
+        'type': event_type,
+        'summary': f"Händelse nummer {number}",
+        'latitude': latitude,
+        'longitude': longitude
+    }
+
+@pytest.fixture
+def store():
+    with EventStore(':memory:') as store:
+        store.import_events([
+            store_event(1, 1),
+            store_event(2, 2, 'Rån', latitude=59.86, longitude=17.64),  # Uppsala
+            store_event(3, 3, 'Rån'),
+            store_event(4, 5, 'Skottlossning', latitude=59.40, longitude=17.95),
+            store_event(5, 5),
+            store_event(6, 5, latitude=None, longitude=None)
+        ])
+        yield store
+
+def ids(rows):
+    return [event['id'] for _, _, event in rows]
+
+def test_bbox_query(store):
+    stockholm = (17.9, 59.2, 18.2, 59.5)
+    rows, cursor = store.query_region(bbox=stockholm)
+    # Händelser utan koordinater finns inte i R*-trädet
+    assert ids(rows) == [5, 4, 3, 1]
+    assert cursor is None
+
+    inner_city = (18.0, 59.3, 18.1, 59.35)
+    assert ids(store.query_region(bbox=inner_city)[0]) == [5, 3, 1]
+
+def test_time_and_type_query(store):
+    since = store.query_region(types=['Rån'])[0][-1][1]
+    rows, _ = store.query_region(since=since, until=since + 3 * 3600, types=['Rån', 'Misshandel'])
+    # 02:00 och 03:00; gränsen until (05:00) är exklusiv
+    assert ids(rows) == [3, 2]
+    assert ids(store.query_region(bbox=(17.9, 59.2, 18.2, 59.5), types=['Rån'])[0]) == [3]
+
+def test_cursor_paging(store):
+    pages = []
+    cursor = None
+    while True:
+        rows, cursor = store.query_region(limit=2, after=cursor)
+        pages.append(ids(rows))
+        if cursor is None:
+            break
+    # Tre händelser har samma tid; markören skiljer dem åt på rowid
+    assert pages == [[6, 5], [4, 3], [2, 1]]
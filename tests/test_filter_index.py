@@ -0,0 +1,35 @@
+"""Filterindexet: bitmängder per år och typ i den publicerade ordningen"""
+
+import base64
+import struct
+
+from filter_index import UNKNOWN_TYPE, build_filter_index, encode_bitset
+
+def decode_bitset(encoded, count):
+    """Avkoda som kartan: 32-bitars little-endian-ord, bit i i ord i // 32"""
+    raw = base64.b64decode(encoded)
+    words = struct.unpack(f"<{len(raw) // 4}I", raw)
+    return [position for position in range(count) if words[position // 32] >> (position % 32) & 1]
+
+def test_encode_bitset():
+    assert base64.b64decode(encode_bitset([0, 9], 10)) == bytes([0x01, 0x02, 0x00, 0x00])
+    # Fyllt till hela ord
+    assert len(base64.b64decode(encode_bitset([], 33))) == 8
+    positions = [0, 5, 31, 32, 63, 64, 99]
+    assert decode_bitset(encode_bitset(positions, 100), 100) == positions
+
+def test_build_filter_index():
+    events = [
+        {'id': 3, 'datetime': '2025-01-02 10:00:00 +01:00', 'type': 'Rån'},
+        {'id': 1, 'datetime': '2024-12-31 23:00:00 +01:00', 'type': 'Misshandel'},
+        {'id': 2, 'datetime': '2025-06-01 12:00:00 +02:00', 'type': 'Rån'},
+        {'id': 4, 'datetime': '', 'type': ''}
+    ]
+    index = build_filter_index(events)
+    assert index['count'] == 4
+
+    # Positionerna följer den kanoniska ordningen (id 1, 2, 3, 4)
+    decoded = {name: decode_bitset(bits, 4) for name, bits in index['years'].items()}
+    assert decoded == {'2024': [0], '2025': [1, 2]}
+    decoded = {name: decode_bitset(bits, 4) for name, bits in index['types'].items()}
+    assert decoded == {'Misshandel': [0], 'Rån': [1, 2], UNKNOWN_TYPE: [3]}
@@ -0,0 +1,66 @@
+"""Hotspots: EWMA-baslinje, z-värde och kallstart för nya områden"""
+
+import json
+from datetime import datetime, time
+
+from data_format import STOCKHOLM_TZ
+from hotspots import HotspotTracker, today_number
+
+def epoch_of(day):
+    """Mitt på dagen (Stockholm) för ett dagnummer"""
+    return int(datetime.combine(datetime.fromordinal(day).date(), time(12), STOCKHOLM_TZ).timestamp())
+
+def event_in(area, event_type='Misshandel'):
+    return {'type': event_type, 'matched_area': area}
+
+def add_events(tracker, area, days, today):
+    for day in days:
+        tracker.add(event_in(area), epoch_of(day), today)
+
+def test_new_area_without_history_is_not_reported():
+    today = today_number()
+    tracker = HotspotTracker()
+    # Första händelserna någonsin i området, alla i fönstret: baslinjen är 0
+    add_events(tracker, 'Rinkeby', [today - 2, today - 1, today - 1, today, today], today)
+
+    assert tracker.hotspots(today) == []
+    assert 'Rinkeby|Misshandel' in tracker.active
+
+def test_spike_after_enough_history_is_reported():
+    today = today_number()
+    tracker = HotspotTracker()
+    # En händelse var tionde dag i 60 dagar, sedan sex i fönstret
+    add_events(tracker, 'Tensta', range(today - 70, today - 7, 10), today)
+    add_events(tracker, 'Tensta', [today - 3, today - 2, today - 2, today - 1, today, today], today)
+
+    [hotspot] = tracker.hotspots(today)
+    assert (hotspot['area'], hotspot['category'], hotspot['recent']) == ('Tensta', 'Misshandel', 6)
+    assert hotspot['baseline_days'] >= tracker.options['min_history_days']
+    assert 0 < hotspot['expected'] < 1
+    assert hotspot['z'] >= tracker.options['z_threshold']
+
+def test_steady_area_is_not_reported():
+    today = today_number()
+    tracker = HotspotTracker()
+    # Samma takt före och i fönstret: ingen avvikelse
+    add_events(tracker, 'Husby', range(today - 120, today + 1), today)
+
+    assert tracker.hotspots(today) == []
+
+def test_state_has_one_series_per_line():
+    today = today_number()
+    tracker = HotspotTracker()
+    add_events(tracker, 'Rinkeby', [today - 40, today], today)
+    add_events(tracker, 'Akalla', [today - 1], today)
+
+    text = tracker.dumps_state()
+    assert json.loads(text) == tracker.state()
+    assert HotspotTracker(json.loads(text)).state() == tracker.state()
+
+    lines = text.splitlines()
+    assert [line.split('"')[1] for line in lines if line.startswith('  "')] == ['Akalla|Misshandel', 'Rinkeby|Misshandel']
+
+    # En ny händelse ändrar bara sin egen seriens rad
+    tracker.add(event_in('Akalla'), epoch_of(today), today)
+    changed = [old for old, new in zip(lines, tracker.dumps_state().splitlines()) if old != new]
+    assert len(changed) == 1 and 'Akalla' in changed[0]
@@ -0,0 +1,117 @@
+"""Digest-deploy mot en lokal stand-in för Netlifys API (NETLIFY_API_URL)"""
+
+import hashlib
+import json
+from http.server import BaseHTTPRequestHandler
+
+import pytest
+
+import netlify_deploy
+from conftest import stand_in_server
+
+def sha1(content):
+    return hashlib.sha1(content).hexdigest()
+
+class FakeNetlify:
+    """Svarar som /api/v1: deployen är 'preparing' tills den hämtats polls gånger"""
+
+    def __init__(self, known_digests=(), polls=2, final_state='prepared'):
+        self.known = set(known_digests)
+        self.polls = polls
+        self.final_state = final_state
+        self.manifest = None
+        self.gets = 0
+        self.uploads = {}
+        self.uploaded_while = []
+
+    def state(self):
+        return self.final_state if self.gets >= self.polls else 'preparing'
+
+    def deploy(self):
+        deploy = {'id': 'deploy1', 'state': self.state()}
+        # Netlify fyller i 'required' först när manifestet är jämfört
+        if deploy['state'] == 'prepared':
+            deploy['required'] = sorted(set(self.manifest.values()) - self.known)
+        return deploy
+
+@pytest.fixture
+def netlify(monkeypatch):
+    fake = FakeNetlify()
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+        def reply(self, payload):
+            body = json.dumps(payload).encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def body(self):
+            return self.rfile.read(int(self.headers['Content-Length']))
+
+        def do_POST(self):
+            assert self.path == '/api/v1/sites/site1/deploys'
+            assert self.headers['Authorization'] == 'Bearer token1'
+            fake.manifest = json.loads(self.body())['files']
+            self.reply(fake.deploy())
+
+        def do_GET(self):
+            assert self.path == '/api/v1/deploys/deploy1'
+            fake.gets += 1
+            self.reply(fake.deploy())
+
+        def do_PUT(self):
+            prefix = '/api/v1/deploys/deploy1/files'
+            assert self.path.startswith(prefix)
+            fake.uploaded_while.append(fake.state())
+            fake.uploads[self.path[len(prefix):]] = self.body()
+            self.reply({'path': self.path[len(prefix):]})
+
+    with stand_in_server(Handler) as base_url:
+        monkeypatch.setenv('NETLIFY_API_URL', f"{base_url}/api/v1")
+        monkeypatch.setattr(netlify_deploy, 'PREPARE_POLL_SECONDS', 0)
+        yield fake
+
+SITE = {
+    'index.html': b'<html></html>',
+    'regions.json': b'{"regions": []}',
+    'stockholm_violence_data.json': b'{"events": [1]}',
+    'uppsala_violence_data.json': b'{"events": [1]}',
+    'search/stockholm/a.json': b'{"a": []}',
+    'config.json': b'{"netlify": {}}'
+}
+
+@pytest.fixture
+def site(tmp_path):
+    for name, content in SITE.items():
+        (tmp_path / name).parent.mkdir(parents=True, exist_ok=True)
+        (tmp_path / name).write_bytes(content)
+    return tmp_path
+
+def test_only_missing_digests_are_uploaded(netlify, site):
+    netlify.known = {sha1(SITE['index.html']), sha1(SITE['regions.json'])}
+
+    assert netlify_deploy.deploy_to_netlify('site1', 'token1', root=site)
+
+    assert set(netlify.manifest) == {f"/{name}" for name in SITE if name != 'config.json'}
+    assert netlify.gets == 2
+    # En uppladdning per saknad digest; de två datafilerna har samma innehåll
+    assert len(netlify.uploads) == 2
+    assert set(map(sha1, netlify.uploads.values())) == {sha1(SITE['stockholm_violence_data.json']), sha1(SITE['search/stockholm/a.json'])}
+    assert set(netlify.uploaded_while) == {'prepared'}
+
+def test_nothing_is_uploaded_when_netlify_has_everything(netlify, site):
+    netlify.known = {sha1(content) for content in SITE.values()}
+
+    assert netlify_deploy.deploy_to_netlify('site1', 'token1', root=site)
+    assert netlify.uploads == {}
+
+def test_failed_deploy_uploads_nothing(netlify, site):
+    netlify.final_state = 'error'
+
+    assert not netlify_deploy.deploy_to_netlify('site1', 'token1', root=site)
+    assert netlify.uploads == {}
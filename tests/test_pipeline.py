@@ -0,0 +1,37 @@
+"""Uppdateringskedjan: API-fel, räknare och egna kedjor"""
+
+import json
+import logging
+
+import requests
+
+import auto_update
+from conftest import TEST_CONFIG, FakeClient, make_event
+
+class FailingClient:
+    def events(self, **params):
+        raise requests.ConnectionError('polisen.se svarar inte')
+
+def test_api_error_fails_the_region(workdir):
+    assert auto_update.update_all_regions(FailingClient()) is False
+
+    with open('update_report.json', encoding='utf-8') as f:
+        report = json.load(f)
+    assert report['success'] is False
+    assert 'polisen.se svarar inte' in report['regions']['stockholm']['error']
+
+def test_counts_without_window_stage(workdir, caplog):
+    config = dict(TEST_CONFIG, pipeline={'stages': ['fetch', 'parse', 'classify', 'dedup', 'geocode', 'store']})
+    (workdir / 'config.json').write_text(json.dumps(config), encoding='utf-8')
+    events = [make_event(1, 2), make_event(1, 2), make_event(2, 3, 'Trafikolycka'), make_event(3, 4, 'Rån', 'Tensta, Stockholm')]
+
+    with caplog.at_level(logging.INFO):
+        assert auto_update.update_all_regions(FakeClient(events)) is True
+
+    with open('update_report.json', encoding='utf-8') as f:
+        report = json.load(f)['regions']['stockholm']
+    assert report['new_events_fetched'] == 4
+    assert report['new_events_added'] == 2
+    assert report['duplicates_removed'] == 1
+    assert 'Okänt område' not in caplog.text
+    assert 'Rån - Tensta' in caplog.text
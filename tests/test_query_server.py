@@ -0,0 +1,67 @@
+"""Frågetjänsten: /api/events med bbox och markör, fel som 400 och bara publicerade filer"""
+
+import json
+import urllib.error
+import urllib.request
+
+import pytest
+
+import query_server
+from conftest import stand_in_server
+from event_store import EventStore
+
+def fetch(url, headers=None):
+    request = urllib.request.Request(url, headers=headers or {})
+    try:
+        with urllib.request.urlopen(request, timeout=5) as response:
+            return response.status, response.read()
+    except urllib.error.HTTPError as e:
+        return e.code, e.read()
+
+@pytest.fixture
+def server(workdir, monkeypatch):
+    (workdir / 'index.html').write_text('<html></html>', encoding='utf-8')
+    store = EventStore(str(workdir / 'stockholm_violence.db'), check_same_thread=False)
+    store.import_events([
+        {'id': number, 'datetime': f"2025-08-01 {number:02d}:00:00 +02:00", 'type': 'Rån' if number % 2 else 'Misshandel',
+         'summary': f"Händelse {number}", 'latitude': 59.33, 'longitude': 18.07, 'location': {'name': 'Stockholm'}}
+        for number in range(1, 6)
+    ] + [{'id': 6, 'datetime': '2025-08-01 06:00:00 +02:00', 'type': 'Rån', 'summary': 'Uppsala', 'latitude': 59.86, 'longitude': 17.64}])
+
+    monkeypatch.setattr(query_server.QueryHandler, 'store', store)
+    monkeypatch.setattr(query_server.QueryHandler, 'publish_patterns', ['index.html', '*_violence_data.json'])
+    with stand_in_server(query_server.QueryHandler) as base_url:
+        yield base_url
+    store.close()
+
+def test_events_in_bbox_with_cursor(server):
+    status, body = fetch(f"{server}/api/events?bbox=18.0,59.3,18.1,59.4&types=R%C3%A5n&limit=2")
+    assert status == 200
+    page = json.loads(body)
+    assert page['fields'][0] == 'id'
+    assert [row[0] for row in page['rows']] == [5, 3]
+    assert page['rows'][0][page['fields'].index('location_name')] == 'Stockholm'
+
+    status, body = fetch(f"{server}/api/events?bbox=18.0,59.3,18.1,59.4&types=R%C3%A5n&limit=2&cursor={page['next']}")
+    page = json.loads(body)
+    assert [row[0] for row in page['rows']] == [1]
+    assert page['next'] is None
+
+def test_etag_and_errors(server):
+    status, body = fetch(f"{server}/api/types")
+    assert json.loads(body)['types'] == {'Misshandel': 2, 'Rån': 4}
+
+    request = urllib.request.Request(f"{server}/api/types")
+    with urllib.request.urlopen(request, timeout=5) as response:
+        etag = response.headers['ETag']
+    assert fetch(f"{server}/api/types", {'If-None-Match': etag})[0] == 304
+
+    status, body = fetch(f"{server}/api/events?bbox=18.1,59.3,18.0,59.4")
+    assert status == 400
+    assert 'bbox' in json.loads(body)['error']
+
+def test_only_published_files_are_served(server):
+    assert fetch(f"{server}/")[0] == 200
+    assert fetch(f"{server}/index.html")[0] == 200
+    for path in ('config.json', 'stockholm_violence.db', '..%2Fconfig.json', 'api_backup/x.json'):
+        assert fetch(f"{server}/{path}")[0] == 404
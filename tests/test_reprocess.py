@@ -0,0 +1,49 @@
+"""Omprocesseringen: shards, checkpoints som återupptas och export efteråt"""
+
+import json
+import os
+
+import reprocess
+from auto_update import load_regions, open_event_store
+from conftest import make_event
+from data_format import create_event_hash
+
+def test_resumes_from_checkpoint(workdir):
+    region = load_regions()[0]
+    events = [make_event(1, 2), make_event(2, 3, 'Rån'), make_event(3, 4, 'Trafikolycka'), make_event(4, 5, 'Skottlossning')]
+    with open_event_store(region) as store:
+        store.import_events(events)
+        archive = [(create_event_hash(event), event) for event in store.all_events()]
+
+    # En avbruten körning hann spara första shardens resultat
+    first_shard = archive[:2]
+    checkpoint_dir = os.path.join('checkpoints', region['id'])
+    result = {
+        'shard': 0, 'pid': 0, 'changed': 2, 'count': 2, 'elapsed': 0.0, 'dropped': [],
+        'events': [[event_hash, dict(event, from_checkpoint=True)] for event_hash, event in first_shard]
+    }
+    reprocess.save_checkpoint(checkpoint_dir, result, reprocess.shard_signature(first_shard))
+
+    reprocess.reprocess_archive(region, workers=1, shard_size=2, checkpoint_dir='checkpoints')
+
+    with open(region['archive_file'], encoding='utf-8') as f:
+        exported = {event['id']: event for event in json.load(f)['events']}
+    # Trafikolyckan klassas inte som våld och tas bort; shard 0 kommer från checkpointen
+    assert sorted(exported) == [1, 2, 4]
+    assert exported[1]['from_checkpoint'] and exported[2]['from_checkpoint']
+    assert 'from_checkpoint' not in exported[4]
+    assert exported[4]['location_name'] == 'Rinkeby, Stockholm'
+    assert not os.path.exists(checkpoint_dir)
+
+def test_stale_checkpoint_is_ignored(workdir):
+    region = load_regions()[0]
+    with open_event_store(region) as store:
+        store.import_events([make_event(1, 2)])
+
+    checkpoint_dir = os.path.join('checkpoints', region['id'])
+    stale = {'shard': 0, 'pid': 0, 'changed': 0, 'count': 1, 'elapsed': 0.0, 'dropped': [], 'events': []}
+    reprocess.save_checkpoint(checkpoint_dir, stale, 'annan-indata')
+
+    reprocess.reprocess_archive(region, workers=1, checkpoint_dir='checkpoints')
+    with open(region['archive_file'], encoding='utf-8') as f:
+        assert [event['id'] for event in json.load(f)['events']] == [1]
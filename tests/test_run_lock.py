@@ -0,0 +1,114 @@
+"""Körningslåset och kön mellan körningar"""
+
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+import auto_update
+import reprocess
+from conftest import FakeClient, make_event
+from run_lock import (
+    LOCK_FILE, RunLock, consume_updates, enqueue_update, merged_updates, pending_updates, queued_events
+)
+
+def test_reprocess_gives_up_on_held_lock(workdir, monkeypatch):
+    holder = RunLock()
+    assert holder.acquire()
+    monkeypatch.setattr(sys, 'argv', ['reprocess.py', '--lock-timeout', '0'])
+    try:
+        with pytest.raises(SystemExit) as exit_info:
+            reprocess.main()
+        assert exit_info.value.code == 1
+        assert holder.owner()['token'] == holder.token
+    finally:
+        holder.release()
+
+def test_only_one_concurrent_acquire(workdir):
+    locks = [RunLock() for _ in range(8)]
+    barrier = threading.Barrier(len(locks))
+    results = []
+
+    def acquire(lock):
+        barrier.wait()
+        results.append(lock.acquire())
+
+    threads = [threading.Thread(target=acquire, args=(lock,)) for lock in locks]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results.count(True) == 1
+    holder = next(lock for lock in locks if lock.held)
+    assert holder.owner()['token'] == holder.token
+
+    # Bara ägaren kan släppa låset
+    for lock in locks:
+        if lock is not holder:
+            lock.release()
+    assert os.path.exists(LOCK_FILE)
+    holder.release()
+    assert not os.path.exists(LOCK_FILE)
+
+def write_owner(**owner):
+    with open(LOCK_FILE, 'w', encoding='utf-8') as f:
+        json.dump(dict({'token': 'annan', 'host': socket.gethostname(), 'heartbeat': time.time()}, **owner), f)
+
+def test_lock_of_dead_process_is_broken(workdir):
+    finished = subprocess.run([sys.executable, '-c', 'import os; print(os.getpid())'], capture_output=True, text=True)
+    write_owner(pid=int(finished.stdout))
+
+    lock = RunLock()
+    assert lock.acquire()
+    assert lock.owner()['token'] == lock.token
+    lock.release()
+
+def test_lock_of_live_process_is_kept(workdir):
+    write_owner(pid=os.getpid())
+    assert not RunLock().acquire()
+
+def test_remote_lock_is_judged_by_heartbeat(workdir):
+    write_owner(host='annan-värd', pid=1, heartbeat=time.time() - 10)
+    assert not RunLock(stale_seconds=60).acquire()
+
+    write_owner(host='annan-värd', pid=1, heartbeat=time.time() - 120)
+    lock = RunLock(stale_seconds=60)
+    assert lock.acquire()
+    lock.release()
+
+def test_queued_events_are_merged_and_consumed(workdir):
+    holder = RunLock()
+    assert holder.acquire()
+    try:
+        # Låset är upptaget: körningen köar bara sina händelser
+        assert auto_update.main(FakeClient([make_event(1, 2), make_event(2, 3, 'Rån')])) is True
+    finally:
+        holder.release()
+
+    pending = pending_updates()
+    assert len(pending) == 1
+    assert [event['id'] for event in queued_events(pending, 'stockholm')] == [1, 2]
+    assert not os.path.exists('stockholm_violence_data.json')
+
+    # Nästa körning slår in kön tillsammans med sin egen hämtning
+    assert auto_update.main(FakeClient([make_event(3, 1)])) is True
+    with open('stockholm_violence_data.json', encoding='utf-8') as f:
+        assert sorted(event['id'] for event in json.load(f)['events']) == [1, 2, 3]
+    assert pending_updates() == []
+    assert not os.path.exists(LOCK_FILE)
+
+def test_merged_updates_keeps_files_of_other_regions(workdir):
+    only_stockholm = enqueue_update({'stockholm': [make_event(1, 2)], 'uppsala': []})
+    with_uppsala = enqueue_update({'stockholm': [], 'uppsala': [make_event(2, 2)]})
+
+    merged = merged_updates(pending_updates(), ['stockholm'])
+    assert [path for path, _ in merged] == [only_stockholm]
+
+    consume_updates(merged)
+    assert [path for path, _ in pending_updates()] == [with_uppsala]
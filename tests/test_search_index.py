@@ -0,0 +1,56 @@
+"""Sökindexet: svensk stamning och uppslag i shards via manifestet"""
+
+import json
+import os
+
+from search_index import event_terms, shard_file_name, stem, tokenize, write_search_index
+
+def test_stemming():
+    assert stem('skottlossningar') == stem('skottlossning') == 'skottlossning'
+    assert stem('bilarna') == 'bil'
+    assert stem('personer') == 'person'
+    assert stem('rånade') == 'rån'
+    # Korta ord lämnas orörda
+    assert stem('rån') == 'rån'
+
+def test_terms_skip_stopwords():
+    assert tokenize('En man är skjuten på Järva.') == ['skjuten', 'järva']
+    event = {'summary': 'Skottlossningar i området', 'location': {'name': 'Rinkeby'}}
+    assert event_terms(event) == {'skottlossning', 'området', 'rinkeby'}
+
+def lookup(search_dir, query):
+    """Slå upp en sökterm som kartan gör: manifest → shard → deltakodade positioner"""
+    with open(os.path.join(search_dir, 'manifest.json'), encoding='utf-8') as f:
+        manifest = json.load(f)
+    term = stem(query.lower())
+    entry = manifest['shards'].get(term[:manifest['prefix_length']])
+    if entry is None:
+        return []
+    with open(os.path.join(search_dir, entry['file']), encoding='utf-8') as f:
+        terms = json.load(f)['terms']
+
+    positions = []
+    for matched in sorted(name for name in terms if name.startswith(term)):
+        position = 0
+        for delta in terms[matched]:
+            position += delta
+            positions.append(position)
+    return sorted(set(positions))
+
+def test_shard_lookup(workdir):
+    stats = write_search_index('search', {'skottlossning': [7, 2, 4], 'skott': [9], 'rån': [1], 'älg': [3]}, 10)
+    assert stats == {'terms': 4, 'shards': 3, 'shards_written': 3}
+    # Prefix utan å/ä/ö i filnamnet
+    assert sorted(os.listdir('search')) == sorted(['manifest.json', shard_file_name('s'), shard_file_name('r'), shard_file_name('ä')])
+    assert all(name.isascii() for name in os.listdir('search'))
+
+    assert lookup('search', 'Skottlossningar') == [2, 4, 7]
+    # Prefixmatchning: "skott" hittar även "skottlossning"
+    assert lookup('search', 'skott') == [2, 4, 7, 9]
+    assert lookup('search', 'älg') == [3]
+    assert lookup('search', 'bil') == []
+
+    # Oförändrade shards skrivs inte om; ett borttaget prefix tas bort
+    stats = write_search_index('search', {'skottlossning': [2, 4, 7], 'skott': [9], 'rån': [1]}, 10)
+    assert stats['shards_written'] == 0
+    assert shard_file_name('ä') not in os.listdir('search')
@@ -0,0 +1,84 @@
+"""Stegvisa skrivningar: journal, återhämtning efter krasch och deltransaktioner"""
+
+import os
+
+import pytest
+
+import staging
+from data_format import remove_output, write_atomic
+from staging import JOURNAL_FILE, STAGING_ROOT, recover, staged_outputs
+
+def read(path):
+    with open(path, encoding='utf-8') as f:
+        return f.read()
+
+def test_outputs_are_published_together(workdir):
+    write_atomic('gammal.json', 'gammal', staged=False)
+    with staged_outputs():
+        write_atomic('data.json', 'ny')
+        write_atomic('search/stockholm/a.json', 'shard')
+        remove_output('gammal.json')
+        assert not os.path.exists('data.json')
+        assert os.path.exists('gammal.json')
+
+    assert read('data.json') == 'ny'
+    assert read('search/stockholm/a.json') == 'shard'
+    assert not os.path.exists('gammal.json')
+    assert os.listdir(STAGING_ROOT) == []
+
+def test_failed_run_publishes_nothing(workdir):
+    write_atomic('data.json', 'före', staged=False)
+    with pytest.raises(RuntimeError):
+        with staged_outputs():
+            write_atomic('data.json', 'efter')
+            write_atomic('hotspots/stockholm/hotspots.json', '{}')
+            raise RuntimeError('krasch')
+
+    assert read('data.json') == 'före'
+    assert not os.path.exists('hotspots')
+    assert os.listdir(STAGING_ROOT) == []
+
+def test_failed_sub_transaction_is_discarded(workdir):
+    with staged_outputs():
+        write_atomic('stockholm.json', 'stockholm')
+        with pytest.raises(RuntimeError):
+            with staged_outputs():
+                write_atomic('uppsala.json', 'uppsala')
+                remove_output('stockholm.json')
+                raise RuntimeError('uppsala kraschade')
+
+    assert read('stockholm.json') == 'stockholm'
+    assert not os.path.exists('uppsala.json')
+
+def test_recover_completes_journaled_run(workdir, monkeypatch):
+    write_atomic('data.json', 'före', staged=False)
+    write_atomic('gammal.json', 'gammal', staged=False)
+
+    def crash(directory):
+        raise SystemExit('avbruten efter journalen')
+
+    apply_journal = staging.apply_journal
+    monkeypatch.setattr(staging, 'apply_journal', crash)
+    with pytest.raises(SystemExit):
+        with staged_outputs():
+            write_atomic('data.json', 'efter')
+            remove_output('gammal.json')
+    monkeypatch.setattr(staging, 'apply_journal', apply_journal)
+
+    [entry] = os.listdir(STAGING_ROOT)
+    assert os.path.exists(os.path.join(STAGING_ROOT, entry, JOURNAL_FILE))
+    assert read('data.json') == 'före'
+
+    assert recover() == {'completed': 1, 'discarded': 0}
+    assert read('data.json') == 'efter'
+    assert not os.path.exists('gammal.json')
+    assert os.listdir(STAGING_ROOT) == []
+
+def test_recover_discards_run_without_journal(workdir):
+    write_atomic('data.json', 'före', staged=False)
+    transaction = staging.OutputTransaction()
+    write_atomic(transaction.stage('data.json'), 'halvfärdig', staged=False)
+
+    assert recover() == {'completed': 0, 'discarded': 1}
+    assert read('data.json') == 'före'
+    assert os.listdir(STAGING_ROOT) == []
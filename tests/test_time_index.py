@@ -0,0 +1,66 @@
+"""Retentionsgränsen: bisektion i tidsordnade händelser och kalla årsarkiv"""
+
+import gzip
+import json
+from datetime import datetime
+
+import auto_update
+from conftest import FakeClient, make_event
+from data_format import STOCKHOLM_TZ, dumps_canonical
+from time_index import insert_events, retention_cutoff, split_timeline, write_cold_archives
+
+def test_cutoff_is_first_day_of_month():
+    now = datetime(2026, 3, 15, 13, 30, tzinfo=STOCKHOLM_TZ)
+    assert retention_cutoff(12, now) == datetime(2025, 3, 1, tzinfo=STOCKHOLM_TZ)
+    assert retention_cutoff(3, now) == datetime(2025, 12, 1, tzinfo=STOCKHOLM_TZ)
+
+def test_split_at_cutoff():
+    timeline = []
+    events = [{'id': number, 'datetime': f"2025-0{month}-10 12:00:00 +01:00"} for number, month in enumerate([5, 1, 3, 2, 4])]
+    insert_events(timeline, events + [{'id': 9, 'datetime': 'okänt'}])
+    assert [event['id'] for _, event in timeline] == [9, 1, 3, 2, 4, 0]
+
+    cutoff = int(datetime(2025, 3, 10, 12, tzinfo=STOCKHOLM_TZ).timestamp())
+    cold, hot = split_timeline(timeline, cutoff)
+    # Gränsen är exklusiv för kalla händelser; otolkbara datum publiceras
+    assert [event['id'] for event in cold] == [1, 3]
+    assert [event['id'] for event in hot] == [9, 2, 4, 0]
+
+    assert split_timeline([], cutoff) == ([], [])
+    assert split_timeline(timeline, 0) == ([], [event for _, event in timeline])
+
+def test_old_events_move_to_cold_archive(workdir):
+    recent, old = make_event(1, 24), make_event(2, 24 * 500, 'Rån')
+    # Den gamla händelsen finns redan i arkivet (hämtningen ser bara senaste veckan)
+    with open('stockholm_violence_archive.json', 'w', encoding='utf-8') as f:
+        f.write(dumps_canonical([old], {}))
+    auto_update.update_all_regions(FakeClient([recent]))
+
+    with open('stockholm_violence_data.json', encoding='utf-8') as f:
+        assert [event['id'] for event in json.load(f)['events']] == [1]
+    with open('stockholm_violence_archive.json', encoding='utf-8') as f:
+        assert [event['id'] for event in json.load(f)['events']] == [1, 2]
+
+    with open('cold/stockholm/manifest.json', encoding='utf-8') as f:
+        manifest = json.load(f)
+    year = old['datetime'][:4]
+    assert manifest['years'][year]['count'] == 1
+    with gzip.open(f"cold/stockholm/{manifest['years'][year]['file']}", 'rt', encoding='utf-8') as f:
+        assert [event['id'] for event in json.load(f)['events']] == [2]
+
+def test_cold_archive_rebuilds_only_changed_years(workdir, monkeypatch):
+    cutoff = datetime(2025, 3, 1, tzinfo=STOCKHOLM_TZ)
+    events = [{'id': 1, 'datetime': '2023-05-10 12:00:00 +02:00'}, {'id': 2, 'datetime': '2024-05-10 12:00:00 +02:00'}]
+    write_cold_archives('cold', events, cutoff, 12)
+
+    serialized = []
+    monkeypatch.setattr('time_index.dumps_public', lambda events, metadata: serialized.append(metadata['year']) or dumps_canonical(events, metadata))
+    added = {'id': 3, 'datetime': '2024-06-10 12:00:00 +02:00'}
+    stats = write_cold_archives('cold', events + [added], cutoff, 12, added=[added, {'id': 4, 'datetime': '2026-01-01 12:00:00 +01:00'}])
+    assert serialized == ['2024']
+    assert stats == {'events': 3, 'years': 2, 'years_written': 1}
+
+    # En flyttad gräns bygger om alla år
+    serialized.clear()
+    write_cold_archives('cold', events + [added], datetime(2025, 4, 1, tzinfo=STOCKHOLM_TZ), 12, added=[])
+    assert serialized == ['2023', '2024']
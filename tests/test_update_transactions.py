@@ -0,0 +1,95 @@
+"""En region som fallerar under exporten får inte publicera något"""
+
+import json
+import os
+import threading
+
+import pytest
+
+import auto_update
+from conftest import TEST_CONFIG, FakeClient, make_event, snapshot
+
+def test_failed_region_publishes_nothing(workdir, monkeypatch):
+    events = [make_event(1, 2), make_event(2, 30, 'Rån'), make_event(3, 24 * 500, 'Skottlossning')]
+    client = FakeClient(events)
+    auto_update.update_all_regions(client)
+    assert os.path.exists('stockholm_violence_data.json')
+    before = snapshot(workdir)
+
+    def failing_search_index(*args, **kwargs):
+        raise RuntimeError('sökindex kraschade')
+
+    client.responses['Stockholm'] = events + [make_event(4, 1, 'Explosion')]
+    monkeypatch.setattr(auto_update, 'export_search_index', failing_search_index)
+    auto_update.update_all_regions(client)
+
+    assert snapshot(workdir) == before
+    assert os.listdir('.staging') == []
+
+def test_failed_region_is_reported(workdir, monkeypatch):
+    def failing_update(region, client=None, queued=()):
+        raise RuntimeError('regionen kraschade')
+
+    monkeypatch.setattr(auto_update, 'update_region', failing_update)
+    assert auto_update.main(FakeClient([make_event(1, 2)])) is False
+
+    with open('update_report.json', encoding='utf-8') as f:
+        report = json.load(f)
+    assert report['success'] is False
+    assert report['regions']['stockholm'] == {'error': 'regionen kraschade'}
+    assert not os.path.exists('auto_update.lock')
+
+def test_cli_update_exit_code(workdir, monkeypatch):
+    import cli
+
+    monkeypatch.setattr(auto_update, 'main', lambda client=None: False)
+    assert cli.main(['update']) == 1
+    monkeypatch.setattr(auto_update, 'main', lambda client=None: True)
+    assert cli.main(['update']) == 0
+
+def test_failed_first_run_creates_no_output_dirs(workdir, monkeypatch):
+    def failing_search_index(*args, **kwargs):
+        raise RuntimeError('sökindex kraschade')
+
+    monkeypatch.setattr(auto_update, 'export_search_index', failing_search_index)
+    auto_update.update_all_regions(FakeClient([make_event(1, 2), make_event(2, 24 * 500, 'Rån')]))
+
+    for directory in ('search', 'deltas', 'cold', 'hotspots'):
+        assert not os.path.exists(directory)
+
+def test_region_without_bounds_is_rejected():
+    config = {'regions': [{'id': 'stockholm'}, {'id': 'uppsala', 'name': 'Uppsala län', 'center': [59.86, 17.64]}]}
+    with pytest.raises(ValueError, match="Region 'uppsala' i config.json saknar bounds"):
+        auto_update.load_regions(config)
+
+def test_region_is_deployed_before_slower_region(workdir, monkeypatch):
+    config = dict(TEST_CONFIG, regions=[
+        {'id': 'stockholm'},
+        {'id': 'uppsala', 'name': 'Uppsala län', 'center': [59.86, 17.64], 'bounds': [[59.3, 16.6], [60.7, 18.9]]}
+    ])
+    (workdir / 'config.json').write_text(json.dumps(config), encoding='utf-8')
+
+    deployed = []
+    first_deploy = threading.Event()
+
+    def deploy_site():
+        deployed.append(sorted(name for name in os.listdir('.') if name.endswith('_violence_data.json')))
+        first_deploy.set()
+        return True
+
+    client = FakeClient([make_event(1, 2)])
+    client.responses['Uppsala län'] = [make_event(2, 3, location='Gottsunda, Uppsala')]
+    original_events = client.events
+
+    def events(**params):
+        # Uppsala svarar först när Stockholm har deployats
+        if params.get('locationname') == 'Uppsala län':
+            assert first_deploy.wait(timeout=10)
+        return original_events(**params)
+
+    client.events = events
+    monkeypatch.setattr(auto_update, 'deploy_site', deploy_site)
+    assert auto_update.update_all_regions(client) is True
+
+    assert deployed[0] == ['stockholm_violence_data.json']
+    assert deployed[1] == ['stockholm_violence_data.json', 'uppsala_violence_data.json']
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Tidsindex och arkivnivåer för Stockholm Våldskarta
+Regionens händelser hålls som (epoch, händelse) i tidsordning, direkt från
+databasens epoch-index (tolkad en gång när händelsen sparas). Händelser
+äldre än retentionsgränsen delas av med bisektion och flyttas från den
+publicerade filen till komprimerade årsarkiv som kartan laddar vid behov.
+"""
+
+import gzip
+import hashlib
+import json
+import os
+from bisect import bisect_left, insort
+from datetime import datetime
+
+from data_format import dumps_public, output_files, remove_output, write_atomic
+from event_store import event_epoch
+
+COLD_ARCHIVE_VERSION = 1
+COLD_MANIFEST = 'manifest.json'
+
+def retention_cutoff(hot_months, now=None):
+    """
+    Första dagen i månaden hot_months månader bakåt. Gränsen flyttas bara
+    vid månadsskiften, så kalla arkiv skrivs om högst en gång i månaden.
+    """
+    now = now or datetime.now().astimezone()
+    months = now.year * 12 + now.month - 1 - hot_months
+    return now.replace(year=months // 12, month=months % 12 + 1, day=1, hour=0, minute=0, second=0, microsecond=0)
+
+def timeline_key(entry):
+    """Ordningen i EventStore.timeline(): otolkbara datum (epoch None) först"""
+    epoch = entry[0]
+    return (epoch is not None, epoch or 0)
+
+def insert_events(timeline, events):
+    """Sortera in nya händelser i en tidsordnad lista av (epoch, händelse)"""
+    for event in events:
+        insort(timeline, (event_epoch(event), event), key=timeline_key)
+
+def split_timeline(timeline, cutoff_epoch):
+    """
+    Dela den tidsordnade listan vid gränsen med bisektion.
+    Returnerar (kalla, varma); händelser utan tolkbart datum räknas som varma.
+    """
+    undated = bisect_left(timeline, (True, float('-inf')), key=timeline_key)
+    split = bisect_left(timeline, (True, cutoff_epoch), key=timeline_key)
+    cold = [event for _, event in timeline[undated:split]]
+    hot = [event for _, event in timeline[:undated]] + [event for _, event in timeline[split:]]
+    return cold, hot
+
+def event_year(event):
+    return (event.get('datetime') or '')[:4]
+
+def load_cold_manifest(cold_dir):
+    try:
+        with open(os.path.join(cold_dir, COLD_MANIFEST), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+def changed_cold_years(manifest, cutoff, hot_months, added):
+    """
+    År som måste byggas om, None om alla måste det. Med samma gräns som
+    förra manifestet ändras bara år som fått nya händelser äldre än gränsen.
+    """
+    if (
+        added is None or manifest is None
+        or manifest.get('version') != COLD_ARCHIVE_VERSION
+        or manifest.get('hot_months') != hot_months
+        or manifest.get('cutoff') != cutoff.isoformat()
+    ):
+        return None
+    cutoff_epoch = int(cutoff.timestamp())
+    return {event_year(event) for event in added if (event_epoch(event) or cutoff_epoch) < cutoff_epoch}
+
+def write_cold_archives(cold_dir, cold_events, cutoff, hot_months, added=None):
+    """
+    Skriv ett gzip-komprimerat årsarkiv (publik projektion) per år och ett
+    manifest. Oförändrade år skrivs inte om; gzip utan tidsstämpel ger
+    samma bytes för samma innehåll.
+
+    added är händelserna som lagts till sedan förra exporten (daemon-läge).
+    Har gränsen inte flyttats serialiseras då bara deras år; övriga år tas
+    från manifestet.
+    """
+    manifest = load_cold_manifest(cold_dir)
+    changed = changed_cold_years(manifest, cutoff, hot_months, added)
+
+    by_year = {}
+    for event in cold_events:
+        by_year.setdefault(event_year(event), []).append(event)
+
+    years = {}
+    written = 0
+    for year, events in sorted(by_year.items()):
+        previous = manifest['years'].get(year) if changed is not None else None
+        if previous is not None and year not in changed and previous['count'] == len(events):
+            years[year] = previous
+            continue
+
+        content = dumps_public(events, {'year': year, 'total_events': len(events), 'cold_archive_version': COLD_ARCHIVE_VERSION})
+        compressed = gzip.compress(content.encode('utf-8'), mtime=0)
+        file_name = f"{year}.json.gz"
+        path = os.path.join(cold_dir, file_name)
+
+        try:
+            with open(path, 'rb') as f:
+                unchanged = f.read() == compressed
+        except FileNotFoundError:
+            unchanged = False
+        if not unchanged:
+            write_atomic(path, compressed)
+            written += 1
+
+        years[year] = {
+            'file': file_name,
+            'count': len(events),
+            'bytes': len(compressed),
+            'digest': hashlib.sha1(compressed).hexdigest()[:12]
+        }
+
+    # År som inte längre har kalla händelser tas bort
+    current_files = {entry['file'] for entry in years.values()}
+    for file_name in output_files(cold_dir):
+        if file_name.endswith('.json.gz') and file_name not in current_files:
+            remove_output(os.path.join(cold_dir, file_name))
+
+    manifest = {
+        'version': COLD_ARCHIVE_VERSION,
+        'hot_months': hot_months,
+        'cutoff': cutoff.isoformat(),
+        'years': years
+    }
+    write_atomic(os.path.join(cold_dir, COLD_MANIFEST), json.dumps(manifest, ensure_ascii=False, sort_keys=True, indent=1) + '\n')
+
+    return {'events': len(cold_events), 'years': len(years), 'years_written': written}